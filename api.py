@@ -2,14 +2,27 @@ from flask import Blueprint, jsonify, request
 from database import (
     get_all_dish, get_dish_by_id, add_dish, update_dish, delete_dish,
     get_all_orders, add_order, get_all_favourites, add_favourite, get_db,
-    get_all_accounts
+    get_all_accounts, search_dishes, get_dishes_filtered, DISH_FIELDS, get_sales_daily, get_top_dishes, get_sales_by_status, get_sales_totals,
+    get_popular_dishes, POPULAR_RANKINGS, get_recommendations, fetch_dishes_by_ids, fetch_favourites, insert_favourite, remove_favourite, insert_order, run_in_transaction, get_read_db,
+    get_changes, CHANGE_LOG_ENTITIES
 )
+from order_queue import place_order, OrderQueueTimeout, OrderPending
+from order_events import notify_order_events
 import json
+import re
+import sqlite3
 import traceback
 
 
 def _row_to_dict(row):
-    return dict(row) if row is not None else None
+    return row.to_json() if row is not None else None
+
+
+def _order_queue_timeout(e):
+    """503 для таймауту черги замовлень: order_pending — не повторювати, інакше — повтор безпечний"""
+    if isinstance(e, OrderPending):
+        return jsonify({'error': 'order_pending', 'message': str(e)}), 503
+    return jsonify({'error': 'order_queue_timeout', 'message': str(e)}), 503, {'Retry-After': '1'}
 
 
 # --- API v1: minimal JSON endpoints (backwards compatible) ---
@@ -19,7 +32,7 @@ api_v1_bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
 @api_v1_bp.route('/dishes', methods=['GET'])
 def v1_get_all_dishes():
     dishes = get_all_dish()
-    return jsonify([_row_to_dict(d) for d in dishes])
+    return jsonify(dishes)
 
 
 @api_v1_bp.route('/dishes/<int:dish_id>', methods=['GET'])
@@ -44,7 +57,7 @@ def v1_create_dish():
 @api_v1_bp.route('/orders', methods=['GET'])
 def v1_get_orders():
     orders = get_all_orders()
-    return jsonify([_row_to_dict(o) for o in orders])
+    return jsonify(orders)
 
 
 @api_v1_bp.route('/orders', methods=['POST'])
@@ -80,20 +93,23 @@ def v1_create_order():
     except Exception:
         discount = 0.0
     discounted_total = round(total * (1.0 - max(0, min(100, discount)) / 100.0), 2)
-    order_id = add_order(data.get('name','Guest'), data.get('phone',''), address, safe_items, discounted_total, discount)
+    try:
+        order_id = place_order(data.get('name','Guest'), data.get('phone',''), address, safe_items, discounted_total, discount)
+    except OrderQueueTimeout as e:
+        return _order_queue_timeout(e)
     return jsonify({'id': order_id, 'total': discounted_total, 'discount': discount}), 201
 
 
 @api_v1_bp.route('/favourites/<int:account_id>', methods=['GET'])
 def v1_get_favourites(account_id):
     favs = get_all_favourites(account_id)
-    return jsonify([_row_to_dict(f) for f in favs])
+    return jsonify(favs)
 
 
 @api_v1_bp.route('/accounts', methods=['GET'])
 def v1_get_accounts():
     accounts = get_all_accounts()
-    return jsonify([_row_to_dict(a) for a in accounts])
+    return jsonify(accounts)
 
 
 # --- API v2: improved validation, OpenAPI docstrings for Flasgger ---
@@ -108,6 +124,9 @@ def _not_found(message='Resource not found'):
     return jsonify({'error': 'not_found', 'message': message}), 404
 
 
+_DAY_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
 def validate_dish_payload(data):
     if not isinstance(data, dict):
         return 'payload_must_be_object'
@@ -121,6 +140,38 @@ def validate_dish_payload(data):
     return None
 
 
+def parse_dish_filters(args):
+    """Translate /dishes query args into get_dishes_filtered kwargs; returns (filters, error)"""
+    filters = {}
+    for key, cast in (('min_price', float), ('max_price', float), ('max_calories', int), ('limit', int)):
+        value = args.get(key)
+        if value in (None, ''):
+            continue
+        try:
+            filters[key] = cast(value)
+        except ValueError:
+            return None, f'{key}_must_be_number'
+    if 'limit' in filters and filters['limit'] < 1:
+        return None, 'limit_must_be_positive'
+    sort = args.get('sort')
+    if sort:
+        if sort not in ('price', 'name'):
+            return None, 'sort_must_be_price_or_name'
+        filters['sort'] = sort
+    order = args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        return None, 'order_must_be_asc_or_desc'
+    filters['descending'] = order == 'desc'
+    fields = args.get('fields')
+    if fields:
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in DISH_FIELDS]
+        if unknown:
+            return None, 'unknown_fields: ' + ','.join(unknown)
+        filters['fields'] = requested
+    return filters, None
+
+
 def validate_order_payload(data):
     if not isinstance(data, dict):
         return 'payload_must_be_object'
@@ -131,11 +182,61 @@ def validate_order_payload(data):
     return None
 
 
+def price_order(cursor, data):
+    """Нормалізовані позиції, сума зі знижкою та знижка замовлення; ціни — одним IN запитом"""
+    parsed = []
+    for it in data.get('items', []):
+        try:
+            did = int(it.get('dish_id') if isinstance(it, dict) else it[0])
+            qty = int(it.get('qty', 1) if isinstance(it, dict) else (it[1] if len(it) > 1 else 1))
+        except Exception:
+            continue
+        parsed.append({'dish_id': did, 'qty': qty})
+    dishes = fetch_dishes_by_ids(cursor, [it['dish_id'] for it in parsed])
+    total = 0.0
+    for it in parsed:
+        try:
+            total += float(dishes[it['dish_id']]['price']) * it['qty']
+        except (KeyError, TypeError, ValueError):
+            pass
+    try:
+        discount = float(data.get('discount', 0) or 0)
+    except Exception:
+        discount = 0.0
+    discount = max(0.0, min(100.0, discount))
+    return parsed, round(total * (1.0 - discount/100.0), 2), discount
+
+
 @api_v2_bp.route('/dishes', methods=['GET'])
 def v2_get_all_dishes():
     """
-    Get list of dishes
+    Get list of dishes, optionally filtered, sorted and projected
     ---
+    parameters:
+      - name: min_price
+        in: query
+        type: number
+      - name: max_price
+        in: query
+        type: number
+      - name: max_calories
+        in: query
+        type: integer
+      - name: sort
+        in: query
+        type: string
+        enum: [price, name]
+      - name: order
+        in: query
+        type: string
+        enum: [asc, desc]
+      - name: fields
+        in: query
+        type: string
+        description: Comma-separated list of columns, e.g. id,name,price
+      - name: limit
+        in: query
+        type: integer
     responses:
       200:
         description: List of dishes
@@ -143,9 +244,91 @@ def v2_get_all_dishes():
           type: array
           items:
             type: object
+      400:
+        description: Validation error
     """
-    dishes = get_all_dish()
-    return jsonify([_row_to_dict(d) for d in dishes])
+    if not request.args:
+        dishes = get_all_dish()
+        return jsonify(dishes)
+    filters, err = parse_dish_filters(request.args)
+    if err:
+        return _bad_request(err)
+    dishes = get_dishes_filtered(**filters)
+    return jsonify(dishes)
+
+
+@api_v2_bp.route('/dishes/search', methods=['GET'])
+def v2_search_dishes():
+    """
+    Full-text dish search over name, description and ingredients
+    ---
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+      - name: limit
+        in: query
+        type: integer
+      - name: autocomplete
+        in: query
+        type: boolean
+        description: Return only id and name (for search-as-you-type)
+    responses:
+      200:
+        description: Dishes ordered by relevance
+      400:
+        description: Validation error
+    """
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return _bad_request('q_required')
+    autocomplete = request.args.get('autocomplete', '').lower() in ('1', 'true', 'yes')
+    try:
+        limit = max(1, min(50, int(request.args.get('limit', 8 if autocomplete else 20))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    rows = search_dishes(q[:100], limit)
+    if autocomplete:
+        return jsonify([{'id': r['id'], 'name': r['name']} for r in rows])
+    return jsonify(rows)
+
+
+def parse_popular_args(args):
+    """(by, limit, error) для /dishes/popular"""
+    by = args.get('by', 'orders')
+    if by not in POPULAR_RANKINGS:
+        return None, None, 'by_must_be_orders_or_favourites'
+    try:
+        limit = max(1, min(50, int(args.get('limit', 10))))
+    except ValueError:
+        return None, None, 'limit_must_be_integer'
+    return by, limit, None
+
+
+@api_v2_bp.route('/dishes/popular', methods=['GET'])
+def v2_popular_dishes():
+    """
+    Most ordered or most favourited dishes
+    ---
+    parameters:
+      - name: by
+        in: query
+        type: string
+        enum: [orders, favourites]
+      - name: limit
+        in: query
+        type: integer
+    responses:
+      200:
+        description: Dishes with ordered_quantity and favourites_count, best first
+      400:
+        description: Validation error
+    """
+    by, limit, err = parse_popular_args(request.args)
+    if err:
+        return _bad_request(err)
+    return jsonify(get_popular_dishes(by, limit))
 
 
 @api_v2_bp.route('/dishes/<int:dish_id>', methods=['GET'])
@@ -170,6 +353,34 @@ def v2_get_dish(dish_id):
     return jsonify(_row_to_dict(d))
 
 
+@api_v2_bp.route('/dishes/<int:dish_id>/recommendations', methods=['GET'])
+def v2_dish_recommendations(dish_id):
+    """
+    Dishes most often ordered together with the given dish
+    ---
+    parameters:
+      - name: dish_id
+        in: path
+        type: integer
+        required: true
+      - name: limit
+        in: query
+        type: integer
+    responses:
+      200:
+        description: Dishes with orders_count (orders containing both dishes)
+      404:
+        description: Not Found
+    """
+    try:
+        limit = max(1, min(20, int(request.args.get('limit', 4))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    if not get_dish_by_id(dish_id):
+        return _not_found()
+    return jsonify(get_recommendations(dish_id, limit))
+
+
 @api_v2_bp.route('/dishes', methods=['POST'])
 def v2_create_dish():
     """
@@ -289,7 +500,7 @@ def v2_get_orders():
         description: List of orders
     """
     orders = get_all_orders()
-    return jsonify([_row_to_dict(o) for o in orders])
+    return jsonify(orders)
 
 
 @api_v2_bp.route('/orders', methods=['POST'])
@@ -321,6 +532,8 @@ def v2_create_order():
         description: Created
       400:
         description: Validation error
+      503:
+        description: "ORDER_INTAKE_MODE=queue: order_queue_timeout (cancelled, safe to retry) or order_pending (still being written, do not retry)"
     """
     try:
         data = request.get_json(force=True)
@@ -329,34 +542,11 @@ def v2_create_order():
     err = validate_order_payload(data)
     if err:
         return _bad_request(err)
-    items = data.get('items', [])
-    db = get_db(); cur = db.cursor()
-    total = 0.0
-    safe_items = []
-    for it in items:
-        try:
-            did = int(it.get('dish_id') if isinstance(it, dict) else it[0])
-            qty = int(it.get('qty', 1) if isinstance(it, dict) else (it[1] if len(it) > 1 else 1))
-        except Exception:
-            continue
-        cur.execute('SELECT price FROM dish WHERE id = ?', (did,))
-        row = cur.fetchone()
-        price_f = 0.0
-        if row:
-            try:
-                price_val = row['price'] if 'price' in row.keys() else row[0]
-                price_f = float(price_val)
-            except Exception:
-                price_f = 0.0
-        total += price_f * qty
-        safe_items.append({'dish_id': did, 'qty': qty})
+    safe_items, discounted_total, discount = price_order(get_db().cursor(), data)
     try:
-        discount = float(data.get('discount', 0) or 0)
-    except Exception:
-        discount = 0.0
-    discount = max(0.0, min(100.0, discount))
-    discounted_total = round(total * (1.0 - discount/100.0), 2)
-    order_id = add_order(data.get('name', 'Guest'), data.get('phone', ''), data.get('address', ''), safe_items, discounted_total, discount)
+        order_id = place_order(data.get('name', 'Guest'), data.get('phone', ''), data.get('address', ''), safe_items, discounted_total, discount)
+    except OrderQueueTimeout as e:
+        return _order_queue_timeout(e)
     return jsonify({'id': order_id, 'total': discounted_total, 'discount': discount}), 201
 
 
@@ -375,7 +565,7 @@ def v2_get_favourites(account_id):
         description: List of favourites
     """
     favs = get_all_favourites(account_id)
-    return jsonify([_row_to_dict(f) for f in favs])
+    return jsonify(favs)
 
 
 @api_v2_bp.route('/favourites', methods=['POST'])
@@ -420,7 +610,289 @@ def v2_get_accounts():
         description: List of accounts
     """
     accounts = get_all_accounts()
-    return jsonify([_row_to_dict(a) for a in accounts])
+    return jsonify(accounts)
+
+
+BATCH_MAX_OPERATIONS = 50
+BATCH_MAX_IDS = 100
+BATCH_WRITE_OPERATIONS = ('add_favourite', 'remove_favourite', 'create_order')
+
+
+class BatchOperationError(Exception):
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_batch_operation(op):
+    if not isinstance(op, dict):
+        return 'operation_must_be_object'
+    name = op.get('op')
+    if name not in BATCH_OPERATIONS:
+        return 'unknown_op'
+    if name == 'get_dishes':
+        ids = op.get('ids')
+        if not isinstance(ids, list) or not ids or not all(_is_int(i) for i in ids):
+            return 'ids_must_be_non_empty_integer_array'
+        if len(ids) > BATCH_MAX_IDS:
+            return f'too_many_ids (max {BATCH_MAX_IDS})'
+    elif name == 'get_favourites':
+        if not _is_int(op.get('account_id')):
+            return 'account_id_required'
+    elif name in ('add_favourite', 'remove_favourite'):
+        if not _is_int(op.get('dish_id')):
+            return 'dish_id_required'
+        if op.get('account_id') is not None and not _is_int(op['account_id']):
+            return 'account_id_must_be_integer'
+    elif name == 'create_order':
+        return validate_order_payload(op)
+    return None
+
+
+def _batch_get_dishes(cursor, op):
+    found = fetch_dishes_by_ids(cursor, op['ids'])
+    return {'dishes': [found[i] for i in op['ids'] if i in found],
+            'missing': [i for i in op['ids'] if i not in found]}
+
+
+def _batch_get_favourites(cursor, op):
+    return fetch_favourites(cursor, op['account_id'])
+
+
+def _batch_add_favourite(cursor, op):
+    return {'id': insert_favourite(cursor, op['dish_id'], op.get('account_id'))}
+
+
+def _batch_remove_favourite(cursor, op):
+    return {'removed': remove_favourite(cursor, op['dish_id'], op.get('account_id'))}
+
+
+def _batch_create_order(cursor, op):
+    # не через place_order / ORDER_INTAKE_MODE=queue: замовлення — частина спільної транзакції batch
+    items, total, discount = price_order(cursor, op)
+    order_id = insert_order(cursor, op.get('name', 'Guest'), op.get('phone', ''), op['address'], items, total, discount)
+    return {'id': order_id, 'total': total, 'discount': discount}
+
+
+BATCH_OPERATIONS = {
+    'get_dishes': _batch_get_dishes,
+    'get_favourites': _batch_get_favourites,
+    'add_favourite': _batch_add_favourite,
+    'remove_favourite': _batch_remove_favourite,
+    'create_order': _batch_create_order,
+}
+
+
+def run_batch(cursor, operations):
+    """Виконати операції по черзі одним курсором; результати в тому ж порядку"""
+    results = []
+    for index, op in enumerate(operations):
+        try:
+            results.append({'op': op['op'], 'result': BATCH_OPERATIONS[op['op']](cursor, op)})
+        except (ValueError, sqlite3.IntegrityError) as e:
+            raise BatchOperationError(index, str(e))
+    return results
+
+
+@api_v2_bp.route('/batch', methods=['POST'])
+def v2_batch():
+    """
+    Run several operations in one request (one DB session, one transaction for writes)
+    ---
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          required: [operations]
+          properties:
+            operations:
+              type: array
+              items:
+                type: object
+                required: [op]
+                properties:
+                  op:
+                    type: string
+                    enum: [get_dishes, get_favourites, add_favourite, remove_favourite, create_order]
+                  ids: {type: array, items: {type: integer}}
+                  dish_id: {type: integer}
+                  account_id: {type: integer}
+                  name: {type: string}
+                  phone: {type: string}
+                  address: {type: string}
+                  items: {type: array, items: {type: object}}
+                  discount: {type: number}
+    responses:
+      200:
+        description: Results in the order of operations
+      400:
+        description: Validation error or failed operation (nothing is written)
+    """
+    try:
+        data = request.get_json(force=True)
+    except Exception:
+        return _bad_request('invalid_json')
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return _bad_request('operations_must_be_non_empty_array')
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return _bad_request(f'too_many_operations (max {BATCH_MAX_OPERATIONS})')
+    for index, op in enumerate(operations):
+        err = validate_batch_operation(op)
+        if err:
+            return jsonify({'error': 'bad_request', 'message': err, 'index': index}), 400
+    try:
+        if any(op['op'] in BATCH_WRITE_OPERATIONS for op in operations):
+            results = run_in_transaction(run_batch, operations)
+            if any(op['op'] == 'create_order' for op in operations):
+                notify_order_events()  # SSE-клієнти процесу — без очікування опитування, як після place_order
+        else:
+            results = run_batch(get_read_db().cursor(), operations)
+    except BatchOperationError as e:
+        return jsonify({'error': 'batch_failed', 'message': str(e), 'index': e.index}), 400
+    return jsonify({'results': results})
+
+
+@api_v2_bp.route('/changes', methods=['GET'])
+def v2_get_changes():
+    """
+    Delta sync: inserts, updates and deletes of dishes, orders and favourites since a sequence number
+    ---
+    parameters:
+      - name: since
+        in: query
+        type: integer
+        description: Value of "next" from the previous response; omit for the first sync
+      - name: entities
+        in: query
+        type: string
+        description: Comma-separated subset of dish,orders,favourites
+      - name: limit
+        in: query
+        type: integer
+    responses:
+      200:
+        description: >
+          Latest change per row ({seq, entity, id, op, data}) and the cursor for the next call.
+          reset=true means the client must refetch full collections and continue from next.
+      400:
+        description: Validation error
+    """
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return _bad_request('since_must_be_non_negative_integer')
+        if since < 0:
+            return _bad_request('since_must_be_non_negative_integer')
+    entities = tuple(e.strip() for e in request.args.get('entities', '').split(',') if e.strip())
+    if any(e not in CHANGE_LOG_ENTITIES for e in entities):
+        return _bad_request(f"entities_must_be_in_{','.join(CHANGE_LOG_ENTITIES)}")
+    try:
+        limit = max(1, min(1000, int(request.args.get('limit', 500))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    result = get_changes(since, entities or CHANGE_LOG_ENTITIES, limit)
+    for change in result['changes']:
+        change['data'] = _row_to_dict(change['data'])
+    result['since'] = since
+    return jsonify(result)
+
+
+def _report_row(row):
+    d = _row_to_dict(row)
+    if d.get('revenue') is not None:
+        d['revenue'] = round(d['revenue'], 2)
+    return d
+
+
+@api_v2_bp.route('/reports/summary', methods=['GET'])
+def v2_report_summary():
+    """
+    Sales totals (orders count and revenue) with a per-status breakdown
+    ---
+    responses:
+      200:
+        description: Totals and status breakdown
+    """
+    totals = _report_row(get_sales_totals())
+    totals['by_status'] = [_report_row(r) for r in get_sales_by_status()]
+    return jsonify(totals)
+
+
+@api_v2_bp.route('/reports/daily', methods=['GET'])
+def v2_report_daily():
+    """
+    Daily revenue and order counts, newest first
+    ---
+    parameters:
+      - name: from
+        in: query
+        type: string
+        description: First day (YYYY-MM-DD), inclusive
+      - name: to
+        in: query
+        type: string
+        description: Last day (YYYY-MM-DD), inclusive
+      - name: limit
+        in: query
+        type: integer
+    responses:
+      200:
+        description: List of days
+      400:
+        description: Validation error
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    for value in (date_from, date_to):
+        if value and not _DAY_RE.match(value):
+            return _bad_request('date_must_be_yyyy_mm_dd')
+    try:
+        limit = max(1, min(3660, int(request.args.get('limit', 366))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    return jsonify([_report_row(r) for r in get_sales_daily(date_from, date_to, limit)])
+
+
+@api_v2_bp.route('/reports/top-dishes', methods=['GET'])
+def v2_report_top_dishes():
+    """
+    Best-selling dishes by ordered quantity
+    ---
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+    responses:
+      200:
+        description: List of dishes with quantity and orders count
+    """
+    try:
+        limit = max(1, min(100, int(request.args.get('limit', 10))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    return jsonify(get_top_dishes(limit))
+
+
+@api_v2_bp.route('/reports/status', methods=['GET'])
+def v2_report_status():
+    """
+    Orders count and revenue per order status
+    ---
+    responses:
+      200:
+        description: List of statuses
+    """
+    return jsonify([_report_row(r) for r in get_sales_by_status()])
 
 
 # --- Legacy non-versioned API to support existing clients / Postman collection ---
@@ -0,0 +1,67 @@
+"""
+Swagger UI (/apidocs) з лінивою ініціалізацією Flasgger.
+
+Імпорт flasgger (разом з jsonschema) і побудова специфікації коштують ~100 мс
+на кожен worker, тож create_app їх не виконує. LazyApiDocs обгортає wsgi_app
+застосунку: перший запит до /apidocs, /apispec_1.json або статики Flasgger
+створює окремий docs-застосунок зі Swagger. Специфікація будується з
+url_map поточного застосунку, тому маршрути основного застосунку (з YAML
+docstring'ами) дзеркаляться в docs-застосунок — обслуговує він лише шляхи
+документації. Після першого запиту Flask не дозволяє реєструвати нові маршрути
+в основному застосунку, звідси окремий застосунок замість Swagger(app).
+"""
+import threading
+
+from flask import Flask
+
+DOCS_PREFIXES = ('/apidocs', '/apispec_', '/flasgger_static', '/oauth2-redirect.html')
+
+
+def build_docs_app(app):
+    """Flask застосунок зі Swagger UI для маршрутів app або None без flasgger"""
+    try:
+        from flasgger import Swagger
+    except Exception as e:
+        print('flasgger: not available or failed to initialize:', e)
+        return None
+    docs = Flask(app.import_name, root_path=app.root_path)
+    docs.config.update(ENV=app.config.get('ENV'), DEBUG=app.debug, SWAGGER=app.config.get('SWAGGER', {}))
+    Swagger(docs)
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static' or rule.endpoint in docs.view_functions:
+            continue
+        docs.add_url_rule(rule.rule, rule.endpoint, app.view_functions[rule.endpoint],
+                          methods=rule.methods, strict_slashes=rule.strict_slashes)
+    # ті самі заголовки безпеки, що й в основного застосунку
+    for func in app.after_request_funcs.get(None, ()):
+        docs.after_request(func)
+    return docs
+
+
+class LazyApiDocs:
+    """WSGI middleware: шляхи документації — у docs-застосунок, створений при першому зверненні"""
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self._docs = None
+        self._lock = threading.Lock()
+        app.wsgi_app = self
+
+    @property
+    def loaded(self):
+        return self._docs is not None
+
+    def docs_app(self):
+        if self._docs is None:
+            with self._lock:
+                if self._docs is None:
+                    self._docs = build_docs_app(self.app) or False
+        return self._docs or None
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(DOCS_PREFIXES):
+            docs = self.docs_app()
+            if docs is not None:
+                return docs(environ, start_response)
+        return self.wsgi_app(environ, start_response)
@@ -0,0 +1,308 @@
+"""
+Асинхронний (ASGI) варіант читаючих ендпоінтів /api/v2.
+
+GET/HEAD запити до /api/v2 обслуговуються корутинами: з'єднання клієнтів
+мультиплексуються на одному event loop, а виклики database.py виконуються в
+обмеженому ThreadPoolExecutor (кожен потік тримає власний app context і одне
+read-only з'єднання з БД). Повільний SQLite-запит займає потік executor'а,
+але не блокує прийом і обробку інших з'єднань. Якщо черга до executor'а
+переповнена, запит одразу отримує 503 замість нескінченного очікування.
+
+Усе інше (запис, HTML сторінки, /api/v1, /health, ...) передається у Flask
+застосунок main.app через asgiref.WsgiToAsgi, тож asgi:app — повна заміна
+main:app:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+Налаштування (змінні оточення):
+    ASYNC_DB_WORKERS       потоків у DB executor'і (4)
+    ASYNC_MAX_PENDING      максимум запитів, що чекають на executor, далі 503 (256)
+"""
+import asyncio
+import functools
+import os
+import re
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from flask import g
+
+from main import app as flask_app, is_production, startup
+from database import (
+    get_all_dish, get_dish_by_id, get_dishes_filtered, search_dishes, get_all_orders,
+    get_all_favourites, get_all_accounts, get_sales_daily, get_top_dishes, get_sales_by_status,
+    get_sales_totals, get_popular_dishes, get_recommendations
+)
+from api import parse_dish_filters, parse_popular_args, _row_to_dict, _report_row, _DAY_RE
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # без asgiref працюють лише асинхронні ендпоінти
+    WsgiToAsgi = None
+
+SECURITY_HEADERS = (
+    (b'x-content-type-options', b'nosniff'),
+    (b'x-frame-options', b'SAMEORIGIN'),
+    (b'x-xss-protection', b'1; mode=block'),
+    (b'strict-transport-security', b'max-age=31536000; includeSubDomains'),
+)
+
+
+# --- DB executor ---
+_executor = None
+_executor_pid = None
+_executor_guard = threading.Lock()
+_pending = 0
+
+
+def _init_executor_thread():
+    """Постійний app context потоку: get_read_db() кешує в ньому read-only з'єднання"""
+    ctx = flask_app.app_context()
+    ctx.push()
+    g.read_only_session = True
+    startup()  # init_db при першому зверненні, як before_request у main.py
+
+
+def get_db_executor():
+    """Executor поточного процесу (створюється ліниво, заново після fork)"""
+    global _executor, _executor_pid
+    with _executor_guard:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, int(os.environ.get('ASYNC_DB_WORKERS', 4))),
+                thread_name_prefix='async-db',
+                initializer=_init_executor_thread,
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown_db_executor():
+    global _executor
+    with _executor_guard:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=True)
+        _executor = None
+
+
+class Overloaded(Exception):
+    pass
+
+
+async def run_db(fn, *args, **kwargs):
+    """Виконати fn у DB executor'і; Overloaded, якщо черга вже повна"""
+    global _pending
+    if _pending >= int(os.environ.get('ASYNC_MAX_PENDING', 256)):
+        raise Overloaded()
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_db_executor(), functools.partial(fn, *args, **kwargs))
+    finally:
+        _pending -= 1
+
+
+def _rows(fn, *args, **kwargs):
+    # список рядків кодується швидким шляхом FastJSONProvider
+    return list(fn(*args, **kwargs))
+
+
+def _report_rows(fn, *args):
+    return [_report_row(r) for r in fn(*args)]
+
+
+def _report_summary():
+    totals = _report_row(get_sales_totals())
+    totals['by_status'] = [_report_row(r) for r in get_sales_by_status()]
+    return totals
+
+
+def _bad_request(message, code='bad_request'):
+    return 400, {'error': code, 'message': message}
+
+
+# --- Асинхронні ендпоінти (дзеркалять відповіді api_v2) ---
+async def v2_get_all_dishes(args):
+    if not args:
+        return 200, await run_db(_rows, get_all_dish)
+    filters, err = parse_dish_filters(args)
+    if err:
+        return _bad_request(err)
+    return 200, await run_db(_rows, get_dishes_filtered, **filters)
+
+
+async def v2_search_dishes(args):
+    q = (args.get('q') or '').strip()
+    if not q:
+        return _bad_request('q_required')
+    autocomplete = args.get('autocomplete', '').lower() in ('1', 'true', 'yes')
+    try:
+        limit = max(1, min(50, int(args.get('limit', 8 if autocomplete else 20))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    rows = await run_db(_rows, search_dishes, q[:100], limit)
+    if autocomplete:
+        return 200, [{'id': r['id'], 'name': r['name']} for r in rows]
+    return 200, rows
+
+
+async def v2_popular_dishes(args):
+    by, limit, err = parse_popular_args(args)
+    if err:
+        return _bad_request(err)
+    return 200, await run_db(_rows, get_popular_dishes, by, limit)
+
+
+async def v2_get_dish(args, dish_id):
+    d = await run_db(get_dish_by_id, int(dish_id))
+    if not d:
+        return 404, {'error': 'not_found', 'message': 'Resource not found'}
+    return 200, _row_to_dict(d)
+
+
+def _recommendations(dish_id, limit):
+    if not get_dish_by_id(dish_id):
+        return None
+    return _rows(get_recommendations, dish_id, limit)
+
+
+async def v2_dish_recommendations(args, dish_id):
+    try:
+        limit = max(1, min(20, int(args.get('limit', 4))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    rows = await run_db(_recommendations, int(dish_id), limit)
+    if rows is None:
+        return 404, {'error': 'not_found', 'message': 'Resource not found'}
+    return 200, rows
+
+
+async def v2_get_orders(args):
+    return 200, await run_db(_rows, get_all_orders)
+
+
+async def v2_get_favourites(args, account_id):
+    return 200, await run_db(_rows, get_all_favourites, int(account_id))
+
+
+async def v2_get_accounts(args):
+    return 200, await run_db(_rows, get_all_accounts)
+
+
+async def v2_report_summary(args):
+    return 200, await run_db(_report_summary)
+
+
+async def v2_report_daily(args):
+    date_from = args.get('from')
+    date_to = args.get('to')
+    for value in (date_from, date_to):
+        if value and not _DAY_RE.match(value):
+            return _bad_request('date_must_be_yyyy_mm_dd')
+    try:
+        limit = max(1, min(3660, int(args.get('limit', 366))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    return 200, await run_db(_report_rows, get_sales_daily, date_from, date_to, limit)
+
+
+async def v2_report_top_dishes(args):
+    try:
+        limit = max(1, min(100, int(args.get('limit', 10))))
+    except ValueError:
+        return _bad_request('limit_must_be_integer')
+    return 200, await run_db(_rows, get_top_dishes, limit)
+
+
+async def v2_report_status(args):
+    return 200, await run_db(_report_rows, get_sales_by_status)
+
+
+ROUTES = [(re.compile(pattern), handler) for pattern, handler in (
+    (r'^/api/v2/dishes$', v2_get_all_dishes),
+    (r'^/api/v2/dishes/search$', v2_search_dishes),
+    (r'^/api/v2/dishes/popular$', v2_popular_dishes),
+    (r'^/api/v2/dishes/(?P<dish_id>\d+)$', v2_get_dish),
+    (r'^/api/v2/dishes/(?P<dish_id>\d+)/recommendations$', v2_dish_recommendations),
+    (r'^/api/v2/orders$', v2_get_orders),
+    (r'^/api/v2/favourites/(?P<account_id>\d+)$', v2_get_favourites),
+    (r'^/api/v2/accounts$', v2_get_accounts),
+    (r'^/api/v2/reports/summary$', v2_report_summary),
+    (r'^/api/v2/reports/daily$', v2_report_daily),
+    (r'^/api/v2/reports/top-dishes$', v2_report_top_dishes),
+    (r'^/api/v2/reports/status$', v2_report_status),
+)]
+
+
+def match_route(method, path):
+    """(handler, path params) для асинхронного ендпоінта або (None, None)"""
+    if method not in ('GET', 'HEAD'):
+        return None, None
+    for pattern, handler in ROUTES:
+        m = pattern.match(path)
+        if m:
+            return handler, m.groupdict()
+    return None, None
+
+
+def _query_args(query_string):
+    # як request.args.get: перше значення параметра
+    parsed = parse_qs(query_string.decode('latin-1'), keep_blank_values=True)
+    return {key: values[0] for key, values in parsed.items()}
+
+
+class AsyncApiApp:
+    """ASGI застосунок: /api/v2 читання асинхронно, решта — Flask через WsgiToAsgi"""
+
+    def __init__(self, wsgi_app):
+        self.fallback = WsgiToAsgi(wsgi_app) if WsgiToAsgi is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http':
+            handler, params = match_route(scope['method'], scope['path'])
+            if handler is not None:
+                return await self._handle(handler, params, scope, send)
+        if self.fallback is None:
+            return await self._send_json(send, 404, {'error': 'not_found', 'message': 'Resource not found'})
+        return await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, shutdown_db_executor)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle(self, handler, params, scope, send):
+        try:
+            status, payload = await handler(_query_args(scope.get('query_string', b'')), **params)
+        except Overloaded:
+            return await self._send_json(send, 503, {'error': 'overloaded', 'message': 'Too many pending requests'},
+                                         extra_headers=[(b'retry-after', b'1')])
+        except Exception:
+            print('\n==== UNHANDLED EXCEPTION (asgi) =====', file=sys.stderr)
+            print(traceback.format_exc(), file=sys.stderr)
+            status, payload = 500, {'error': 'internal_error', 'message': 'Internal Server Error'}
+        await self._send_json(send, status, payload, head=scope['method'] == 'HEAD')
+
+    async def _send_json(self, send, status, payload, extra_headers=(), head=False):
+        # той самий компактний формат, що й jsonify у production
+        body = flask_app.json.dumps_bytes(payload) + b'\n'
+        headers = [(b'content-type', b'application/json'),
+                   (b'content-length', str(len(body)).encode())]
+        if is_production:
+            headers.extend(SECURITY_HEADERS)
+        headers.extend(extra_headers)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+app = AsyncApiApp(flask_app)
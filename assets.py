@@ -0,0 +1,218 @@
+"""
+Версіоновані статичні файли і precache-маніфест service worker'а.
+
+AssetManifest обходить static/, рахує sha256 вмісту кожного файлу і дає:
+    static_url('style.css')  → /static/style.css?v=<hash>  (глобальна функція Jinja)
+    asset_css('site.css')    → <link> на зібраний бандл або на його вихідні файли
+    asset_js('site.js')      → <script> так само (бандли — bundler.py)
+    /sw.js                   → static/sw.js з маніфестом: версія + URL для precache
+
+Відповіді static з актуальним ?v= кешуються браузером назавжди (immutable) —
+новий вміст файлу дає новий URL. Версія маніфесту — хеш усіх записів і самого
+sw.js, тож будь-яка зміна статики змінює /sw.js: браузер встановлює новий
+service worker, а той видаляє кеші попередньої версії.
+
+Маніфест будується один раз на процес (для gunicorn preload — у master, див.
+main.warm_up); з TEMPLATES_AUTO_RELOAD (debug) перебудовується, коли змінюються
+mtime файлів у static/.
+
+Бандл використовується, лише коли static/dist/bundles.json записано для тих самих
+хешів вихідних файлів, що й у маніфесті, і не в режимі TEMPLATES_AUTO_RELOAD.
+Critical CSS, крім того, — лише для тієї версії шаблону, з якої його вибрано.
+
+Налаштування (змінні оточення):
+    PRECACHE_EXTENSIONS  розширення файлів для precache через кому (.css,.js)
+"""
+import hashlib
+import json
+import os
+import threading
+
+from flask import current_app, request
+from markupsafe import Markup, escape
+
+from bundler import BUNDLES, DIST_DIR, MANIFEST_FILE
+
+HASH_LENGTH = 12
+SERVICE_WORKER = 'sw.js'
+# сторінки, які service worker кешує при встановленні (offline fallback для навігації)
+PRECACHE_PAGES = ('/',)
+PRECACHE_EXTENSIONS = tuple(
+    ext.strip() for ext in os.environ.get('PRECACHE_EXTENSIONS', '.css,.js').split(',') if ext.strip()
+)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+class AssetManifest:
+    """Хеші вмісту файлів static/ (відносний шлях → hash) і версія маніфесту"""
+
+    def __init__(self, static_folder, static_url_path, auto_reload=False, template_folder=None):
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path
+        self.auto_reload = auto_reload
+        self.template_folder = template_folder
+        self._template_hashes = {}  # шаблон → hash, як і маніфест static — раз на процес
+        self._state = None  # (mtimes, hashes, version) — одне присвоєння, безпечно між потоками
+        self._lock = threading.Lock()
+        self._files = {}  # (відносний шлях, hash) → вміст: bundles.json, critical CSS
+
+    def _scan(self):
+        mtimes = {}
+        for root, dirs, files in os.walk(self.static_folder):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                mtimes[rel] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def load(self):
+        """(hashes, version); будується при першому виклику"""
+        state = self._state
+        if state is None or (self.auto_reload and self._scan() != state[0]):
+            with self._lock:
+                state = self._state
+                mtimes = self._scan()
+                if state is None or state[0] != mtimes:
+                    hashes = {rel: file_hash(os.path.join(self.static_folder, rel)) for rel in mtimes}
+                    version = hashlib.sha256(
+                        json.dumps(sorted(hashes.items())).encode()
+                    ).hexdigest()[:HASH_LENGTH]
+                    state = self._state = (mtimes, hashes, version)
+        return state[1], state[2]
+
+    @property
+    def version(self):
+        return self.load()[1]
+
+    def hash_for(self, filename):
+        return self.load()[0].get(filename)
+
+    def url(self, filename):
+        """URL файлу з хешем вмісту; файли поза маніфестом — без ?v="""
+        digest = self.hash_for(filename)
+        url = f'{self.static_url_path}/{filename}'
+        return f'{url}?v={digest}' if digest else url
+
+    def read(self, filename):
+        """Вміст файлу static/ (кешується за хешем з маніфесту) або None"""
+        key = (filename, self.hash_for(filename))
+        if key[1] is None:
+            return None
+        text = self._files.get(key)
+        if text is None:
+            with open(os.path.join(self.static_folder, filename), encoding='utf-8') as f:
+                text = f.read()
+            self._files = {k: v for k, v in self._files.items() if k[0] != filename}
+            self._files[key] = text
+        return text
+
+    def template_hash(self, template):
+        digest = self._template_hashes.get(template)
+        if digest is None and self.template_folder is not None:
+            try:
+                digest = file_hash(os.path.join(self.template_folder, template))
+            except OSError:
+                return None
+            self._template_hashes[template] = digest
+        return digest
+
+    def bundle_current(self, name):
+        """Чи зібрано бандл name з поточних версій вихідних файлів (і шаблону — для critical CSS)"""
+        if self.auto_reload:
+            return False
+        built = self.read(f'{DIST_DIR}/{MANIFEST_FILE}')
+        info = json.loads(built).get(name) if built else None
+        if not info or self.hash_for(f'{DIST_DIR}/{name}') is None:
+            return False
+        if 'template' in info and info.get('template_hash') != self.template_hash(info['template']):
+            return False  # шаблон змінився після збірки: вибрані селектори можуть бути неактуальні
+        return all(self.hash_for(src) == digest for src, digest in info['sources'].items())
+
+    def bundle_files(self, name):
+        """Файли static/, які підключає сторінка для бандла: зібраний або вихідні"""
+        if self.bundle_current(name):
+            return [f'{DIST_DIR}/{name}']
+        return list(BUNDLES[name])
+
+    def precache_urls(self):
+        urls = list(PRECACHE_PAGES)
+        for name in BUNDLES:
+            urls.extend(self.url(filename) for filename in self.bundle_files(name)
+                        if filename.endswith(PRECACHE_EXTENSIONS))
+        return urls
+
+    def service_worker(self):
+        """Текст /sw.js: маніфест + static/sw.js"""
+        manifest = {
+            'version': self.version,
+            'precache': self.precache_urls(),
+            'staticPrefix': self.static_url_path + '/',
+        }
+        with open(os.path.join(self.static_folder, SERVICE_WORKER), encoding='utf-8') as f:
+            source = f.read()
+        return f'self.__PRECACHE_MANIFEST = {json.dumps(manifest, ensure_ascii=False)};\n{source}'
+
+
+def static_url(filename):
+    return current_app.extensions['assets'].url(filename)
+
+
+def asset_css(name, critical=None):
+    """<link> на CSS бандл; з critical — вбудований critical CSS і асинхронне завантаження бандла"""
+    manifest = current_app.extensions['assets']
+    files = manifest.bundle_files(name)
+    if critical and len(files) == 1 and manifest.bundle_current(critical):
+        url = escape(manifest.url(files[0]))
+        css = manifest.read(f'{DIST_DIR}/{critical}').replace('</', '<\\/')
+        return Markup(
+            f'<style>{css}</style>\n'
+            f'<link rel="preload" href="{url}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+            f'<noscript><link rel="stylesheet" href="{url}"></noscript>'
+        )
+    return Markup('\n'.join(f'<link rel="stylesheet" href="{escape(manifest.url(f))}">' for f in files))
+
+
+def asset_js(name, defer=False):
+    manifest = current_app.extensions['assets']
+    attrs = ' defer' if defer else ''
+    return Markup('\n'.join(f'<script src="{escape(manifest.url(f))}"{attrs}></script>'
+                             for f in manifest.bundle_files(name)))
+
+
+def service_worker_view():
+    response = current_app.response_class(
+        current_app.extensions['assets'].service_worker(), mimetype='application/javascript'
+    )
+    # сам воркер не кешується: браузер має бачити нову версію маніфесту одразу
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+
+def set_asset_cache_headers(response):
+    """static з актуальним ?v=<hash> — immutable; інші файли static — як раніше"""
+    if request.endpoint == 'static' and response.status_code == 200:
+        digest = request.args.get('v')
+        filename = (request.view_args or {}).get('filename')
+        if digest and digest == current_app.extensions['assets'].hash_for(filename):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = AssetManifest(
+        app.static_folder, app.static_url_path, auto_reload=app.config.get('TEMPLATES_AUTO_RELOAD', False),
+        template_folder=os.path.join(app.root_path, app.template_folder),
+    )
+    app.jinja_env.globals.update(static_url=static_url, asset_css=asset_css, asset_js=asset_js)
+    app.add_url_rule('/sw.js', 'service_worker', service_worker_view)
+    app.after_request(set_asset_cache_headers)
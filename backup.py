@@ -0,0 +1,288 @@
+"""
+Онлайн резервні копії SQLite через backup API (sqlite3.Connection.backup).
+
+Копіювання файлу my_database.db з volume під час роботи небезпечне: у WAL-режимі
+частина закомічених сторінок ще лежить у -wal, і копія може бути неузгодженою.
+backup_database копіює сторінки узгодженого знімка кроками по BACKUP_STEP_PAGES
+з паузою BACKUP_PAUSE_MS між ними. Кожен крок — коротка read-транзакція на
+джерелі (у WAL вона не блокує писачів, лише не дає checkpoint'у перенести новіші
+кадри) і запис у файл копії. Якщо між кроками БД змінює інше з'єднання, SQLite
+починає копіювання заново; після BACKUP_MAX_RESTARTS перезапусків решта
+копіюється одним кроком.
+
+Копія пишеться у <ім'я>.tmp, переводиться в journal_mode=DELETE (самодостатній
+файл без -wal), перевіряється PRAGMA integrity_check і збігом схеми з джерелом,
+і лише потім отримує остаточну назву <БД>-YYYYmmdd-HHMMSS.db у BACKUP_DIR. Старіші
+за BACKUP_KEEP останніх копій видаляються. Архів замовлень (order_archive), якщо
+він є, копіюється тим самим способом.
+
+Звіт: тривалість, кроки, перезапуски, сумарний і найдовший час утримання
+read-транзакції (lock_held_ms), розмір і sha256 копії.
+
+Запуск: flask --app main db-backup або потік-планувальник (BACKUP_MODE=scheduler);
+між workers копію робить лише власник flock на <БД>.backup.lock.
+
+Налаштування (змінні оточення):
+    BACKUP_MODE           scheduler | off (off)
+    BACKUP_INTERVAL       період копій, с (86400)
+    BACKUP_DIR            каталог копій (backups поруч з БД)
+    BACKUP_KEEP           скільки останніх копій зберігати (7)
+    BACKUP_STEP_PAGES     сторінок за один крок (256)
+    BACKUP_PAUSE_MS       пауза між кроками, мс (5)
+    BACKUP_MAX_RESTARTS   перезапусків через записи до копіювання одним кроком (5)
+"""
+import atexit
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from db_writer import LeaderLock
+
+TIMESTAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class BackupRestartLimit(Exception):
+    """Джерело змінюється швидше, ніж копіюються кроки"""
+
+
+def backup_mode():
+    return os.environ.get('BACKUP_MODE', 'off').strip().lower()
+
+
+def backup_dir(db_path):
+    return os.environ.get('BACKUP_DIR') or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+
+
+def backup_name(db_path, stamp):
+    root, ext = os.path.splitext(os.path.basename(db_path))
+    return f'{root}-{stamp}{ext or ".db"}'
+
+
+def list_backups(db_path, directory=None):
+    """Копії БД у каталозі, від найстарішої до найновішої"""
+    root, ext = os.path.splitext(os.path.basename(db_path))
+    pattern = os.path.join(directory or backup_dir(db_path), f'{root}-{"[0-9]" * 8}-{"[0-9]" * 6}{ext or ".db"}')
+    return sorted(glob.glob(pattern))
+
+
+def rotate_backups(db_path, keep, directory=None):
+    """Видалити всі копії, крім keep останніх; список видалених"""
+    backups = list_backups(db_path, directory)
+    removed = backups[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _schema(conn):
+    return sorted(conn.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'").fetchall())
+
+
+def verify_backup(path, source_schema=None):
+    """(ok, повідомлення): integrity_check і, якщо задано, збіг схеми з джерелом"""
+    conn = sqlite3.connect(path)
+    try:
+        result = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if result != ['ok']:
+            return False, '; '.join(result[:5])
+        if source_schema is not None and _schema(conn) != source_schema:
+            return False, 'schema differs from source'
+        return True, 'ok'
+    finally:
+        conn.close()
+
+
+def copy_database(src_path, dest_path, step_pages=256, pause=0.005, max_restarts=5):
+    """Покрокове копіювання src_path у dest_path; статистика кроків і утримання lock'ів"""
+    stats = {'steps': 0, 'restarts': 0, 'lock_held_ms': 0.0, 'lock_held_max_ms': 0.0, 'one_shot': False}
+    state = {'mark': 0.0, 'remaining': None}
+
+    def progress(status, remaining, total):
+        held = (time.perf_counter() - state['mark']) * 1000
+        stats['steps'] += 1
+        stats['lock_held_ms'] += held
+        stats['lock_held_max_ms'] = max(stats['lock_held_max_ms'], held)
+        stats['pages'] = total
+        if state['remaining'] is not None and remaining and remaining >= state['remaining']:
+            stats['restarts'] += 1  # інше з'єднання змінило джерело — копіювання спочатку
+            if stats['restarts'] > max_restarts:
+                raise BackupRestartLimit()
+        state['remaining'] = remaining
+        if remaining and pause:
+            time.sleep(pause)
+        state['mark'] = time.perf_counter()
+
+    src = sqlite3.connect(src_path, timeout=20.0)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            source_schema = _schema(src)
+            try:
+                state['mark'] = time.perf_counter()
+                src.backup(dest, pages=max(1, int(step_pages)), progress=progress)
+            except BackupRestartLimit:
+                stats['one_shot'] = True
+                state['mark'], state['remaining'] = time.perf_counter(), None
+                src.backup(dest, pages=-1, progress=progress)
+            # копія — самодостатній файл без -wal/-shm
+            dest.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dest.close()
+    finally:
+        src.close()
+    stats['lock_held_ms'] = round(stats['lock_held_ms'], 2)
+    stats['lock_held_max_ms'] = round(stats['lock_held_max_ms'], 2)
+    stats['source_schema'] = source_schema
+    return stats
+
+
+def backup_file(src_path, directory, stamp, keep, step_pages, pause, max_restarts):
+    """Копія одного файлу БД: tmp → перевірка → остаточна назва → ротація"""
+    final_path = os.path.join(directory, backup_name(src_path, stamp))
+    tmp_path = final_path + '.tmp'
+    started = time.perf_counter()
+    try:
+        stats = copy_database(src_path, tmp_path, step_pages, pause, max_restarts)
+        ok, message = verify_backup(tmp_path, stats.pop('source_schema'))
+        if not ok:
+            raise RuntimeError(f'Backup verification failed for {src_path}: {message}')
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    stats.update({
+        'source': src_path,
+        'path': final_path,
+        'bytes': os.path.getsize(final_path),
+        'sha256': file_sha256(final_path),
+        'verified': True,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        'removed': rotate_backups(src_path, keep, directory),
+    })
+    return stats
+
+
+def backup_database(db_path=None, directory=None, keep=None, step_pages=None, pause_ms=None, max_restarts=None):
+    """Онлайн-копія БД (і архіву замовлень, якщо є); список звітів по файлах"""
+    from database import get_database_path
+    from order_archive import archive_path
+    db_path = db_path or get_database_path()
+    directory = directory or backup_dir(db_path)
+    keep = int(os.environ.get('BACKUP_KEEP', 7)) if keep is None else keep
+    step_pages = int(os.environ.get('BACKUP_STEP_PAGES', 256)) if step_pages is None else step_pages
+    pause_ms = float(os.environ.get('BACKUP_PAUSE_MS', 5)) if pause_ms is None else pause_ms
+    max_restarts = int(os.environ.get('BACKUP_MAX_RESTARTS', 5)) if max_restarts is None else max_restarts
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    sources = [db_path] + [path for path in (archive_path(db_path),) if os.path.exists(path)]
+    return [backup_file(path, directory, stamp, keep, step_pages, pause_ms / 1000.0, max_restarts)
+            for path in sources]
+
+
+def format_report(reports):
+    lines = []
+    for r in reports:
+        lines.append(
+            f"Backup {r['path']}: {r['bytes']} bytes, {r.get('pages', 0)} pages in {r['steps']} steps, "
+            f"{r['duration_ms']:.0f} ms"
+            + (f", {r['restarts']} restarts" if r['restarts'] else '')
+            + (' (finished in one step)' if r['one_shot'] else '')
+        )
+        lines.append(f"  lock held: {r['lock_held_ms']:.1f} ms total, {r['lock_held_max_ms']:.1f} ms max step")
+        lines.append(f"  verified: integrity_check ok, sha256 {r['sha256'][:16]}")
+        if r['removed']:
+            lines.append(f"  rotated: {', '.join(os.path.basename(p) for p in r['removed'])}")
+    return '\n'.join(lines)
+
+
+class BackupScheduler:
+    """Потік, що робить backup_database кожні interval секунд (лише в процесі-лідері)"""
+
+    def __init__(self, db_path, interval=86400.0):
+        self.db_path = db_path
+        self.interval = max(1.0, float(interval))
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader = LeaderLock(db_path + '.backup.lock')
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='db-backup', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._leader.release()
+
+    def _due(self):
+        # інтервал рахується від останньої копії будь-якого процесу, а не від старту worker'а
+        state = self._leader.read_state() or {}
+        return time.time() - state.get('at', 0) >= self.interval
+
+    def _run(self):
+        while not self._stop.wait(min(self.interval, 60.0)):
+            if not self._leader.try_acquire() or not self._due():
+                continue
+            try:
+                self.last_report = backup_database(self.db_path)
+                self._leader.write_state({
+                    'at': time.time(),
+                    'files': [{k: r[k] for k in ('path', 'bytes', 'duration_ms', 'lock_held_max_ms')}
+                              for r in self.last_report],
+                })
+                print(format_report(self.last_report))
+            except Exception as e:
+                print('DB backup failed:', e)
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_guard = threading.Lock()
+
+
+def ensure_backup_scheduler():
+    """Планувальник поточного процесу (створюється ліниво, заново після fork)"""
+    global _scheduler, _scheduler_pid
+    from database import get_database_path
+    if backup_mode() != 'scheduler':
+        return None
+    db_path = get_database_path()
+    scheduler = _scheduler
+    if scheduler is not None and _scheduler_pid == os.getpid() and scheduler.db_path == db_path:
+        return scheduler
+    with _scheduler_guard:
+        if _scheduler is None or _scheduler_pid != os.getpid() or _scheduler.db_path != db_path:
+            if _scheduler is not None and _scheduler_pid == os.getpid():
+                _scheduler.stop()
+            _scheduler = BackupScheduler(db_path, interval=float(os.environ.get('BACKUP_INTERVAL', 86400))).start()
+            _scheduler_pid = os.getpid()
+        return _scheduler
+
+
+def shutdown_backup_scheduler():
+    global _scheduler
+    with _scheduler_guard:
+        if _scheduler is not None and _scheduler_pid == os.getpid():
+            _scheduler.stop()
+        _scheduler = None
+
+
+atexit.register(shutdown_backup_scheduler)
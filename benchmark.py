@@ -0,0 +1,409 @@
+"""
+Відтворюваний benchmark для Flask застосунку.
+
+Створює тимчасову БД із заданими обсягами даних, проганяє основні сторінки
+та API через Flask test client, рахує p50/p95/p99 латентності та кількість
+SQL запитів на один запит і порівнює результат із закоміченим baseline.
+
+Використання:
+    python benchmark.py                       # запуск + порівняння з baseline
+    python benchmark.py --update-baseline     # перезаписати baseline
+    python benchmark.py --dishes 500 --orders 5000 --iterations 100
+    python benchmark.py --order-intake --threads 32   # груповий commit vs прямий запис
+    python benchmark.py --startup-runs 10     # точніший вимір холодного старту
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+DEFAULT_VOLUMES = {
+    'dishes': 50,
+    'accounts': 50,
+    'orders': 200,
+    'favourites': 100,
+}
+
+# Допустиме погіршення латентності відносно baseline (0.5 = +50%)
+DEFAULT_TOLERANCE = 0.5
+# Абсолютний запас (мс), щоб дрібні шуми на швидких маршрутах не давали хибних регресій
+LATENCY_SLACK_MS = 2.0
+# Те саме для часу старту процесу (імпорт залежить від кешу ФС)
+STARTUP_SLACK_MS = 50.0
+# Модулі, які не повинні імпортуватися при старті worker'а (Swagger UI — ліниво, див. apidocs.py)
+LAZY_MODULES = ('flasgger', 'jsonschema')
+
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+main.create_app()
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000.0, 'create_app_ms': (t2 - t1) * 1000.0,
+                  'eager_modules': sorted(m for m in %r if m in sys.modules)}))
+""" % (LAZY_MODULES,)
+
+
+def percentile(samples, pct):
+    """Перцентиль методом nearest-rank"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def seed_database(db_path, dishes=50, accounts=50, orders=200, favourites=100, seed=42):
+    """Наповнення БД детермінованими тестовими даними"""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.executemany(
+        'INSERT INTO dish (name, price, image, description, ingredients, calories) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f'Dish {i}', round(rnd.uniform(20, 300), 2), 'images/mini.jpg',
+          f'Description of dish {i}', 'sugar, flour, milk', rnd.randint(50, 900))
+         for i in range(1, dishes + 1)]
+    )
+    cur.executemany(
+        'INSERT INTO accounts (first_name, last_name, phone, email, avatar, bio) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f'User{i}', 'Bench', f'+38050{i:07d}', f'user{i}@bench.example', '', '')
+         for i in range(1, accounts + 1)]
+    )
+    start = datetime.datetime(2025, 1, 1)
+    order_rows = []
+    for i in range(orders):
+        items = [{'dish_id': rnd.randint(1, dishes), 'qty': rnd.randint(1, 3)}
+                 for _ in range(rnd.randint(1, 4))]
+        acct = rnd.randint(1, accounts)
+        created = (start + datetime.timedelta(minutes=37 * i)).isoformat()
+        order_rows.append((f'User{acct}', f'+38050{acct:07d}', f'Table {rnd.randint(1, 20)}',
+                           json.dumps(items), round(rnd.uniform(50, 900), 2), created, 0.0))
+    cur.executemany(
+        'INSERT INTO orders (customer_name, phone, address, items, total, created_at, discount) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        order_rows
+    )
+    pairs = set()
+    while len(pairs) < min(favourites, dishes * accounts):
+        pairs.add((rnd.randint(1, dishes), rnd.randint(1, accounts)))
+    cur.executemany('INSERT INTO favourites (dish_id, account_id) VALUES (?, ?)', sorted(pairs))
+    conn.commit()
+    conn.close()
+
+
+def _scenarios(volumes):
+    """Список (назва, метод, url, дані, сесія) для прогону"""
+    dish_id = max(1, volumes['dishes'] // 2)
+    account_id = max(1, volumes['accounts'] // 2)
+    user = {'user_id': account_id}
+    admin = {'is_admin': True}
+    order_form = {'name': 'Bench', 'phone': f'+38050{account_id:07d}', 'address': 'Table 1',
+                  'items': json.dumps([{'dish_id': dish_id, 'qty': 2}])}
+    order_json = {'name': 'Bench', 'phone': '+380500000000', 'address': 'Table 2',
+                  'items': [{'dish_id': dish_id, 'qty': 1}]}
+    return [
+        ('index', 'GET', '/', None, None),
+        ('dish', 'GET', f'/dish/{dish_id}', None, user),
+        ('order', 'GET', '/order', None, user),
+        ('admin', 'GET', '/admin', None, admin),
+        ('api_v2_dishes', 'GET', '/api/v2/dishes', None, None),
+        ('api_v2_dish', 'GET', f'/api/v2/dishes/{dish_id}', None, None),
+        ('api_v2_orders', 'GET', '/api/v2/orders', None, None),
+        ('api_v2_favourites', 'GET', f'/api/v2/favourites/{account_id}', None, None),
+        ('api_v2_accounts', 'GET', '/api/v2/accounts', None, None),
+        ('order_create', 'POST', '/order/create', order_form, user),
+        ('api_v2_order_create', 'POST', '/api/v2/orders', order_json, None),
+    ]
+
+
+def run_benchmark(volumes=None, iterations=30, warmup=3, seed=42):
+    """Прогін усіх сценаріїв на тимчасовій БД, повертає словник результатів"""
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    tmpdir = tempfile.mkdtemp(prefix='velvet-bench-')
+    db_path = os.path.join(tmpdir, 'bench.db')
+    old_path = os.environ.get('DATABASE_PATH')
+    os.environ['DATABASE_PATH'] = db_path
+    try:
+        from main import app
+        from database import init_db, CONNECTION_HOOKS
+
+        with app.app_context():
+            init_db()
+        seed_database(db_path, seed=seed, **volumes)
+        app.config['DB_INIT_DONE'] = True
+        app.config['TESTING'] = True
+
+        counter = {'n': 0}
+
+        def _trace(_statement):
+            counter['n'] += 1
+
+        def _bench_trace_queries(conn):
+            conn.set_trace_callback(_trace)
+
+        # Трасуємо всі з'єднання (read-only і read-write), відкриті під час прогону
+        CONNECTION_HOOKS.append(_bench_trace_queries)
+        results = {}
+        try:
+            client = app.test_client()
+            for name, method, url, data, sess in _scenarios(volumes):
+                with client.session_transaction() as s:
+                    s.clear()
+                    s.update(sess or {})
+                timings = []
+                queries = []
+                for i in range(warmup + iterations):
+                    counter['n'] = 0
+                    t0 = time.perf_counter()
+                    if method == 'GET':
+                        resp = client.get(url)
+                    elif isinstance(data, dict) and url.startswith('/api/'):
+                        resp = client.post(url, json=data)
+                    else:
+                        resp = client.post(url, data=data)
+                    elapsed = (time.perf_counter() - t0) * 1000.0
+                    if resp.status_code >= 500:
+                        raise RuntimeError(f'{name}: {method} {url} -> {resp.status_code}')
+                    if i >= warmup:
+                        timings.append(elapsed)
+                        queries.append(counter['n'])
+                results[name] = {
+                    'method': method,
+                    'url': url,
+                    'p50_ms': round(percentile(timings, 50), 3),
+                    'p95_ms': round(percentile(timings, 95), 3),
+                    'p99_ms': round(percentile(timings, 99), 3),
+                    'queries_per_request': round(sum(queries) / len(queries), 2),
+                }
+        finally:
+            CONNECTION_HOOKS.remove(_bench_trace_queries)
+        return {'volumes': volumes, 'iterations': iterations, 'seed': seed, 'results': results}
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        if old_path is None:
+            os.environ.pop('DATABASE_PATH', None)
+        else:
+            os.environ['DATABASE_PATH'] = old_path
+
+
+def run_order_intake_benchmark(threads=16, orders_per_thread=50, delays_ms=(1, 5, 10), durability='normal'):
+    """Порівняння прямого add_order з груповим commit через OrderQueue при конкурентних записах"""
+    import threading
+    from main import app
+    from database import init_db, add_order
+    from order_queue import OrderQueue
+
+    def one_run(label, submit):
+        tmpdir = tempfile.mkdtemp(prefix='velvet-intake-')
+        db_path = os.path.join(tmpdir, 'intake.db')
+        old_path = os.environ.get('DATABASE_PATH')
+        os.environ['DATABASE_PATH'] = db_path
+        try:
+            with app.app_context():
+                init_db()
+            seed_database(db_path, dishes=20, accounts=1, orders=0, favourites=0)
+            latencies = []
+            errors = []
+            ctx = submit('start', db_path)
+
+            def worker(n):
+                items = [{'dish_id': 1 + n % 20, 'qty': 1}]
+                for _ in range(orders_per_thread):
+                    t0 = time.perf_counter()
+                    try:
+                        submit('order', ctx, items)
+                    except Exception as e:
+                        errors.append(repr(e))
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+
+            pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+            t0 = time.perf_counter()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - t0
+            stats = submit('stop', ctx) or {}
+            total = threads * orders_per_thread
+            return {
+                'mode': label,
+                'orders_per_sec': round(total / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'errors': len(errors),
+                'batches': stats.get('batches', total),
+                'avg_batch': round(stats.get('orders', total) / max(1, stats.get('batches', total)), 2),
+            }
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            if old_path is None:
+                os.environ.pop('DATABASE_PATH', None)
+            else:
+                os.environ['DATABASE_PATH'] = old_path
+
+    def direct(action, ctx, items=None):
+        if action == 'order':
+            with app.app_context():
+                add_order('Bench', '+380500000000', 'Table 1', items, 10.0)
+        return None
+
+    def queued(delay):
+        def submit(action, ctx, items=None):
+            if action == 'start':
+                return OrderQueue(ctx, max_delay_ms=delay, durability=durability).start()
+            if action == 'order':
+                return ctx.submit('Bench', '+380500000000', 'Table 1', items, 10.0).result(timeout=60)
+            ctx.stop()
+            return ctx.stats
+        return submit
+
+    results = [one_run('direct', direct)]
+    for delay in delays_ms:
+        results.append(one_run(f'queue {delay}ms', queued(delay)))
+    return results
+
+
+def measure_startup(runs=5):
+    """Холодний старт в окремих процесах: import main (разом з app = create_app()),
+    повторний create_app() і повний час процесу; медіани за runs запусків"""
+    env = dict(os.environ, WARM_UP_ON_BOOT='0')
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', _STARTUP_PROBE], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True)
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - t0) * 1000.0
+        samples.append(sample)
+    return {
+        'runs': runs,
+        'import_ms': round(percentile([s['import_ms'] for s in samples], 50), 1),
+        'create_app_ms': round(percentile([s['create_app_ms'] for s in samples], 50), 1),
+        'process_ms': round(percentile([s['process_ms'] for s in samples], 50), 1),
+        'eager_modules': sorted({m for s in samples for m in s['eager_modules']}),
+    }
+
+
+def print_startup_report(startup):
+    print(f"startup ({startup['runs']} runs, p50): import main {startup['import_ms']:.1f} ms, "
+          f"create_app {startup['create_app_ms']:.1f} ms, process {startup['process_ms']:.1f} ms"
+          + (f", eager: {', '.join(startup['eager_modules'])}" if startup['eager_modules'] else ''))
+
+
+def print_intake_report(results):
+    print(f"{'mode':14} {'orders/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'avg batch':>10} {'errors':>7}")
+    for r in results:
+        print(f"{r['mode']:14} {r['orders_per_sec']:10.1f} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} "
+              f"{r['p99_ms']:9.2f} {r['avg_batch']:10.2f} {r['errors']:7d}")
+
+
+def compare_with_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE, check_latency=True):
+    """Повертає список регресій відносно baseline (порожній — все добре)"""
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        cur = current['results'].get(name)
+        if cur is None:
+            regressions.append(f'{name}: scenario missing')
+            continue
+        if cur['queries_per_request'] > base['queries_per_request']:
+            regressions.append(
+                f"{name}: queries/request {cur['queries_per_request']} > baseline {base['queries_per_request']}"
+            )
+        if check_latency:
+            limit = base['p95_ms'] * (1.0 + tolerance) + LATENCY_SLACK_MS
+            if cur['p95_ms'] > limit:
+                regressions.append(f"{name}: p95 {cur['p95_ms']}ms > limit {limit:.3f}ms")
+    base_startup, cur_startup = baseline.get('startup'), current.get('startup')
+    if base_startup and cur_startup:
+        for module in cur_startup['eager_modules']:
+            if module not in base_startup['eager_modules']:
+                regressions.append(f'startup: {module} is imported eagerly')
+        if check_latency:
+            for key in ('import_ms', 'create_app_ms'):
+                limit = base_startup[key] * (1.0 + tolerance) + STARTUP_SLACK_MS
+                if cur_startup[key] > limit:
+                    regressions.append(f'startup: {key} {cur_startup[key]}ms > limit {limit:.1f}ms')
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_report(report):
+    print(f"Volumes: {report['volumes']}  iterations: {report['iterations']}")
+    print(f"{'scenario':22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}")
+    for name, r in report['results'].items():
+        print(f"{name:22} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} {r['queries_per_request']:8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Velvet Bite benchmark')
+    for key, value in DEFAULT_VOLUMES.items():
+        parser.add_argument(f'--{key}', type=int, default=None, help=f'кількість ({value} за замовчуванням)')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', help='зберегти результат у JSON файл')
+    parser.add_argument('--order-intake', action='store_true',
+                        help='порівняти прямий запис замовлень з груповим commit (order_queue)')
+    parser.add_argument('--threads', type=int, default=16, help='потоків для --order-intake')
+    parser.add_argument('--startup-runs', type=int, default=5, help='запусків процесу для виміру старту (0 — не міряти)')
+    args = parser.parse_args(argv)
+
+    if args.order_intake:
+        print_intake_report(run_order_intake_benchmark(threads=args.threads,
+                                                       orders_per_thread=args.iterations))
+        return 0
+
+    volumes = {k: getattr(args, k) for k in DEFAULT_VOLUMES if getattr(args, k) is not None}
+    report = run_benchmark(volumes, iterations=args.iterations, warmup=args.warmup, seed=args.seed)
+    print_report(report)
+    if args.startup_runs > 0:
+        report['startup'] = measure_startup(args.startup_runs)
+        print_startup_report(report['startup'])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'Baseline updated: {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print('No baseline found, run with --update-baseline first')
+        return 0
+    baseline = load_baseline(args.baseline)
+    if baseline.get('volumes') != report['volumes']:
+        print('WARNING: volumes differ from baseline, latency comparison is not meaningful')
+    regressions = compare_with_baseline(report, baseline, tolerance=args.tolerance,
+                                        check_latency=baseline.get('volumes') == report['volumes'])
+    if regressions:
+        print('\nREGRESSIONS:')
+        for r in regressions:
+            print('  ' + r)
+        return 1
+    print('\nNo regressions against baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
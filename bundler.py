@@ -0,0 +1,428 @@
+"""
+Збірка статики без Node: конкатенація і мінімізація JS/CSS у бандли для сторінок
+та critical CSS для index.html.
+
+    flask --app main assets-build      (Dockerfile виконує при збірці образу)
+
+Бандли (BUNDLES) пишуться в static/dist/ разом з bundles.json — хешами вмісту
+вихідних файлів, з яких їх зібрано. Шаблони підключають статику через
+asset_css()/asset_js() (assets.py): якщо бандл зібрано з поточних файлів, сторінка
+отримує один мінімізований файл, інакше (немає збірки, файли змінились, debug з
+TEMPLATES_AUTO_RELOAD) — вихідні файли окремими тегами, як раніше.
+
+Мінімізація консервативна, без перейменувань:
+    CSS — коментарі, пробіли, останні ';' у блоках
+    JS  — коментарі, відступи, порожні рядки, пробіли навколо пунктуації; переноси
+          рядків лишаються (автоматична вставка ';' працює як у вихідному коді),
+          рядки, шаблонні рядки і regex-літерали не змінюються
+
+Critical CSS (CRITICAL): правила з бандла, селектори яких складаються лише з тегів,
+класів та id, що є у верхній частині шаблону (до маркера CRITICAL_MARKER або весь
+шаблон). Стани :hover/:focus і @keyframes, на які нічого не посилається,
+відкидаються. Вміст вбудовується в <style>, повний CSS підвантажується асинхронно.
+"""
+import gzip
+import json
+import os
+import re
+
+DIST_DIR = 'dist'
+MANIFEST_FILE = 'bundles.json'
+
+# назва бандла → вихідні файли static/ у порядку підключення
+BUNDLES = {
+    'site.css': ('style.css',),
+    'site.js': ('performance.js', 'script.js'),
+    'api_demo.js': ('api_demo.js',),
+    'kitchen.js': ('kitchen.js',),
+}
+
+# critical CSS → (бандл, шаблон)
+CRITICAL = {
+    'index.critical.css': ('site.css', 'index.html'),
+}
+CRITICAL_MARKER = '{# critical-css-end #}'
+
+STRING_RE = r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+STRING_PATTERN = re.compile(STRING_RE)
+CSS_COMMENT_RE = re.compile(rf'({STRING_RE})|/\*.*?\*/', re.S)
+CSS_TOKEN_RE = re.compile(rf'({STRING_RE})')
+CSS_PRELUDE_RE = re.compile(rf'(?:{STRING_RE}|[^{{}};"\'])*')
+INTERACTIVE_PSEUDO = (':hover', ':focus', ':active', ':visited', ':focus-within', ':focus-visible')
+# at-правила з вкладеними правилами (решта — з деклараціями, напр. @font-face)
+NESTED_AT_RULES = ('@media', '@supports', '@layer', '@container', '@document')
+
+
+# --- CSS ---
+
+def _css_strip(text):
+    """Пробіли поза рядками: один пробіл, без пробілів навколо пунктуації"""
+    parts = CSS_TOKEN_RE.split(text)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i] or '')
+        parts[i] = re.sub(r' ?([{};,>~]) ?', r'\1', part).replace(': ', ':')
+    return ''.join(p for p in parts if p).strip()
+
+
+def _css_minify_selector(selector):
+    # '+' у селекторі — комбінатор, навколо нього пробіли не потрібні (у значеннях calc() — потрібні)
+    return re.sub(r' ?\+ ?', '+', _css_strip(selector))
+
+
+def _css_minify_block(body):
+    parts = CSS_TOKEN_RE.split(_css_strip(body))
+    for i in range(0, len(parts), 2):
+        parts[i] = (parts[i] or '').replace(' :', ':')
+    body = ''.join(p for p in parts if p).rstrip(';')
+    return re.sub(r';+', ';', body)
+
+
+def _find_block_end(text, start):
+    """Індекс '}' що закриває блок, який починається після text[start-1] == '{'"""
+    depth = 1
+    i = start
+    while i < len(text):
+        c = text[i]
+        if c in '"\'':
+            m = STRING_PATTERN.match(text, i)
+            i = m.end() if m else i + 1
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(text)
+
+
+def parse_css(text):
+    """Дерево правил: ('rule', селектор, декларації) | ('at', прелюдія, [діти]) | ('stmt', текст)"""
+    text = CSS_COMMENT_RE.sub(lambda m: m.group(1) or '', text)
+    nodes = []
+    i = 0
+    while i < len(text):
+        m = CSS_PRELUDE_RE.match(text, i)
+        prelude = m.group(0).strip()
+        j = m.end()
+        if j >= len(text):
+            break
+        c = text[j]
+        if c == ';':
+            if prelude:
+                nodes.append(('stmt', prelude))
+            i = j + 1
+        elif c == '}':  # зайва дужка — пропускаємо
+            i = j + 1
+        else:
+            end = _find_block_end(text, j + 1)
+            body = text[j + 1:end]
+            if prelude.startswith(NESTED_AT_RULES) or prelude.startswith('@keyframes') \
+                    or re.match(r'@-\w+-keyframes', prelude):
+                nodes.append(('at', prelude, parse_css(body)))
+            else:
+                nodes.append(('rule', prelude, body))
+            i = end + 1
+    return nodes
+
+
+def serialize_css(nodes):
+    out = []
+    for node in nodes:
+        if node[0] == 'rule':
+            body = _css_minify_block(node[2])
+            if body:
+                out.append(f'{_css_minify_selector(node[1])}{{{body}}}')
+        elif node[0] == 'at':
+            inner = serialize_css(node[2])
+            if inner:
+                out.append(f'{_css_strip(node[1])}{{{inner}}}')
+        else:
+            out.append(_css_strip(node[1]) + ';')
+    return ''.join(out)
+
+
+def minify_css(text):
+    return serialize_css(parse_css(text))
+
+
+# --- critical CSS ---
+
+def template_vocabulary(source):
+    """Теги, класи та id з HTML шаблону (Jinja-вирази відкидаються)"""
+    source = re.sub(r'{%.*?%}|{{.*?}}|{#.*?#}', ' ', source, flags=re.S)
+    tags = {t.lower() for t in re.findall(r'<([a-zA-Z][a-zA-Z0-9-]*)', source)}
+    tags.update(('html', 'body'))
+    classes = set()
+    for value in re.findall(r'\bclass\s*=\s*"([^"]*)"|\bclass\s*=\s*\'([^\']*)\'', source):
+        classes.update(''.join(value).split())
+    ids = set(re.findall(r'\bid\s*=\s*["\']([^"\']+)["\']', source))
+    return tags, classes, ids
+
+
+def _selector_matches(selector, vocabulary):
+    tags, classes, ids = vocabulary
+    if any(pseudo in selector for pseudo in INTERACTIVE_PSEUDO):
+        return False
+    # псевдокласи з аргументами, псевдоелементи й атрибути не звужують відбір
+    selector = re.sub(r'::?[\w-]+(\([^)]*\))?|\[[^\]]*\]', '', selector)
+    for compound in re.split(r'[\s>+~]+', selector.strip()):
+        if not compound or compound == '*':
+            continue
+        tag = re.match(r'[a-zA-Z][\w-]*', compound)
+        if tag and tag.group(0).lower() not in tags:
+            return False
+        if not set(re.findall(r'\.([\w-]+)', compound)) <= classes:
+            return False
+        if not set(re.findall(r'#([\w-]+)', compound)) <= ids:
+            return False
+    return True
+
+
+def _critical_nodes(nodes, vocabulary):
+    out = []
+    for node in nodes:
+        if node[0] == 'rule':
+            selectors = [s for s in node[1].split(',') if _selector_matches(s, vocabulary)]
+            if selectors:
+                out.append(('rule', ','.join(selectors), node[2]))
+        elif node[0] == 'at' and node[1].startswith(NESTED_AT_RULES):
+            children = _critical_nodes(node[2], vocabulary)
+            if children:
+                out.append(('at', node[1], children))
+        elif node[0] == 'at':
+            out.append(node)  # @keyframes — відбираються після, за посиланнями
+        elif node[1].startswith('@charset'):
+            out.append(node)
+    return out
+
+
+def _drop_unused_keyframes(nodes, used_text):
+    out = []
+    for node in nodes:
+        if node[0] == 'at' and 'keyframes' in node[1]:
+            name = node[1].split()[-1]
+            if not re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', used_text):
+                continue
+        elif node[0] == 'at':
+            node = ('at', node[1], _drop_unused_keyframes(node[2], used_text))
+        out.append(node)
+    return out
+
+
+def critical_css(css, template_source):
+    """Мінімізований critical CSS для верхньої частини шаблону"""
+    above_fold = template_source.split(CRITICAL_MARKER, 1)[0]
+    nodes = _critical_nodes(parse_css(css), template_vocabulary(above_fold))
+    without_keyframes = serialize_css([n for n in nodes if not (n[0] == 'at' and 'keyframes' in n[1])])
+    return serialize_css(_drop_unused_keyframes(nodes, without_keyframes))
+
+
+# --- JS ---
+
+JS_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                     'void', 'throw', 'instanceof', 'yield', 'await'}
+
+
+def _is_ident(c):
+    return c.isalnum() or c in '_$' or ord(c) > 127
+
+
+def _js_tokens(source):
+    """Розбиття на ('code', текст) | ('literal', текст) без коментарів"""
+    tokens = []
+    code = []
+    brace_stack = []  # для ${ ... } у шаблонних рядках: глибина дужок на момент входу
+    depth = 0
+    i = 0
+    n = len(source)
+
+    def flush():
+        if code:
+            tokens.append(('code', ''.join(code)))
+            code.clear()
+
+    def last_significant():
+        for kind, text in reversed(tokens + [('code', ''.join(code))]):
+            stripped = text.rstrip() if kind == 'code' else text
+            if stripped:
+                return kind, stripped
+        return None, ''
+
+    def read_template(i):
+        """Від символу після '`' (або після '}' в ${}) до '`' чи '${'"""
+        start = i
+        while i < n:
+            c = source[i]
+            if c == '\\':
+                i += 2
+                continue
+            if c == '`':
+                return source[start:i + 1], i + 1, False
+            if c == '$' and i + 1 < n and source[i + 1] == '{':
+                return source[start:i + 2], i + 2, True
+            i += 1
+        return source[start:], n, False
+
+    while i < n:
+        c = source[i]
+        nxt = source[i + 1] if i + 1 < n else ''
+        if c == '/' and nxt == '/':
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        if c == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            code.append(' ')
+            continue
+        if c in '"\'':
+            j = i + 1
+            while j < n and source[j] != c:
+                if source[j] == '\\':
+                    j += 1
+                elif source[j] == '\n':
+                    break
+                j += 1
+            flush()
+            tokens.append(('literal', source[i:j + 1]))
+            i = j + 1
+            continue
+        if c == '`':
+            text, i, opened = read_template(i + 1)
+            flush()
+            tokens.append(('literal', '`' + text))
+            if opened:
+                brace_stack.append(depth)
+            continue
+        if c == '}' and brace_stack and depth == brace_stack[-1]:
+            brace_stack.pop()
+            text, i, opened = read_template(i + 1)
+            flush()
+            tokens.append(('literal', '}' + text))
+            if opened:
+                brace_stack.append(depth)
+            continue
+        if c == '/':
+            kind, prev = last_significant()
+            word = re.search(r'[\w$]+$', prev) if kind == 'code' else None
+            if not prev or (kind == 'code' and (prev[-1] in JS_REGEX_PREFIX
+                                                or (word and word.group(0) in JS_REGEX_KEYWORDS))):
+                j = i + 1
+                in_class = False
+                while j < n and source[j] != '\n':
+                    ch = source[j]
+                    if ch == '\\':
+                        j += 2
+                        continue
+                    if ch == '[':
+                        in_class = True
+                    elif ch == ']':
+                        in_class = False
+                    elif ch == '/' and not in_class:
+                        break
+                    j += 1
+                j += 1
+                while j < n and _is_ident(source[j]):  # прапорці
+                    j += 1
+                flush()
+                tokens.append(('literal', source[i:j]))
+                i = j
+                continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        code.append(c)
+        i += 1
+    flush()
+    return tokens
+
+
+def _js_compact(code):
+    lines = [re.sub(r'[ \t\f\v]+', ' ', line).strip() for line in code.split('\n')]
+    code = '\n'.join(line for line in lines if line) if '\n' in code else lines[0]
+    # пробіл зберігається лише між ідентифікаторами, між '+ +' / '- -' та біля '/'
+    return re.sub(
+        r'(?<=(.)) (?=(.))',
+        lambda m: ' ' if (_is_ident(m.group(1)) and _is_ident(m.group(2)))
+        or (m.group(1) in '+-' and m.group(2) in '+-') or '/' in (m.group(1), m.group(2)) else '',
+        code,
+    )
+
+
+def minify_js(source):
+    out = []
+    for kind, text in _js_tokens(source):
+        if kind == 'literal':
+            out.append(text)
+            continue
+        if not text.strip():
+            out.append('\n' if '\n' in text else ' ')
+            continue
+        compact = _js_compact(text)
+        # межі з літералами: перенос рядка зберігається (ASI), пробіл — лише між ідентифікаторами
+        lead = text[:len(text) - len(text.lstrip())]
+        trail = text[len(text.rstrip()):]
+        if '\n' in lead:
+            compact = '\n' + compact
+        elif lead and out and _is_ident(out[-1][-1:] or ' ') and _is_ident(compact[0]):
+            compact = ' ' + compact
+        if '\n' in trail:  # далі завжди літерал: пробіл перед лапками, '`', '/', '}' не потрібен
+            compact += '\n'
+        out.append(compact)
+    result = re.sub(r'\n{2,}', '\n', ''.join(out))
+    return result.strip() + '\n'
+
+
+# --- збірка ---
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _write_atomic(path, text):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def build_bundles(static_folder, template_folder, dist_dir=None):
+    """Збирає BUNDLES і CRITICAL у dist_dir (static/dist); {назва: статистика}"""
+    from assets import file_hash  # ті самі хеші вмісту, що й у маніфесті статики
+    dist_dir = dist_dir or os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    built = {}
+    for name, sources in BUNDLES.items():
+        texts = [_read(os.path.join(static_folder, src)) for src in sources]
+        if name.endswith('.css'):
+            output = ''.join(minify_css(text) for text in texts)
+        else:
+            # кожен файл закінчується ';' — конкатенація не склеює вирази сусідніх файлів
+            output = ';\n'.join(minify_js(text) for text in texts)
+        built[name] = output
+        _write_atomic(os.path.join(dist_dir, name), output)
+        manifest[name] = {
+            'sources': {src: file_hash(os.path.join(static_folder, src)) for src in sources},
+            'source_bytes': sum(len(text.encode('utf-8')) for text in texts),
+            'bytes': len(output.encode('utf-8')),
+            'gzip_bytes': len(gzip.compress(output.encode('utf-8'))),
+        }
+    for name, (bundle, template) in CRITICAL.items():
+        output = critical_css(built[bundle], _read(os.path.join(template_folder, template)))
+        _write_atomic(os.path.join(dist_dir, name), output)
+        manifest[name] = {
+            'sources': dict(manifest[bundle]['sources']),
+            'template': template,
+            'template_hash': file_hash(os.path.join(template_folder, template)),
+            'source_bytes': manifest[bundle]['bytes'],
+            'bytes': len(output.encode('utf-8')),
+            'gzip_bytes': len(gzip.compress(output.encode('utf-8'))),
+        }
+    _write_atomic(os.path.join(dist_dir, MANIFEST_FILE), json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
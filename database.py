@@ -1,6 +1,6 @@
 import sqlite3
 import os
-from flask import g
+from flask import g, request, has_request_context, has_app_context
 try:
     from werkzeug.security import generate_password_hash, check_password_hash
 except Exception:
@@ -25,6 +25,11 @@ except Exception:
 import json
 import datetime
 import re
+import pathlib
+from db_writer import mutation, write_mode, current_writer_connection
+from models import make_row_factory, parse_order_items
+from wal_checkpoint import wal_autocheckpoint
+from order_archive import history_reader, orders_source
 
 # --- Валідація даних ---
 def validate_email(email):
@@ -69,95 +74,275 @@ def validate_integer(value, min_val=0, max_val=999999):
         return False
 
 
+def get_database_path():
+    """Шлях до файлу БД з оточення (DATABASE_PATH)"""
+    return os.environ.get('DATABASE_PATH', 'my_database.db')
+
+
+# Викликаються для кожного нового з'єднання (напр. benchmark вішає trace callback)
+CONNECTION_HOOKS = []
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Бюджет для read-only з'єднань: читання не конкурує із записом, тож кеш/mmap більші
+READ_CACHE_SIZE_KB = 32768   # 32MB
+READ_MMAP_SIZE = 536870912   # 512MB
+
+
+def _run_connection_hooks(conn):
+    for hook in CONNECTION_HOOKS:
+        hook(conn)
+    return conn
+
+
+def connect_db(db_path=None, synchronous='NORMAL', query_only=False):
+    """Нове з'єднання з БД з налаштуваннями продуктивності (поза контекстом запиту)"""
+    db_path = db_path or get_database_path()
+    # Ensure directory exists for file path
+    try:
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+    except Exception:
+        pass
+    conn = sqlite3.connect(
+        db_path,
+        timeout=20.0,  # Збільшений timeout для concurrent requests
+        check_same_thread=False
+    )
+    conn.row_factory = make_row_factory()  # Компактні рядки-моделі (models.py) замість sqlite3.Row
+
+    # Оптимізації SQLite для продуктивності
+    cursor = conn.cursor()
+    if not query_only:
+        # діє лише для ще порожнього файлу (до journal_mode=WAL, що записує заголовок);
+        # старі БД переводить maintenance.migrate_auto_vacuum
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    cursor.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging для кращої concurrency
+    cursor.execute(f'PRAGMA synchronous={synchronous}')  # Баланс між швидкістю та безпекою
+    cursor.execute('PRAGMA cache_size=10000')  # Збільшений кеш (10MB)
+    cursor.execute('PRAGMA temp_store=MEMORY')  # Тимчасові таблиці в пам'яті
+    cursor.execute('PRAGMA mmap_size=268435456')  # Memory-mapped I/O (256MB)
+    if query_only:
+        cursor.execute('PRAGMA query_only=ON')  # Запис лише через потік-писач (db_writer)
+    else:
+        # поріг автоматичного checkpoint'а; решту робить фоновий планувальник (wal_checkpoint.py)
+        cursor.execute(f'PRAGMA wal_autocheckpoint={wal_autocheckpoint()}')
+    return _run_connection_hooks(conn)
+
+
+def connect_read_only(db_path=None):
+    """Read-only з'єднання (mode=ro + query_only) з більшим кешем і mmap"""
+    db_path = db_path or get_database_path()
+    try:
+        conn = sqlite3.connect(
+            pathlib.Path(os.path.abspath(db_path)).as_uri() + '?mode=ro',
+            uri=True,
+            timeout=20.0,
+            check_same_thread=False
+        )
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA query_only=ON')
+        cursor.execute('PRAGMA schema_version')  # перевірка, що файл справді відкрився
+    except sqlite3.OperationalError:
+        # БД ще не створена або немає доступу до -shm — звичайне з'єднання лише для читання
+        return connect_db(db_path, query_only=True)
+    conn.row_factory = make_row_factory()
+    cursor.execute(f'PRAGMA cache_size=-{READ_CACHE_SIZE_KB}')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute(f'PRAGMA mmap_size={READ_MMAP_SIZE}')
+    return _run_connection_hooks(conn)
+
+
+def read_only_requests_enabled():
+    return os.environ.get('DB_READ_ONLY_REQUESTS', '1') not in ('0', 'false', 'False')
+
+
 def get_db():
     """Підключення до бази даних з оптимізацією продуктивності"""
+    writer_conn = current_writer_connection()
+    if writer_conn is not None:
+        return writer_conn
     if 'db' not in g:
-        db_path = os.environ.get('DATABASE_PATH', 'my_database.db')
-        # Ensure directory exists for file path
-        try:
-            db_dir = os.path.dirname(db_path)
-            if db_dir:
-                os.makedirs(db_dir, exist_ok=True)
-        except Exception:
-            pass
-        g.db = sqlite3.connect(
-            db_path,
-            timeout=20.0,  # Збільшений timeout для concurrent requests
-            check_same_thread=False
-        )
-        g.db.row_factory = sqlite3.Row  # Для отримання результатів у вигляді словника
-        
-        # Оптимізації SQLite для продуктивності
-        cursor = g.db.cursor()
-        cursor.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging для кращої concurrency
-        cursor.execute('PRAGMA synchronous=NORMAL')  # Баланс між швидкістю та безпекою
-        cursor.execute('PRAGMA cache_size=10000')  # Збільшений кеш (10MB)
-        cursor.execute('PRAGMA temp_store=MEMORY')  # Тимчасові таблиці в пам'яті
-        cursor.execute('PRAGMA mmap_size=268435456')  # Memory-mapped I/O (256MB)
-        
+        g.db = connect_db(query_only=write_mode() == 'writer')
     return g.db
 
+
+def get_read_db():
+    """З'єднання для читання: read-only для безпечних HTTP методів, інакше get_db()
+
+    У POST/PUT/DELETE читання йдуть тим самим з'єднанням, що й запис,
+    щоб запит бачив власні зміни. Потоки DB executor'а asgi.py позначають свій
+    app context як read_only_session і тримають одне read-only з'єднання на потік.
+    """
+    if current_writer_connection() is not None:
+        return get_db()
+    read_only_session = has_app_context() and g.get('read_only_session', False)
+    safe_request = has_request_context() and request.method in SAFE_METHODS
+    if not (read_only_requests_enabled() and (read_only_session or safe_request)):
+        return get_db()
+    if 'read_db' not in g:
+        g.read_db = connect_read_only()
+    return g.read_db
+
+
 def close_db(e=None):
-    """Закриття з'єднання з БД"""
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    """Закриття з'єднань з БД"""
+    for key in ('db', 'read_db'):
+        db = g.pop(key, None)
+        if db is not None:
+            db.close()
 
 # --- Функції для отримання даних ---
+# Кеш каталогу страв у процесі: {'dish': ((шлях БД, версія), рядки)}. Версію в catalog_version
+# піднімають тригери на dish, тож зміна з будь-якого worker'а інвалідує кеш усіх процесів.
+_catalog_cache = {}
+
+
+def get_catalog_version(cursor):
+    """Поточна версія каталогу страв або None (БД без catalog_version)"""
+    try:
+        cursor.execute('SELECT version FROM catalog_version WHERE id = 1')
+    except sqlite3.OperationalError:
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
 def get_all_dish():
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
+    version = get_catalog_version(cursor)
+    key = (get_database_path(), version)
+    cached = _catalog_cache.get('dish')
+    if version is not None and cached is not None and cached[0] == key:
+        return list(cached[1])
     cursor.execute('SELECT * FROM dish')
     dish = cursor.fetchall()
-    return dish
+    # незакомічена транзакція може відкотитися — її версію не кешуємо
+    if version is not None and not db.in_transaction:
+        _catalog_cache['dish'] = (key, dish)
+    return list(dish)
+
+
+DISH_FIELDS = ('id', 'name', 'price', 'image', 'description', 'ingredients', 'calories')
+DISH_SORTS = {'price': 'price', 'name': 'name'}
+
+
+def build_dish_query(min_price=None, max_price=None, max_calories=None, sort=None,
+                     descending=False, fields=None, limit=None):
+    """Побудова SQL для фільтрованого списку страв (фільтри та сортування виконує SQLite)
+
+    Діапазон цін і sort=price обслуговує idx_dish_price, sort=name — idx_dish_name.
+    """
+    columns = [f for f in (fields or DISH_FIELDS) if f in DISH_FIELDS] or list(DISH_FIELDS)
+    where = []
+    params = []
+    if min_price is not None:
+        where.append('price >= ?')
+        params.append(float(min_price))
+    if max_price is not None:
+        where.append('price <= ?')
+        params.append(float(max_price))
+    if max_calories is not None:
+        where.append('calories <= ?')
+        params.append(int(max_calories))
+    query = 'SELECT ' + ', '.join(columns) + ' FROM dish'
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    if sort in DISH_SORTS:
+        direction = ' DESC' if descending else ''
+        # id як tie-breaker у тому ж напрямку — індекс вже містить rowid, тож без temp b-tree
+        query += ' ORDER BY ' + DISH_SORTS[sort] + direction + ', id' + direction
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(int(limit))
+    return query, params
+
+
+def get_dishes_filtered(**filters):
+    db = get_read_db()
+    cursor = db.cursor()
+    query, params = build_dish_query(**filters)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
 
 def get_all_orders():
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM orders')
     orders = cursor.fetchall()
     return orders
 def get_all_work():
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM work')
     work = cursor.fetchall()
     return work
 
 def get_dish_by_id(dish_id):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM dish WHERE id = ?', (dish_id,))
     return cursor.fetchone()
 
+
+def fetch_dishes_by_ids(cursor, dish_ids):
+    """Страви за списком id одним IN запитом; {id: row}"""
+    dish_ids = list(dict.fromkeys(int(i) for i in dish_ids))
+    if not dish_ids:
+        return {}
+    placeholders = ','.join('?' * len(dish_ids))
+    cursor.execute(f'SELECT * FROM dish WHERE id IN ({placeholders})', dish_ids)
+    return {row['id']: row for row in cursor.fetchall()}
+
+
+def get_dishes_by_ids(dish_ids):
+    """Страви за списком id у порядку запиту (відсутні id пропускаються)"""
+    found = fetch_dishes_by_ids(get_read_db().cursor(), dish_ids)
+    return [found[int(i)] for i in dish_ids if int(i) in found]
+
+
+def get_dish_names(dish_ids):
+    """{id: назва} для списку страв одним запитом"""
+    dish_ids = list(dish_ids)
+    if not dish_ids:
+        return {}
+    placeholders = ','.join('?' * len(dish_ids))
+    cursor = get_read_db().cursor()
+    cursor.execute(f'SELECT id, name FROM dish WHERE id IN ({placeholders})', [int(i) for i in dish_ids])
+    return {row.id: row.name for row in cursor.fetchall()}
+
 def get_all_feedback():
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM feedback')
     feedback = cursor.fetchall()
     return feedback
 
 def get_all_accounts():
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM accounts')
     accounts = cursor.fetchall()
     return accounts
 
 
-def get_all_favourites(account_id=None):
-    db = get_db()
-    cursor = db.cursor()
+def fetch_favourites(cursor, account_id=None):
     if account_id is None:
         cursor.execute('SELECT f.id, f.dish_id, d.name, d.price, d.image, f.account_id FROM favourites f LEFT JOIN dish d ON f.dish_id = d.id')
     else:
         cursor.execute('SELECT f.id, f.dish_id, d.name, d.price, d.image FROM favourites f LEFT JOIN dish d ON f.dish_id = d.id WHERE f.account_id = ?', (account_id,))
-    favs = cursor.fetchall()
-    return favs
+    return cursor.fetchall()
+
+
+def get_all_favourites(account_id=None):
+    db = get_read_db()
+    return fetch_favourites(db.cursor(), account_id)
 
 
 def get_favourite_by_dish(dish_id, account_id=None):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     if account_id is None:
         cursor.execute('SELECT * FROM favourites WHERE dish_id = ? LIMIT 1', (dish_id,))
@@ -166,30 +351,268 @@ def get_favourite_by_dish(dish_id, account_id=None):
     return cursor.fetchone()
 
 
-def delete_favourite_by_dish(dish_id, account_id=None):
-    db = get_db()
-    cursor = db.cursor()
+def remove_favourite(cursor, dish_id, account_id=None):
+    """DELETE улюбленої страви (без commit); кількість видалених рядків"""
     if account_id is None:
         cursor.execute('DELETE FROM favourites WHERE dish_id = ?', (dish_id,))
     else:
         cursor.execute('DELETE FROM favourites WHERE dish_id = ? AND account_id = ?', (dish_id, account_id))
-    db.commit()
+    removed = cursor.rowcount
+    if removed > 0:
+        _apply_favourites_delta(cursor, dish_id, -removed)
+    return removed
 
-def add_favourite(dish_id, account_id=None):
-    db = get_db()
-    cursor = db.cursor()
+
+def insert_favourite(cursor, dish_id, account_id=None):
+    """INSERT улюбленої страви без дублікатів для акаунта (без commit)"""
     if account_id is None:
         cursor.execute('INSERT INTO favourites (dish_id) VALUES (?)', (dish_id,))
     else:
         # avoid duplicate favourites for same user+dish
         cursor.execute('SELECT id FROM favourites WHERE dish_id = ? AND account_id = ?', (dish_id, account_id))
-        if cursor.fetchone() is None:
-            cursor.execute('INSERT INTO favourites (dish_id, account_id) VALUES (?, ?)', (dish_id, account_id))
+        existing = cursor.fetchone()
+        if existing is not None:
+            # lastrowid спільного курсора batch — рядок попередньої операції, не цей
+            return existing[0]
+        cursor.execute('INSERT INTO favourites (dish_id, account_id) VALUES (?, ?)', (dish_id, account_id))
+    favourite_id = cursor.lastrowid
+    _apply_favourites_delta(cursor, dish_id, 1)
+    return favourite_id
+
+
+def _apply_favourites_delta(cursor, dish_id, delta):
+    """Лічильник улюблених страви в dish_popularity (delta=-n — видалення)"""
+    cursor.execute(
+        'INSERT INTO dish_popularity (dish_id, favourites_count) VALUES (?, ?) '
+        'ON CONFLICT(dish_id) DO UPDATE SET favourites_count = favourites_count + excluded.favourites_count',
+        (dish_id, delta)
+    )
+
+
+@mutation
+def delete_favourite_by_dish(dish_id, account_id=None):
+    db = get_db()
+    remove_favourite(db.cursor(), dish_id, account_id)
     db.commit()
-    return cursor.lastrowid
+
+@mutation
+def add_favourite(dish_id, account_id=None):
+    db = get_db()
+    favourite_id = insert_favourite(db.cursor(), dish_id, account_id)
+    db.commit()
+    return favourite_id
+
+
+@mutation
+def run_in_transaction(fn, *args, **kwargs):
+    """fn(cursor, ...) в одній транзакції read-write з'єднання: commit або rollback усього"""
+    db = get_db()
+    if not db.in_transaction:
+        db.execute('BEGIN IMMEDIATE')
+    try:
+        result = fn(db.cursor(), *args, **kwargs)
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+    return result
+
+
+def _init_dish_search(cursor):
+    """Створення FTS5 індексу над dish та тригерів синхронізації"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dish_fts'")
+    existed = cursor.fetchone() is not None
+    try:
+        # external content: текст зберігається лише в dish, індекс — у dish_fts
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS dish_fts USING fts5(
+                name, description, ingredients,
+                content='dish', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite зібрано без FTS5 — search_dishes працюватиме через LIKE
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS dish_fts_ai AFTER INSERT ON dish BEGIN
+            INSERT INTO dish_fts(rowid, name, description, ingredients)
+            VALUES (new.id, new.name, new.description, new.ingredients);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS dish_fts_ad AFTER DELETE ON dish BEGIN
+            INSERT INTO dish_fts(dish_fts, rowid, name, description, ingredients)
+            VALUES ('delete', old.id, old.name, old.description, old.ingredients);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS dish_fts_au AFTER UPDATE OF name, description, ingredients ON dish BEGIN
+            INSERT INTO dish_fts(dish_fts, rowid, name, description, ingredients)
+            VALUES ('delete', old.id, old.name, old.description, old.ingredients);
+            INSERT INTO dish_fts(rowid, name, description, ingredients)
+            VALUES (new.id, new.name, new.description, new.ingredients);
+        END
+    ''')
+    if not existed:
+        cursor.execute("INSERT INTO dish_fts(dish_fts) VALUES ('rebuild')")
+
+
+def _init_catalog_version(cursor):
+    """Лічильник змін каталогу страв (для _catalog_cache), оновлюється тригерами"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS dish_catalog_{event.lower()} AFTER {event} ON dish BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+
+# Скільки останніх подій замовлень зберігає order_events (довантаження за Last-Event-ID)
+ORDER_EVENTS_KEEP = 1000
+
+
+def _init_order_events(cursor):
+    """Журнал подій замовлень для SSE (order_events.py), заповнюється тригерами на orders"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            order_id INTEGER NOT NULL,
+            old_status TEXT,
+            new_status TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    # старі події видаляє сам тригер: діапазон за первинним ключем, у тій самій транзакції
+    trim = f'DELETE FROM order_events WHERE id <= (SELECT MAX(id) FROM order_events) - {ORDER_EVENTS_KEEP};'
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS orders_event_insert AFTER INSERT ON orders BEGIN
+            INSERT INTO order_events (kind, order_id, new_status, created_at)
+            VALUES ('order_created', new.id, COALESCE(new.status, '{DEFAULT_ORDER_STATUS}'),
+                    strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+            {trim}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS orders_event_status AFTER UPDATE OF status ON orders
+        WHEN old.status IS NOT new.status BEGIN
+            INSERT INTO order_events (kind, order_id, old_status, new_status, created_at)
+            VALUES ('order_status', new.id, COALESCE(old.status, '{DEFAULT_ORDER_STATUS}'), new.status,
+                    strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+            {trim}
+        END
+    ''')
+
+
+# Таблиці, зміни яких пишуться в change_log для дельта-синхронізації (/api/v2/changes)
+CHANGE_LOG_ENTITIES = ('dish', 'orders', 'favourites')
+
+
+def _init_change_log(cursor):
+    """Журнал змін dish / orders / favourites з монотонним seq, заповнюється тригерами"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'")
+    existed = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL
+        )
+    ''')
+    # для ущільнення: останній seq кожного рядка без сортування
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_entity ON change_log(entity, entity_id, seq)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_changed ON change_log(changed_at)')
+    # compacted_seq: записи з seq <= нього могли бути видалені ущільненням (maintenance.py);
+    # клієнт з since < compacted_seq має перезавантажити колекції повністю
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            compacted_seq INTEGER NOT NULL
+        )
+    ''')
+    if not existed:
+        cursor.execute('SELECT (SELECT COUNT(*) FROM dish) + (SELECT COUNT(*) FROM orders) + (SELECT COUNT(*) FROM favourites)')
+        # рядки, що існували до журналу, в ньому не записані: since=0 для такої БД — повне перезавантаження
+        floor = 1 if cursor.fetchone()[0] else 0
+        if floor:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)", (floor,))
+        cursor.execute('INSERT OR IGNORE INTO change_log_state (id, compacted_seq) VALUES (1, ?)', (floor,))
+    for entity in CHANGE_LOG_ENTITIES:
+        for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {entity}_change_{event.lower()} AFTER {event} ON {entity} BEGIN
+                    INSERT INTO change_log (entity, entity_id, op, changed_at)
+                    VALUES ('{entity}', {row}.id, '{event.lower()}', strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+                END
+            ''')
+
+
+def _fts_query(text, prefix=True):
+    """Перетворення введеного тексту на безпечний FTS5 вираз (усі слова, префікс для останнього)"""
+    tokens = re.findall(r'\w+', text or '', re.UNICODE)
+    if not tokens:
+        return None
+    terms = ['"%s"' % t for t in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+_FTS_UNAVAILABLE_ERRORS = ('no such table: dish_fts', 'no such module: fts5')
+
+
+def _like_pattern(text):
+    """Підрядок для LIKE ... ESCAPE '\\': %, _ і \\ користувача — звичайні символи"""
+    escaped = text.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%' + escaped + '%'
+
+
+def search_dishes(text, limit=20, prefix=True):
+    """Пошук страв за назвою, описом та складом з ранжуванням bm25"""
+    match = _fts_query(text, prefix)
+    if match is None:
+        return []
+    db = get_read_db()
+    cursor = db.cursor()
+    try:
+        # назва важить більше за опис, опис — більше за склад
+        cursor.execute('''
+            SELECT d.id, d.name, d.price, d.image, d.description, d.calories,
+                   bm25(dish_fts, 10.0, 3.0, 1.0) AS rank
+            FROM dish_fts JOIN dish d ON d.id = dish_fts.rowid
+            WHERE dish_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        ''', (match, int(limit)))
+        return cursor.fetchall()
+    except sqlite3.OperationalError as e:
+        # LIKE — лише коли FTS5 недоступний (SQLite без модуля, індекс не створено);
+        # пошкоджений індекс, блокування тощо не повинні тихо вимикати ранжування
+        if str(e) not in _FTS_UNAVAILABLE_ERRORS:
+            raise
+        like = _like_pattern(text)
+        cursor.execute('''
+            SELECT id, name, price, image, description, calories, 0 AS rank FROM dish
+            WHERE name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\' OR ingredients LIKE ? ESCAPE '\\'
+            ORDER BY name LIMIT ?
+        ''', (like, like, like, int(limit)))
+        return cursor.fetchall()
+
 
 # --- Функції для ініціалізації/адміністрації ---
+@mutation
 def init_db():
+    _catalog_cache.clear()
     db = get_db()
     cursor = db.cursor()
     # Create tables if they do not exist
@@ -207,7 +630,9 @@ def init_db():
     # Створення індексів для оптимізації запитів
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_dish_price ON dish(price)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_dish_name ON dish(name)')
-    
+    _init_dish_search(cursor)
+    _init_catalog_version(cursor)
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS work (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -323,19 +748,98 @@ def init_db():
     ''')
     # Індекс для швидкого пошуку адміністраторів
     cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_username ON admin_accounts(username)')
-    
+
+    # Зведені таблиці продажів (оновлюються в тій самій транзакції, що й orders)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales_daily'")
+    sales_tables_existed = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT PRIMARY KEY,
+            orders_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_dish (
+            dish_id INTEGER PRIMARY KEY,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            orders_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_dish_quantity ON sales_dish(quantity DESC)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_status (
+            status TEXT PRIMARY KEY,
+            orders_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Лічильники популярності: скільки разів страву додали в улюблені.
+    # Замовлена кількість уже рахується інкрементно в sales_dish.quantity.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dish_popularity'")
+    popularity_existed = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dish_popularity (
+            dish_id INTEGER PRIMARY KEY,
+            favourites_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dish_popularity_favourites ON dish_popularity(favourites_count DESC)')
+
+    # Розріджена матриця спільних замовлень страва x страва (обидва напрямки пари).
+    # Покривний індекс тримає сусідів кожної страви відсортованими — top-k читається без сортування.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dish_pairs'")
+    dish_pairs_existed = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dish_pairs (
+            dish_id INTEGER NOT NULL,
+            other_id INTEGER NOT NULL,
+            orders_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dish_id, other_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dish_pairs_top ON dish_pairs(dish_id, orders_count DESC, other_id)')
+
+    # Події замовлень для SSE (після ALTER TABLE orders: тригер стежить за status)
+    _init_order_events(cursor)
+
+    # Журнал змін для /api/v2/changes
+    _init_change_log(cursor)
+
+    # Історія планового обслуговування БД (maintenance.py): що зроблено і стан файлу до/після
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            analyzed_tables INTEGER NOT NULL DEFAULT 0,
+            vacuumed_pages INTEGER NOT NULL DEFAULT 0,
+            report TEXT NOT NULL
+        )
+    ''')
+
     db.commit()
+    if not sales_tables_existed:
+        # Стара БД без зведених таблиць — заповнюємо їх з наявних замовлень
+        rebuild_sales_summary()
+    if not popularity_existed:
+        rebuild_popularity()
+    if not dish_pairs_existed:
+        rebuild_dish_pairs()
     try:
         cursor.execute("UPDATE dish SET image = CASE \
             WHEN image LIKE '/static/%' THEN substr(image, 9) \
             WHEN image LIKE 'static/%' THEN substr(image, 8) \
-            ELSE image END")
+            ELSE image END \
+            WHERE image LIKE '/static/%' OR image LIKE 'static/%'")  # без холостих UPDATE (change_log, кеш каталогу)
     except Exception:
         pass
     db.commit()
 
 
 # --- Функції для додавання даних ---
+@mutation
 def add_dish(name, price, image, description, ingredients, calories):
     """Додавання страви з валідацією"""
     # Валідація
@@ -362,6 +866,7 @@ def add_dish(name, price, image, description, ingredients, calories):
     db.commit()
     return cursor.lastrowid
 
+@mutation
 def add_work(name, phone, email, profecy):
     """Додавання заяви на роботу з валідацією"""
     name = sanitize_string(name, 200)
@@ -388,6 +893,7 @@ def add_work(name, phone, email, profecy):
     db.commit()
     return cursor.lastrowid
 
+@mutation
 def add_feedback(name, email, text):
     """Додавання відгуку з валідацією"""
     name = sanitize_string(name, 200)
@@ -411,6 +917,7 @@ def add_feedback(name, email, text):
     db.commit()
     return cursor.lastrowid
 
+@mutation
 def add_account(first_name, last_name, phone, email):
     """Додавання акаунту з валідацією"""
     first_name = sanitize_string(first_name, 100)
@@ -450,6 +957,7 @@ def add_account(first_name, last_name, phone, email):
     return cursor.lastrowid
 
 
+@mutation
 def update_account_profile(account_id, first_name, last_name, phone, email, avatar='', bio=''):
     """Оновлення профілю акаунту з валідацією"""
     first_name = sanitize_string(first_name, 100)
@@ -481,26 +989,153 @@ def update_account_profile(account_id, first_name, last_name, phone, email, avat
 
 
 def get_orders_by_phone(phone):
+    """Історія замовлень акаунта, разом з архівними (order_archive)"""
+    db = get_read_db()
+    with history_reader(db) as reader:
+        cursor = reader.cursor()
+        cursor.execute(f'SELECT * FROM {orders_source(reader)} WHERE phone = ? ORDER BY created_at DESC', (phone,))
+        return cursor.fetchall()
+
+
+
+DEFAULT_ORDER_STATUS = 'new'
+
+
+def _apply_sales_delta(cursor, created_at, status, total, items, sign=1):
+    """Оновлення зведених таблиць продажів для одного замовлення (sign=-1 — відкат)"""
+    day = (created_at or '')[:10] or 'unknown'
+    revenue = float(total or 0.0) * sign
+    cursor.execute(
+        'INSERT INTO sales_daily (day, orders_count, revenue) VALUES (?, ?, ?) '
+        'ON CONFLICT(day) DO UPDATE SET orders_count = orders_count + excluded.orders_count, '
+        'revenue = revenue + excluded.revenue',
+        (day, sign, revenue)
+    )
+    cursor.execute(
+        'INSERT INTO sales_status (status, orders_count, revenue) VALUES (?, ?, ?) '
+        'ON CONFLICT(status) DO UPDATE SET orders_count = orders_count + excluded.orders_count, '
+        'revenue = revenue + excluded.revenue',
+        (status or DEFAULT_ORDER_STATUS, sign, revenue)
+    )
+    per_dish = {}
+    for did, qty in parse_order_items(items):
+        per_dish[did] = per_dish.get(did, 0) + qty
+    cursor.executemany(
+        'INSERT INTO sales_dish (dish_id, quantity, orders_count) VALUES (?, ?, ?) '
+        'ON CONFLICT(dish_id) DO UPDATE SET quantity = quantity + excluded.quantity, '
+        'orders_count = orders_count + excluded.orders_count',
+        [(did, qty * sign, sign) for did, qty in per_dish.items()]
+    )
+
+
+# Замовлення з більшою кількістю різних страв не додають пар (O(n^2) рядків на замовлення)
+MAX_PAIR_DISHES = 30
+
+
+def _apply_pairs_delta(cursor, items, sign=1):
+    """Оновлення матриці спільних замовлень для одного замовлення (sign=-1 — відкат)"""
+    dish_ids = sorted({did for did, _qty in parse_order_items(items)})
+    if len(dish_ids) < 2 or len(dish_ids) > MAX_PAIR_DISHES:
+        return
+    cursor.executemany(
+        'INSERT INTO dish_pairs (dish_id, other_id, orders_count) VALUES (?, ?, ?) '
+        'ON CONFLICT(dish_id, other_id) DO UPDATE SET orders_count = orders_count + excluded.orders_count',
+        [(a, b, sign) for a in dish_ids for b in dish_ids if a != b]
+    )
+
+
+def _update_status_summary(cursor, old_status, new_status, total):
+    """Перенесення замовлення між статусами у sales_status"""
+    old_status = old_status or DEFAULT_ORDER_STATUS
+    new_status = new_status or DEFAULT_ORDER_STATUS
+    if old_status == new_status:
+        return
+    revenue = float(total or 0.0)
+    for status, sign in ((old_status, -1), (new_status, 1)):
+        cursor.execute(
+            'INSERT INTO sales_status (status, orders_count, revenue) VALUES (?, ?, ?) '
+            'ON CONFLICT(status) DO UPDATE SET orders_count = orders_count + excluded.orders_count, '
+            'revenue = revenue + excluded.revenue',
+            (status, sign, revenue * sign)
+        )
+
+
+@mutation
+def rebuild_sales_summary():
+    """Повний перерахунок зведених таблиць продажів з orders і архіву (backfill)"""
     db = get_db()
     cursor = db.cursor()
-    cursor.execute('SELECT * FROM orders WHERE phone = ? ORDER BY created_at DESC', (phone,))
-    return cursor.fetchall()
+    count = 0
+    # архів приєднується до початку транзакції (ATTACH у транзакції неможливий)
+    with history_reader(db) as reader:
+        read_cursor = reader.cursor()
+        read_cursor.execute(f'SELECT created_at, status, total, items FROM {orders_source(reader)}')
+        cursor.execute('DELETE FROM sales_daily')
+        cursor.execute('DELETE FROM sales_dish')
+        cursor.execute('DELETE FROM sales_status')
+        for row in read_cursor:
+            _apply_sales_delta(cursor, row['created_at'], row['status'], row['total'], row['items'])
+            count += 1
+    db.commit()
+    return count
+
 
+@mutation
+def rebuild_popularity():
+    """Повний перерахунок лічильників улюблених з таблиці favourites"""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM dish_popularity')
+    cursor.execute(
+        'INSERT INTO dish_popularity (dish_id, favourites_count) '
+        'SELECT dish_id, COUNT(*) FROM favourites WHERE dish_id IS NOT NULL GROUP BY dish_id'
+    )
+    count = cursor.rowcount
+    db.commit()
+    return count
 
 
-def add_order(customer_name, phone, address, items, total, discount=0.0):
+@mutation
+def rebuild_dish_pairs():
+    """Повний перерахунок матриці спільних замовлень з orders і архіву"""
     db = get_db()
     cursor = db.cursor()
+    count = 0
+    with history_reader(db) as reader:
+        read_cursor = reader.cursor()
+        read_cursor.execute(f'SELECT items FROM {orders_source(reader)}')
+        cursor.execute('DELETE FROM dish_pairs')
+        for row in read_cursor:
+            _apply_pairs_delta(cursor, row['items'])
+            count += 1
+    db.commit()
+    return count
+
+
+def insert_order(cursor, customer_name, phone, address, items, total, discount=0.0, created=None):
+    """INSERT замовлення разом з оновленням зведених таблиць (без commit)"""
     items_json = json.dumps(items)
-    created = datetime.datetime.utcnow().isoformat()
+    created = created or datetime.datetime.utcnow().isoformat()
     cursor.execute(
         'INSERT INTO orders (customer_name, phone, address, items, total, created_at, discount) VALUES (?, ?, ?, ?, ?, ?, ?)',
         (customer_name, phone, address, items_json, total, created, float(discount or 0.0))
     )
+    order_id = cursor.lastrowid
+    _apply_sales_delta(cursor, created, None, total, items)
+    _apply_pairs_delta(cursor, items)
+    return order_id
+
+
+@mutation
+def add_order(customer_name, phone, address, items, total, discount=0.0):
+    db = get_db()
+    cursor = db.cursor()
+    order_id = insert_order(cursor, customer_name, phone, address, items, total, discount)
     db.commit()
-    return cursor.lastrowid
+    return order_id
 
 
+@mutation
 def add_admin(username, password):
     db = get_db()
     cursor = db.cursor()
@@ -519,26 +1154,27 @@ def add_admin(username, password):
 
 
 def get_admin_by_username(username):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM admin_accounts WHERE username = ?', (username,))
     return cursor.fetchone()
 
 
 def get_account_by_email(email):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM accounts WHERE email = ?', (email,))
     return cursor.fetchone()
 
 
 def get_account_by_id(account_id):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM accounts WHERE id = ?', (account_id,))
     return cursor.fetchone()
 
 
+@mutation
 def update_account(account_id, first_name, last_name, phone, email):
     db = get_db()
     cursor = db.cursor()
@@ -547,6 +1183,7 @@ def update_account(account_id, first_name, last_name, phone, email):
     db.commit()
 
 
+@mutation
 def update_dish(dish_id, name, price, image, description, ingredients, calories):
     db = get_db()
     cursor = db.cursor()
@@ -558,12 +1195,35 @@ def update_dish(dish_id, name, price, image, description, ingredients, calories)
 
 
 def get_order_by_id(order_id):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
-    return cursor.fetchone()
+    order = cursor.fetchone()
+    if order is None:
+        # замовлення могло бути перенесене в архів (order_archive)
+        with history_reader(db) as reader:
+            source = orders_source(reader)
+            if source != 'orders':
+                order = reader.execute(f'SELECT * FROM {source} WHERE id = ?', (order_id,)).fetchone()
+    return order
+
+
+def get_active_orders(limit=100):
+    """Незавершені замовлення для сторінки кухні, новіші першими"""
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT * FROM orders WHERE COALESCE(status, 'new') != 'completed' ORDER BY id DESC LIMIT ?", (int(limit),)
+    )
+    return cursor.fetchall()
+
 
+def get_last_order_event_id():
+    db = get_read_db()
+    return db.execute('SELECT COALESCE(MAX(id), 0) FROM order_events').fetchone()[0]
 
+
+@mutation
 def update_order_status(order_id, status):
     db = get_db()
     cursor = db.cursor()
@@ -572,16 +1232,158 @@ def update_order_status(order_id, status):
         cursor.execute('ALTER TABLE orders ADD COLUMN status TEXT')
     except Exception:
         pass
+    cursor.execute('SELECT status, total FROM orders WHERE id = ?', (order_id,))
+    row = cursor.fetchone()
     cursor.execute('UPDATE orders SET status = ? WHERE id = ?', (status, order_id))
+    if row is not None:
+        _update_status_summary(cursor, row['status'], status, row['total'])
     db.commit()
 
+
+# --- Дельта-синхронізація (change_log) ---
+_CHANGE_ROWS_SQL = {
+    'dish': 'SELECT * FROM dish WHERE id IN ({marks})',
+    'orders': 'SELECT * FROM orders WHERE id IN ({marks})',
+    # та сама форма, що й у /api/v2/favourites, плюс account_id
+    'favourites': 'SELECT f.id, f.dish_id, d.name, d.price, d.image, f.account_id '
+                  'FROM favourites f LEFT JOIN dish d ON f.dish_id = d.id WHERE f.id IN ({marks})',
+}
+
+
+def get_changes(since=None, entities=CHANGE_LOG_ENTITIES, limit=500):
+    """Зміни після since — по одній, останній, на рядок, з його поточним вмістом
+
+    Повертає {'next', 'reset', 'has_more', 'changes'}. reset=True (без змін), якщо since
+    не задано або старіший за ущільнену частину журналу: клієнт перезавантажує колекції
+    і далі синхронізується з next.
+    """
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+    row = cursor.fetchone()
+    floor = cursor.execute('SELECT compacted_seq FROM change_log_state WHERE id = 1').fetchone()[0]
+    current = max(row[0] if row else 0, floor)
+    if since is None or since < floor:
+        return {'next': current, 'reset': True, 'has_more': False, 'changes': []}
+    entity_marks = ','.join('?' * len(entities))
+    # MAX(seq) з GROUP BY: op береться з того ж (останнього) запису рядка
+    cursor.execute(f'''
+        SELECT MAX(seq) AS seq, entity, entity_id, op FROM change_log
+        WHERE seq > ? AND seq <= ? AND entity IN ({entity_marks})
+        GROUP BY entity, entity_id ORDER BY seq LIMIT ?
+    ''', (int(since), current, *entities, int(limit)))
+    log = cursor.fetchall()
+    wanted = {}
+    for entry in log:
+        if entry['op'] != 'delete':
+            wanted.setdefault(entry['entity'], []).append(entry['entity_id'])
+    rows = {}
+    for entity, ids in wanted.items():
+        cursor.execute(_CHANGE_ROWS_SQL[entity].format(marks=','.join('?' * len(ids))), ids)
+        rows.update(((entity, r['id']), r) for r in cursor.fetchall())
+    changes = []
+    for entry in log:
+        data = rows.get((entry['entity'], entry['entity_id']))
+        # рядок видалено вже після межі current — для клієнта це теж видалення
+        op = 'delete' if data is None else entry['op']
+        changes.append({'seq': entry['seq'], 'entity': entry['entity'], 'id': entry['entity_id'],
+                        'op': op, 'data': data})
+    has_more = len(log) == int(limit)
+    return {'next': log[-1]['seq'] if has_more else current, 'reset': False, 'has_more': has_more,
+            'changes': changes}
+
+
+# --- Звіти продажів (зі зведених таблиць) ---
+def get_sales_daily(date_from=None, date_to=None, limit=366):
+    db = get_read_db()
+    cursor = db.cursor()
+    query = 'SELECT day, orders_count, revenue FROM sales_daily WHERE orders_count > 0'
+    params = []
+    if date_from:
+        query += ' AND day >= ?'
+        params.append(date_from)
+    if date_to:
+        query += ' AND day <= ?'
+        params.append(date_to)
+    query += ' ORDER BY day DESC LIMIT ?'
+    params.append(int(limit))
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def get_top_dishes(limit=10):
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute('''
+        SELECT s.dish_id, d.name, s.quantity, s.orders_count
+        FROM sales_dish s LEFT JOIN dish d ON d.id = s.dish_id
+        WHERE s.quantity > 0
+        ORDER BY s.quantity DESC LIMIT ?
+    ''', (int(limit),))
+    return cursor.fetchall()
+
+
+POPULAR_RANKINGS = {
+    # рейтинг: (таблиця лічильника, стовпець) — обидва з індексом за спаданням
+    'orders': ('sales_dish', 'quantity'),
+    'favourites': ('dish_popularity', 'favourites_count'),
+}
+
+
+def get_popular_dishes(by='orders', limit=6):
+    """Топ-k страв за замовленою кількістю або за улюбленими (обхід індексу, O(k))"""
+    table, column = POPULAR_RANKINGS[by]
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute(f'''
+        SELECT d.id, d.name, d.price, d.image, d.description,
+               COALESCE(s.quantity, 0) AS ordered_quantity,
+               COALESCE(p.favourites_count, 0) AS favourites_count
+        FROM {table} r
+        JOIN dish d ON d.id = r.dish_id
+        LEFT JOIN sales_dish s ON s.dish_id = r.dish_id
+        LEFT JOIN dish_popularity p ON p.dish_id = r.dish_id
+        WHERE r.{column} > 0
+        ORDER BY r.{column} DESC LIMIT ?
+    ''', (int(limit),))
+    return cursor.fetchall()
+
+
+def get_recommendations(dish_id, limit=4):
+    """Страви, які найчастіше замовляють разом з dish_id (top-k з індексу dish_pairs)"""
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute('''
+        SELECT d.id, d.name, d.price, d.image, p.orders_count
+        FROM dish_pairs p JOIN dish d ON d.id = p.other_id
+        WHERE p.dish_id = ? AND p.orders_count > 0
+        ORDER BY p.orders_count DESC, p.other_id LIMIT ?
+    ''', (dish_id, int(limit)))
+    return cursor.fetchall()
+
+
+def get_sales_by_status():
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute('SELECT status, orders_count, revenue FROM sales_status WHERE orders_count > 0 ORDER BY status')
+    return cursor.fetchall()
+
+
+def get_sales_totals():
+    db = get_read_db()
+    cursor = db.cursor()
+    cursor.execute('SELECT COALESCE(SUM(orders_count), 0) AS orders_count, COALESCE(SUM(revenue), 0) AS revenue FROM sales_daily')
+    return cursor.fetchone()
+
 # --- Функції для видалення даних ---
+@mutation
 def delete_dish(dish_id):
     db = get_db()
     cursor = db.cursor()
     cursor.execute('DELETE FROM dish WHERE id = ?', (dish_id,))
     db.commit()
 
+@mutation
 def delete_accounts(accounts_id):
     db = get_db()
     cursor = db.cursor()
@@ -0,0 +1,227 @@
+"""
+Єдиний писач SQLite для процесу.
+
+У режимі DB_WRITE_MODE=writer усі функції database.py, що змінюють дані
+(позначені декоратором @mutation), не виконуються в потоці запиту: вони
+передаються через чергу потоку-писачу, який володіє єдиним read-write
+з'єднанням процесу. Між gunicorn workers писачі координуються lock-файлом
+(fcntl.flock) — запис серіалізується явно, а не через busy timeout SQLite.
+З'єднання потоків запитів у цьому режимі працюють з PRAGMA query_only.
+
+Налаштування (змінні оточення):
+    DB_WRITE_MODE        direct | writer (за замовчуванням direct)
+    DB_WRITER_TIMEOUT    скільки секунд запит чекає на виконання запису (30)
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import wraps
+
+try:
+    import fcntl
+except ImportError:  # Windows — лише блокування в межах процесу
+    fcntl = None
+
+_local = threading.local()
+
+
+def write_mode():
+    return os.environ.get('DB_WRITE_MODE', 'direct').strip().lower()
+
+
+def current_writer_connection():
+    """З'єднання писача, якщо код виконується в потоці-писачі (інакше None)"""
+    return getattr(_local, 'conn', None)
+
+
+class WriterLock:
+    """Блокування запису: threading.Lock у процесі + flock на lock-файлі між процесами"""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self.hold_time_total = 0.0
+        self.wait_time_total = 0.0
+        self.acquisitions = 0
+        self._acquired_at = None
+
+    def __enter__(self):
+        t0 = time.perf_counter()
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._acquired_at = time.perf_counter()
+        self.wait_time_total += self._acquired_at - t0
+        self.acquisitions += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.hold_time_total += time.perf_counter() - self._acquired_at
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+        return False
+
+
+class LeaderLock:
+    """Неблокуючий flock на файлі: фонову роботу (checkpoint, обслуговування БД) серед
+    gunicorn workers виконує лише процес, що його тримає. Сам файл — місце для стану,
+    який читають інші процеси (write_state / read_state)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self):
+        if fcntl is None:  # без координації між процесами
+            return True
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)  # flock знімається разом із дескриптором
+            self._fd = None
+
+    def write_state(self, state):
+        payload = json.dumps(state).encode()
+        if self._fd is not None:
+            os.ftruncate(self._fd, 0)
+            os.pwrite(self._fd, payload, 0)
+        else:
+            with open(self.path, 'wb') as f:
+                f.write(payload)
+
+    def read_state(self):
+        try:
+            with open(self.path) as f:
+                return json.loads(f.read() or '{}')
+        except (OSError, ValueError):
+            return {}
+
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+
+
+def writer_lock(db_path):
+    """Спільний для процесу WriterLock для файлу БД"""
+    with _writer_locks_guard:
+        lock = _writer_locks.get(db_path)
+        if lock is None or lock._pid not in (None, os.getpid()):
+            lock = _writer_locks[db_path] = WriterLock(db_path + '.writer.lock')
+        return lock
+
+
+class DatabaseWriter:
+    """Потік-писач з власним read-write з'єднанням і чергою мутацій"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = writer_lock(db_path)
+        self.stats = {'mutations': 0, 'failed': 0}
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, fn, args=(), kwargs=None):
+        future = Future()
+        self._queue.put((fn, args, kwargs or {}, future))
+        return future
+
+    def _run(self):
+        from database import connect_db
+        conn = connect_db(self.db_path)
+        _local.conn = conn
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self._execute(conn, *item)
+        finally:
+            _local.conn = None
+            conn.close()
+
+    def _execute(self, conn, fn, args, kwargs, future):
+        with self.lock:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                result = fn(*args, **kwargs)
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                self.stats['failed'] += 1
+                future.set_exception(e)
+                return
+        self.stats['mutations'] += 1
+        future.set_result(result)
+
+
+_writer = None
+_writer_pid = None
+_writer_guard = threading.Lock()
+
+
+def get_writer():
+    """Писач поточного процесу (створюється ліниво, заново після fork)"""
+    global _writer, _writer_pid
+    from database import get_database_path
+    db_path = get_database_path()
+    with _writer_guard:
+        if _writer is None or _writer_pid != os.getpid() or _writer.db_path != db_path:
+            if _writer is not None and _writer_pid == os.getpid():
+                _writer.stop()
+            _writer = DatabaseWriter(db_path).start()
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def shutdown_writer():
+    global _writer
+    with _writer_guard:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.stop()
+        _writer = None
+
+
+atexit.register(shutdown_writer)
+
+
+def mutation(fn):
+    """Декоратор для функцій запису: у режимі writer виконує їх у потоці-писачі"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if write_mode() != 'writer' or current_writer_connection() is not None:
+            return fn(*args, **kwargs)
+        future = get_writer().submit(fn, args, kwargs)
+        return future.result(timeout=float(os.environ.get('DB_WRITER_TIMEOUT', 30)))
+    return wrapper
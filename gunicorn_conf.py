@@ -0,0 +1,93 @@
+"""
+Конфігурація gunicorn з preload:
+
+    gunicorn -c gunicorn_conf.py main:app
+
+GUNICORN_PRELOAD=1 (за замовчуванням): master імпортує main один раз і до fork
+будує незмінний стан — init_db, скомпільовані шаблони, кеш каталогу страв,
+відсортовану карту маршрутів — після чого викликає gc.freeze()
+(main.prepare_preload). Workers отримують ці сторінки пам'яті copy-on-write
+замість власних копій. Після fork писач БД і черга замовлень master'а
+скидаються (main.after_fork), з'єднання відкриваються заново в кожному worker'і.
+
+Пам'ять пишеться в лог на кожному етапі (GUNICORN_MEMORY_REPORT=0 — вимкнути):
+master до і після prepare_preload (прогрів + gc.freeze), worker одразу після
+fork, після ініціалізації (застосунок завантажено — без preload тут імпорт і
+прогрів у самому worker'і) і при завершенні. PSS ділить спільні сторінки між
+процесами, тож саме він і private показують виграш від preload.
+
+Налаштування (змінні оточення):
+    GUNICORN_BIND       адреса (0.0.0.0:5000)
+    GUNICORN_WORKERS    кількість workers (4)
+    GUNICORN_THREADS    потоків на worker (2)
+    GUNICORN_TIMEOUT    таймаут worker'а, с (120)
+    GUNICORN_PRELOAD    1 | 0 (1)
+    GUNICORN_MEMORY_REPORT  1 | 0 — RSS/PSS workers у лог (1)
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+accesslog = '-'
+errorlog = '-'
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+memory_report = os.environ.get('GUNICORN_MEMORY_REPORT', '1') == '1'
+
+
+def memory_usage(pid='self'):
+    """{'rss_kb', 'pss_kb', 'shared_kb', 'private_kb'} процесу з /proc (Linux), інакше лише rss_kb"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        return {
+            'rss_kb': fields.get('Rss', 0),
+            'pss_kb': fields.get('Pss', 0),
+            'shared_kb': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+            'private_kb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        }
+    except OSError:
+        import resource
+        return {'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def format_memory(usage):
+    return ' '.join(f"{key[:-3]}={value / 1024:.1f}MB" for key, value in usage.items())
+
+
+def when_ready(server):
+    # master: застосунок уже імпортовано (preload), workers ще не створені
+    if preload_app:
+        from main import app, prepare_preload
+        if memory_report:
+            server.log.info('master before preload: %s', format_memory(memory_usage()))
+        frozen = prepare_preload(app)
+        server.log.info('preload: %d objects frozen, master %s', frozen, format_memory(memory_usage()))
+
+
+def post_fork(server, worker):
+    if memory_report:
+        # сторінки master'а ще спільні: private тут — лише те, що fork уже скопіював
+        server.log.info('worker %s after fork: %s', worker.pid, format_memory(memory_usage()))
+    # SSE (/admin/events) тримає потік worker'а — хоча б один лишається для запитів
+    from order_events import set_worker_threads
+    set_worker_threads(worker.cfg.threads)
+    if preload_app:
+        from main import after_fork
+        after_fork()
+
+
+def post_worker_init(worker):
+    if memory_report:
+        worker.log.info('worker %s ready (%s): %s', worker.pid,
+                        'preloaded' if preload_app else 'app imported in worker', format_memory(memory_usage()))
+
+
+def worker_exit(server, worker):
+    if memory_report:
+        server.log.info('worker %s exiting: %s', worker.pid, format_memory(memory_usage()))
@@ -0,0 +1,178 @@
+"""
+JSON провайдер Flask для API відповідей.
+
+Використовує orjson, якщо він встановлений, інакше — заздалегідь створений
+stdlib JSONEncoder (компактні роздільники, без перевірки циклів). Списки
+рядків БД (models.Record або sqlite3.Row, результат fetchall) кодуються
+окремим швидким шляхом: назви стовпців беруться з першого рядка один раз, а
+план кодування (шаблон об'єкта з уже закодованими ключами у відсортованому
+порядку) кешується для кожного набору стовпців, тобто для кожного SQL запиту.
+
+Без orjson рядки кодуються прямо з кортежів значень за шаблоном, без
+проміжних dict. З orjson рядок перетворюється на dict через zip з кешованими
+ключами — C-кодування orjson швидше за будь-яке складання рядка в Python.
+orjson завжди пише UTF-8, тож при ensure_ascii не-ASCII символи його виводу
+екрануються як \\uXXXX (ascii_json): байти відповіді (і ETag від них) не
+залежать від того, чи встановлений orjson.
+
+    app.json = FastJSONProvider(app)   # main.py
+"""
+import json
+import math
+import re
+import sqlite3
+from json.encoder import encode_basestring_ascii
+
+from flask.json.provider import DefaultJSONProvider
+
+from models import Record
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+
+def _encode_float(value):
+    if math.isfinite(value):
+        return float.__repr__(value)
+    # як json.dumps(allow_nan=True)
+    return 'NaN' if value != value else ('Infinity' if value > 0 else '-Infinity')
+
+
+# Типи значень, які повертає SQLite (BLOB та інші — через загальний шлях)
+_SCALAR_ENCODERS = {
+    int: int.__repr__,
+    float: _encode_float,
+    str: encode_basestring_ascii,
+    type(None): lambda value: 'null',
+}
+
+
+_NON_ASCII = re.compile('[^\x00-\x7f]')
+
+
+def _escape_non_ascii(match):
+    code = ord(match.group())
+    if code < 0x10000:
+        return '\\u%04x' % code
+    code -= 0x10000  # surrogate pair, як у json.encoder
+    return '\\u%04x\\u%04x' % (0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+def ascii_json(data):
+    """UTF-8 JSON (orjson) -> ті самі байти, що й json.dumps(ensure_ascii=True)"""
+    if data.isascii():
+        return data
+    # у коректному JSON не-ASCII трапляється лише всередині рядків
+    return _NON_ASCII.sub(_escape_non_ascii, data.decode('utf-8')).encode('ascii')
+
+
+def replace_records(obj):
+    """Вкладені models.Record -> dict (stdlib json кодує підкласи tuple як масив)"""
+    if isinstance(obj, Record):
+        return obj.to_json()
+    if type(obj) is dict:
+        return {key: replace_records(value) for key, value in obj.items()}
+    if type(obj) in (list, tuple):
+        return [replace_records(value) for value in obj]
+    return obj
+
+
+def is_row_list(obj):
+    return type(obj) is list and len(obj) > 0 and (type(obj[0]) is sqlite3.Row or isinstance(obj[0], Record))
+
+
+class RowListEncoder:
+    """Кодування списку рядків одного запиту з кешованим планом на набір стовпців"""
+
+    def __init__(self, sort_keys=True, max_plans=512):
+        self.sort_keys = sort_keys
+        self.max_plans = max_plans
+        self._plans = {}
+
+    def plan(self, keys):
+        """(шаблон str.format з позиціями стовпців у відсортованому порядку ключів, ключі)"""
+        keys = tuple(keys)
+        plan = self._plans.get(keys)
+        if plan is None:
+            order = sorted(range(len(keys)), key=keys.__getitem__) if self.sort_keys else range(len(keys))
+            # рядок розпаковується у format(*values) у порядку стовпців — без itemgetter і
+            # без звернень за ключем, тому шлях однаковий для sqlite3.Row і models.Record
+            template = '{{' + ','.join(encode_basestring_ascii(keys[i]).replace('{', '{{').replace('}', '}}')
+                                       + ':{%d}' % i for i in order) + '}}'
+            plan = (template, keys)
+            if len(self._plans) >= self.max_plans:
+                self._plans.clear()
+            self._plans[keys] = plan
+        return plan
+
+    def encode(self, rows):
+        """JSON масив об'єктів без проміжних dict; None, якщо трапився тип поза SQLite"""
+        template, _keys = self.plan(rows[0].keys())
+        fmt = template.format
+        encoders = _SCALAR_ENCODERS
+        try:
+            return '[' + ','.join([fmt(*[encoders[type(v)](v) for v in row]) for row in rows]) + ']'
+        except KeyError:
+            return None
+
+    def to_dicts(self, rows):
+        """Рядки як dict (порядок ключів задає OPT_SORT_KEYS orjson)"""
+        _template, keys = self.plan(rows[0].keys())
+        return [dict(zip(keys, row)) for row in rows]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson або налаштований stdlib encoder + швидкий шлях для списків рядків БД"""
+
+    ensure_ascii = True
+    sort_keys = True
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.rows = RowListEncoder(sort_keys=self.sort_keys)
+        self._encoder = json.JSONEncoder(
+            default=self._default_with_rows,
+            ensure_ascii=self.ensure_ascii,
+            sort_keys=self.sort_keys,
+            check_circular=False,
+            separators=(',', ':'),
+        )
+
+    @classmethod
+    def _default_with_rows(cls, o):
+        if isinstance(o, Record):
+            return o.to_json()
+        if isinstance(o, sqlite3.Row):
+            return dict(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # нестандартні параметри (indent, separators, ...) — звичайний шлях Flask
+            kwargs.setdefault('default', self._default_with_rows)
+            return super().dumps(replace_records(obj), **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        """Компактний JSON у байтах (без зайвого decode/encode для orjson)"""
+        if orjson is not None:
+            if is_row_list(obj):
+                obj = self.rows.to_dicts(obj)
+            # datetime/dataclass — через default, щоб формат збігався з DefaultJSONProvider
+            option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                      | (orjson.OPT_SORT_KEYS if self.sort_keys else 0))
+            data = orjson.dumps(obj, default=self._default_with_rows, option=option)
+            return ascii_json(data) if self.ensure_ascii else data
+        if is_row_list(obj):
+            encoded = self.rows.encode(obj)
+            if encoded is not None:
+                return encoded.encode('utf-8')
+        return self._encoder.encode(replace_records(obj)).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if self._app.debug:
+            return super().response(*args, **kwargs)  # з відступами, як раніше
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
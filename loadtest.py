@@ -0,0 +1,569 @@
+"""
+Багатопроцесний генератор HTTP навантаження на основі postman_collection.json.
+
+Кожен клієнтський процес відтворює зважені сценарії (перегляд меню, сторінка
+страви, додавання/видалення улюбленої, створення замовлення, адмінські читання)
+проти localhost сервера. У кінці друкується throughput, перцентилі латентності,
+частка помилок і кількість `database is locked`, щоб підібрати
+GUNICORN_WORKERS / GUNICORN_THREADS.
+
+Використання:
+    # проти вже запущеного сервера (base_url з postman_collection.json)
+    python loadtest.py --clients 32 --duration 30
+
+    # підняти gunicorn на тимчасовій БД для кожної конфігурації workers x threads
+    python loadtest.py --gunicorn 4x2 --gunicorn 2x8 --clients 64 --duration 20
+
+    # WSGI (gunicorn main:app) проти ASGI (uvicorn asgi:app) на 256 keep-alive з'єднаннях
+    python loadtest.py --compare-async 256 --wsgi 1x8 --asgi-workers 1 --duration 20
+
+    # пам'ять workers (RSS/PSS) gunicorn_conf.py без preload і з preload, до та після навантаження
+    python loadtest.py --memory 4x2 --clients 16 --duration 10
+"""
+import argparse
+import http.cookiejar
+import json
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+
+from benchmark import percentile, seed_database, DEFAULT_VOLUMES
+
+COLLECTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'postman_collection.json')
+
+DEFAULT_WEIGHTS = {
+    'browse_menu': 40,
+    'view_dish': 30,
+    'toggle_favourite': 10,
+    'place_order': 15,
+    'admin_reads': 5,
+}
+
+LOCKED_MARKER = 'database is locked'
+
+
+def load_collection(path=COLLECTION_PATH):
+    """Запити з Postman колекції у вигляді {назва: (метод, шлях, тіло)}"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    base_url = ''
+    for var in data.get('variable', []):
+        if var.get('key') == 'base_url':
+            base_url = var.get('value', '')
+    requests_by_name = {}
+
+    def walk(items):
+        for it in items:
+            if 'item' in it:
+                walk(it['item'])
+                continue
+            req = it['request']
+            url = req['url'] if isinstance(req['url'], str) else req['url'].get('raw', '')
+            path = url.replace('{{base_url}}', '')
+            body = (req.get('body') or {}).get('raw') or None
+            requests_by_name[it['name']] = (req['method'], path, json.loads(body) if body else None)
+
+    walk(data.get('item', []))
+    return base_url, requests_by_name
+
+
+def _collection_path(collection, prefix, default):
+    """Шлях запиту з колекції, назва якого починається з prefix"""
+    for name, (_method, path, _body) in collection.items():
+        if name.startswith(prefix):
+            return path
+    return default
+
+
+def build_scenarios(collection):
+    """Сценарії — послідовності кроків (метод, шлях, json, form, потрібна сесія)"""
+    dishes_path = _collection_path(collection, 'Get All Dishes', '/api/dishes')
+    dish_path = re.sub(r'/\d+$', '/{dish_id}', _collection_path(collection, 'Get Dish by ID', '/api/dishes/1'))
+    orders_path = _collection_path(collection, 'Get Orders', '/api/orders')
+    accounts_path = _collection_path(collection, 'Get Accounts', '/api/accounts')
+    favs_path = re.sub(r'/\d+$', '/{account_id}',
+                       _collection_path(collection, 'Get Favourites for Account', '/api/favourites/1'))
+    order_body = dict(next((b for n, (m, p, b) in collection.items() if n.startswith('Create Order')), None) or {
+        'name': 'Load Test', 'phone': '380000000000', 'address': 'Table 1'})
+    return {
+        'browse_menu': [
+            ('GET', '/', None, None, None),
+            ('GET', dishes_path, None, None, None),
+        ],
+        'view_dish': [
+            ('GET', '/dish/{dish_id}', None, None, None),
+            ('GET', dish_path, None, None, None),
+        ],
+        'toggle_favourite': [
+            ('POST', '/favourite/add/{dish_id}', None, {}, 'user'),
+            ('GET', favs_path, None, None, 'user'),
+            ('POST', '/favourite/remove/{dish_id}', None, {}, 'user'),
+        ],
+        'place_order': [
+            ('POST', orders_path, {**order_body, 'items': '{items}'}, None, None),
+        ],
+        'admin_reads': [
+            ('GET', orders_path, None, None, None),
+            ('GET', accounts_path, None, None, None),
+            ('GET', '/admin', None, None, 'admin'),
+        ],
+    }
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """HTTP клієнт одного процесу з окремими cookie-сесіями для користувача та адміна"""
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.openers = {}
+
+    def opener(self, kind):
+        if kind not in self.openers:
+            jar = http.cookiejar.CookieJar()
+            self.openers[kind] = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(jar), _NoRedirect())
+        return self.openers[kind]
+
+    def request(self, method, path, json_body=None, form=None, session=None):
+        data = None
+        headers = {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener(session or 'anon').open(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self, account_index):
+        self.request('POST', '/signUp/login',
+                     form={'email': f'load{account_index}@loadtest.example',
+                           'first_name': f'Load{account_index}', 'last_name': 'Test'},
+                     session='user')
+
+    def admin_login(self, username, password):
+        self.request('POST', '/admin/login', form={'username': username, 'password': password},
+                     session='admin')
+
+
+def _client_process(worker_no, base_url, scenarios, weights, duration, dish_ids, admin_auth, seed, out_queue):
+    """Тіло клієнтського процесу: крутить сценарії до дедлайну і віддає сирі семпли"""
+    rnd = random.Random(seed + worker_no)
+    client = Client(base_url)
+    names = list(weights)
+    weight_values = [weights[n] for n in names]
+    samples = []
+    try:
+        client.login(worker_no)
+        client.admin_login(*admin_auth)
+    except Exception:
+        pass
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        scenario = rnd.choices(names, weights=weight_values)[0]
+        dish_id = rnd.choice(dish_ids) if dish_ids else 1
+        params = {'dish_id': dish_id, 'account_id': rnd.randint(1, 50)}
+        for method, path, json_body, form, session in scenarios[scenario]:
+            if json_body is not None and json_body.get('items') == '{items}':
+                json_body = {**json_body, 'items': [{'dish_id': rnd.choice(dish_ids) if dish_ids else 1,
+                                                     'qty': rnd.randint(1, 3)}
+                                                    for _ in range(rnd.randint(1, 3))]}
+            url = path.format(**params)
+            t0 = time.perf_counter()
+            error = None
+            try:
+                status, body = client.request(method, url, json_body, form, session)
+                if status >= 500:
+                    error = 'locked' if LOCKED_MARKER.encode() in body else f'http_{status}'
+                elif status >= 400:
+                    error = f'http_{status}'
+            except Exception as e:
+                status = 0
+                error = 'locked' if LOCKED_MARKER in str(e) else type(e).__name__
+            samples.append((scenario, method, path, (time.perf_counter() - t0) * 1000.0, status, error))
+    out_queue.put(samples)
+
+
+def run_load(base_url, clients=16, duration=10.0, weights=None, admin_auth=('admin', '11111'),
+             seed=1, server_log=None, collection_path=COLLECTION_PATH):
+    """Запуск clients процесів проти base_url; повертає агрегований звіт"""
+    _, collection = load_collection(collection_path)
+    scenarios = build_scenarios(collection)
+    weights = {k: v for k, v in (weights or DEFAULT_WEIGHTS).items() if v > 0 and k in scenarios}
+    try:
+        status, body = Client(base_url).request('GET', '/api/dishes')
+        dish_ids = [d['id'] for d in json.loads(body)] if status == 200 else []
+    except Exception:
+        dish_ids = []
+    log_offset = os.path.getsize(server_log) if server_log and os.path.exists(server_log) else 0
+
+    out_queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_client_process,
+                                     args=(i, base_url, scenarios, weights, duration, dish_ids,
+                                           admin_auth, seed, out_queue))
+             for i in range(clients)]
+    started = time.time()
+    for p in procs:
+        p.start()
+    samples = []
+    for _ in procs:
+        samples.extend(out_queue.get())
+    for p in procs:
+        p.join()
+    elapsed = time.time() - started
+
+    log_locked = 0
+    if server_log and os.path.exists(server_log):
+        with open(server_log, encoding='utf-8', errors='replace') as f:
+            f.seek(log_offset)
+            log_locked = f.read().count(LOCKED_MARKER)
+    return summarize(samples, elapsed, clients, log_locked)
+
+
+def summarize(samples, elapsed, clients, log_locked=0):
+    """Агрегація сирих семплів у звіт по сценаріях і загалом"""
+    def stats(rows):
+        lat = [r[3] for r in rows]
+        errors = [r for r in rows if r[5]]
+        return {
+            'requests': len(rows),
+            'rps': round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(lat, 50), 2),
+            'p95_ms': round(percentile(lat, 95), 2),
+            'p99_ms': round(percentile(lat, 99), 2),
+            'error_rate': round(len(errors) / len(rows), 4) if rows else 0.0,
+        }
+
+    by_scenario = {}
+    for row in samples:
+        by_scenario.setdefault(row[0], []).append(row)
+    errors = {}
+    for row in samples:
+        if row[5]:
+            errors[row[5]] = errors.get(row[5], 0) + 1
+    return {
+        'clients': clients,
+        'duration_s': round(elapsed, 2),
+        'total': stats(samples),
+        'scenarios': {name: stats(rows) for name, rows in sorted(by_scenario.items())},
+        'errors': errors,
+        'database_locked': errors.get('locked', 0) + log_locked,
+    }
+
+
+def print_report(report, label=''):
+    print(f"\n=== {label or 'load test'}: {report['clients']} clients, {report['duration_s']}s ===")
+    print(f"{'scenario':18} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    rows = list(report['scenarios'].items()) + [('TOTAL', report['total'])]
+    for name, s in rows:
+        print(f"{name:18} {s['requests']:9d} {s['rps']:8.1f} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} "
+              f"{s['p99_ms']:8.1f} {s['error_rate'] * 100:6.2f}%")
+    print(f"errors: {report['errors'] or '-'}")
+    print(f"database is locked: {report['database_locked']}")
+
+
+def _wait_for_health(base_url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _ = Client(base_url, timeout=2.0).request('GET', '/health')
+            if status == 200:
+                return True
+        except Exception:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def _prepare_server_db(tmpdir):
+    """Тимчасова БД зі схемою та тестовими даними для піднятого сервера"""
+    from main import app
+    from database import init_db
+    db_path = os.path.join(tmpdir, 'load.db')
+    old_path = os.environ.get('DATABASE_PATH')
+    os.environ['DATABASE_PATH'] = db_path
+    try:
+        with app.app_context():
+            init_db()
+    finally:
+        if old_path is None:
+            os.environ.pop('DATABASE_PATH', None)
+        else:
+            os.environ['DATABASE_PATH'] = old_path
+    seed_database(db_path, **DEFAULT_VOLUMES)
+    return db_path
+
+
+@contextmanager
+def _serve(cmd, db_path, env=None):
+    """Запустити сервер cmd на db_path, дочекатися /health і зупинити після блоку"""
+    env = {**os.environ, 'DATABASE_PATH': db_path, 'FLASK_ENV': 'production', **(env or {})}
+    with open(os.devnull, 'wb') as devnull:
+        proc = subprocess.Popen(cmd, env=env, stdout=devnull, stderr=devnull,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        yield proc
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _gunicorn_cmd(config, port, log_path):
+    workers, threads = (int(x) for x in config.lower().split('x'))
+    return [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--threads', str(threads),
+            '--error-logfile', log_path, 'main:app']
+
+
+def _uvicorn_cmd(workers, port):
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--no-access-log', '--log-level', 'warning']
+
+
+def run_with_gunicorn(config, port, **load_kwargs):
+    """Підняти gunicorn з конфігурацією 'WxT' на засіяній тимчасовій БД і прогнати навантаження"""
+    tmpdir = tempfile.mkdtemp(prefix='velvet-load-')
+    log_path = os.path.join(tmpdir, 'gunicorn.log')
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        db_path = _prepare_server_db(tmpdir)
+        with _serve(_gunicorn_cmd(config, port, log_path), db_path):
+            if not _wait_for_health(base_url):
+                raise RuntimeError(f'gunicorn {config} did not become healthy')
+            return run_load(base_url, server_log=log_path, **load_kwargs)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# --- Порівняння WSGI (gunicorn main:app) і ASGI (uvicorn asgi:app) на /api/v2 ---
+API_READ_PATHS = (
+    '/api/v2/dishes',
+    '/api/v2/dishes/{dish_id}',
+    '/api/v2/favourites/{account_id}',
+    '/api/v2/dishes?sort=price&fields=id,name,price',
+    '/api/v2/reports/summary',
+)
+
+
+async def _connection_loop(host, port, paths, dish_ids, deadline, rnd, samples):
+    """Одне keep-alive з'єднання, що послідовно шле GET до дедлайну"""
+    import asyncio
+    reader = writer = None
+    try:
+        while time.monotonic() < deadline:
+            path = rnd.choice(paths).format(dish_id=rnd.choice(dish_ids) if dish_ids else 1,
+                                            account_id=rnd.randint(1, 50))
+            t0 = time.perf_counter()
+            status, error = 0, None
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+                await writer.drain()
+                head = await reader.readuntil(b'\r\n\r\n')
+                status = int(head.split(b' ', 2)[1])
+                length = int(re.search(rb'(?i)content-length:\s*(\d+)', head).group(1))
+                await reader.readexactly(length)
+                if re.search(rb'(?i)connection:\s*close', head):
+                    writer.close()
+                    reader = writer = None
+                if status >= 400:
+                    error = f'http_{status}'
+            except Exception as e:
+                error = type(e).__name__
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            samples.append(('api_reads', 'GET', path, (time.perf_counter() - t0) * 1000.0, status, error))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def run_connections(base_url, connections=64, duration=10.0, paths=API_READ_PATHS, seed=1):
+    """connections одночасних keep-alive з'єднань з одного asyncio клієнта; повертає звіт"""
+    import asyncio
+    parsed = urllib.parse.urlsplit(base_url)
+    try:
+        status, body = Client(base_url).request('GET', '/api/v2/dishes?fields=id')
+        dish_ids = [d['id'] for d in json.loads(body)] if status == 200 else []
+    except Exception:
+        dish_ids = []
+    samples = []
+
+    async def drive():
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            _connection_loop(parsed.hostname, parsed.port or 80, paths, dish_ids, deadline,
+                             random.Random(seed + i), samples)
+            for i in range(connections)))
+
+    started = time.time()
+    asyncio.run(drive())
+    return summarize(samples, time.time() - started, connections)
+
+
+def run_async_comparison(connections=64, duration=10.0, wsgi='1x8', asgi_workers=1, port=5055):
+    """Та сама БД і той самий набір /api/v2 читань: gunicorn WxT проти uvicorn asgi:app"""
+    tmpdir = tempfile.mkdtemp(prefix='velvet-async-')
+    base_url = f'http://127.0.0.1:{port}'
+    reports = {}
+    try:
+        db_path = _prepare_server_db(tmpdir)
+        servers = (
+            (f'wsgi gunicorn {wsgi}', _gunicorn_cmd(wsgi, port, os.path.join(tmpdir, 'gunicorn.log'))),
+            (f'asgi uvicorn x{asgi_workers}', _uvicorn_cmd(asgi_workers, port)),
+        )
+        for label, cmd in servers:
+            with _serve(cmd, db_path):
+                if not _wait_for_health(base_url):
+                    raise RuntimeError(f'{label} did not become healthy')
+                reports[label] = run_connections(base_url, connections, duration)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return reports
+
+
+# --- Пам'ять workers: gunicorn_conf.py з GUNICORN_PRELOAD=0 проти 1 ---
+def _worker_pids(master_pid):
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory_snapshot(master_pid):
+    from gunicorn_conf import memory_usage
+    workers = {pid: memory_usage(pid) for pid in _worker_pids(master_pid)}
+    return {'master': memory_usage(master_pid), 'workers': workers,
+            'total_pss_kb': memory_usage(master_pid).get('pss_kb', 0)
+                            + sum(w.get('pss_kb', 0) for w in workers.values())}
+
+
+def run_memory_comparison(config='4x2', port=5055, **load_kwargs):
+    """RSS/PSS master'а і кожного worker'а після старту та після навантаження, preload вимкнено/увімкнено"""
+    workers, threads = (int(x) for x in config.lower().split('x'))
+    tmpdir = tempfile.mkdtemp(prefix='velvet-memory-')
+    base_url = f'http://127.0.0.1:{port}'
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', 'main:app']
+    reports = {}
+    try:
+        db_path = _prepare_server_db(tmpdir)
+        for preload in ('0', '1'):
+            env = {'GUNICORN_PRELOAD': preload, 'GUNICORN_MEMORY_REPORT': '0', 'GUNICORN_BIND': f'127.0.0.1:{port}',
+                   'GUNICORN_WORKERS': str(workers), 'GUNICORN_THREADS': str(threads)}
+            label = f"gunicorn {config} preload={'on' if preload == '1' else 'off'}"
+            with _serve(cmd, db_path, env=env) as proc:
+                if not _wait_for_health(base_url):
+                    raise RuntimeError(f'{label} did not become healthy')
+                time.sleep(1.0)  # усі workers завантажені
+                before = _memory_snapshot(proc.pid)
+                load = run_load(base_url, **load_kwargs)
+                reports[label] = {'before': before, 'after': _memory_snapshot(proc.pid),
+                                  'requests_per_sec': load['total']['rps']}
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return reports
+
+
+def print_memory_report(reports):
+    def mb(kb):
+        return f'{kb / 1024:7.1f}'
+    for label, report in reports.items():
+        print(f'\n=== {label} ({report["requests_per_sec"]:.0f} req/s) ===')
+        print(f"{'process':>16} {'stage':>7} {'rss MB':>7} {'pss MB':>7} {'shared':>7} {'private':>7}")
+        for stage in ('before', 'after'):
+            snapshot = report[stage]
+            rows = [('master', snapshot['master'])] + [(f'worker {pid}', usage)
+                                                      for pid, usage in sorted(snapshot['workers'].items())]
+            for name, usage in rows:
+                print(f"{name:>16} {stage:>7} {mb(usage.get('rss_kb', 0))} {mb(usage.get('pss_kb', 0))} "
+                      f"{mb(usage.get('shared_kb', 0))} {mb(usage.get('private_kb', 0))}")
+            print(f"{'total PSS':>16} {stage:>7} {'':7} {mb(snapshot['total_pss_kb'])}")
+
+
+def parse_weights(value):
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in filter(None, (value or '').split(',')):
+        key, _, num = part.partition('=')
+        if key.strip() not in DEFAULT_WEIGHTS:
+            raise argparse.ArgumentTypeError(f'unknown scenario: {key}')
+        weights[key.strip()] = int(num)
+    return weights
+
+
+def main(argv=None):
+    base_url, _ = load_collection()
+    parser = argparse.ArgumentParser(description='Velvet Bite HTTP load generator')
+    parser.add_argument('--base-url', default=base_url or 'http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=16, help='кількість клієнтських процесів')
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд на прогін')
+    parser.add_argument('--weights', type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help='напр. browse_menu=50,place_order=30')
+    parser.add_argument('--admin', default='admin:11111', help='username:password')
+    parser.add_argument('--server-log', help='лог gunicorn для підрахунку "database is locked"')
+    parser.add_argument('--gunicorn', action='append', metavar='WxT',
+                        help='підняти gunicorn з W workers x T threads (можна повторювати)')
+    parser.add_argument('--port', type=int, default=5055, help='порт для --gunicorn / --compare-async')
+    parser.add_argument('--compare-async', type=int, metavar='CONNECTIONS',
+                        help='порівняти gunicorn main:app і uvicorn asgi:app на /api/v2 читаннях '
+                             'з CONNECTIONS одночасних keep-alive з\'єднань')
+    parser.add_argument('--wsgi', default='1x8', metavar='WxT', help='конфігурація gunicorn для --compare-async')
+    parser.add_argument('--asgi-workers', type=int, default=1, help='workers uvicorn для --compare-async')
+    parser.add_argument('--memory', metavar='WxT',
+                        help="пам'ять workers gunicorn_conf.py без preload і з preload (RSS/PSS до та після)")
+    parser.add_argument('--output', help='зберегти звіт(и) у JSON')
+    args = parser.parse_args(argv)
+
+    load_kwargs = {'clients': args.clients, 'duration': args.duration, 'weights': args.weights,
+                   'admin_auth': tuple(args.admin.split(':', 1))}
+    reports = {}
+    if args.compare_async:
+        reports = run_async_comparison(args.compare_async, args.duration, args.wsgi,
+                                       args.asgi_workers, args.port)
+        for label, report in reports.items():
+            print_report(report, label=label)
+    elif args.memory:
+        reports = run_memory_comparison(args.memory, args.port, **load_kwargs)
+        print_memory_report(reports)
+    elif args.gunicorn:
+        for config in args.gunicorn:
+            reports[config] = run_with_gunicorn(config, args.port, **load_kwargs)
+            print_report(reports[config], label=f'gunicorn {config}')
+    else:
+        reports[args.base_url] = run_load(args.base_url, server_log=args.server_log, **load_kwargs)
+        print_report(reports[args.base_url], label=args.base_url)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,14 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 from flask import jsonify
+from jinja2 import FileSystemBytecodeCache
+import click
 import os
 import traceback
 import sys
 import secrets
 import hashlib
+import time
+import gc
 from functools import wraps
 from datetime import datetime, timedelta
 from collections import defaultdict
@@ -14,22 +18,59 @@ from database import (
     close_db, init_db, add_favourite, get_all_favourites, add_order, get_all_orders,
     add_admin, get_admin_by_username, check_password_hash,
     get_account_by_email, get_account_by_id, update_account, update_dish,
-    get_order_by_id, update_order_status,
+    get_order_by_id, update_order_status, get_active_orders, get_last_order_event_id,
     get_favourite_by_dish, delete_favourite_by_dish,
-    update_account_profile, get_orders_by_phone
+    update_account_profile, get_orders_by_phone, rebuild_sales_summary,
+    get_popular_dishes, rebuild_popularity, get_recommendations, rebuild_dish_pairs, get_dish_names
 )
 
-import json
-
-app = Flask(__name__)
+from order_queue import place_order, shutdown_order_queue, OrderQueueTimeout, OrderPending
+from db_writer import shutdown_writer
+from wal_checkpoint import ensure_checkpoint_scheduler, shutdown_checkpoint_scheduler, wal_status
+from maintenance import (
+    ensure_maintenance_scheduler, shutdown_maintenance_scheduler, run_maintenance, format_report
+)
+from json_provider import FastJSONProvider
+from api import api_v1_bp, api_v2_bp, api_bp
+from apidocs import LazyApiDocs
+from bundler import build_bundles
+from order_archive import archive_orders, archive_after_days, archive_stats
+import backup
+from order_events import get_broker, event_stream, max_event_clients, notify_order_events, shutdown_order_events
+import assets
 
-# Compression для зменшення розміру відповідей
 try:
     from flask_compress import Compress
-    Compress(app)
-    print('Flask-Compress: Enabled')
-except ImportError:
-    print('Flask-Compress: Not available (install with: pip install flask-compress)')
+except ImportError:  # pip install flask-compress
+    Compress = None
+
+import json
+
+
+
+class RouteTable:
+    """Маршрути сторінок: збираються при імпорті модуля, реєструються в create_app
+
+    На відміну від Blueprint, endpoint'и лишаються без префікса (url_for('admin')).
+    """
+
+    def __init__(self):
+        self.routes = []
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self.routes.append((rule, view, options))
+            return view
+        return decorator
+
+    def init_app(self, app):
+        for rule, view, options in self.routes:
+            app.add_url_rule(rule, view.__name__, view, **options)
+
+
+pages = RouteTable()
+# CLI команди (cli_group=None — на верхньому рівні: flask --app main <команда>)
+commands = Blueprint('commands', __name__, cli_group=None)
 
 # Simple in-memory cache для статичних даних
 _cache = {}
@@ -99,29 +140,12 @@ def validate_csrf_token():
     request_token = request.form.get('csrf_token') or request.headers.get('X-CSRF-Token')
     return token == request_token
 
-# Робимо CSRF токен доступним у всіх шаблонах
-app.jinja_env.globals['csrf_token'] = generate_csrf_token
-
 # Configuration from environment
-app.secret_key = os.environ.get('FLASK_SECRET', secrets.token_hex(32))
-app.config['ENV'] = os.environ.get('FLASK_ENV', 'production')
-
-# Production security settings
-is_production = app.config['ENV'] == 'production'
-app.config['DEBUG'] = False if is_production else os.environ.get('FLASK_DEBUG', '0') == '1'
-
-from datetime import timedelta
-app.permanent_session_lifetime = timedelta(days=30)
+is_production = os.environ.get('FLASK_ENV', 'production') == 'production'
 
-# Session cookie settings - secure in production
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['SESSION_COOKIE_SECURE'] = is_production  # HTTPS only in production
 
-# Additional security headers
-@app.after_request
 def set_security_headers(response):
-    if is_production:
+    if current_app.config['ENV'] == 'production':
         response.headers['X-Content-Type-Options'] = 'nosniff'
         response.headers['X-Frame-Options'] = 'SAMEORIGIN'
         response.headers['X-XSS-Protection'] = '1; mode=block'
@@ -130,7 +154,6 @@ def set_security_headers(response):
 
 
 # Temporary global exception handler to surface tracebacks for debugging
-@app.errorhandler(Exception)
 def _debug_all_exceptions(err):
     # Print traceback to console so user running the server can see it
     tb = traceback.format_exc()
@@ -141,54 +164,80 @@ def _debug_all_exceptions(err):
     except Exception:
         pass
     # Return traceback in response when debugging to help local dev (avoid in production)
-    if app.config.get('DEBUG'):
+    if current_app.config.get('DEBUG'):
         return ("Internal Server Error\n\n" + tb), 500
     return ("Internal Server Error"), 500
 
-# Ensure DB connection is closed after each request
-app.teardown_appcontext(close_db)
-
-# Initialize Swagger documentation (Flasgger) and register blueprints (with debug output)
-try:
-    from flasgger import Swagger
-    Swagger(app)
-    print('flasgger: OK, Swagger UI should be available at /apidocs')
-except Exception as e:
-    print('flasgger: not available or failed to initialize:', e)
 
-# Register versioned API blueprints
-try:
-    from api import api_v1_bp, api_v2_bp
+def create_app(config=None):
+    """Фабрика застосунку: налаштування з оточення, поверх них — config (dict)
+
+    Нічого важкого на старті: Swagger UI (Flasgger) ініціалізується при першому
+    зверненні до /apidocs (apidocs.LazyApiDocs), маршрути друкуються лише в debug.
+    """
+    app = Flask(__name__)
+    # orjson / налаштований stdlib encoder і швидкий шлях для списків рядків БД
+    app.json = FastJSONProvider(app)
+
+    config = dict(config or {})
+    app.secret_key = os.environ.get('FLASK_SECRET', secrets.token_hex(32))
+    app.config['ENV'] = config.pop('ENV', os.environ.get('FLASK_ENV', 'production'))
+    production = app.config['ENV'] == 'production'
+    app.config['DEBUG'] = False if production else os.environ.get('FLASK_DEBUG', '0') == '1'
+    app.permanent_session_lifetime = timedelta(days=30)
+    # Session cookie settings - secure in production
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['SESSION_COOKIE_SECURE'] = production  # HTTPS only in production
+    app.config['JINJA_CACHE_DIR'] = os.environ.get('JINJA_CACHE_DIR', '')
+    app.config.update(config)
+
+    # Compression для зменшення розміру відповідей
+    if Compress is not None:
+        Compress(app)
+
+    # Шаблони: без перевірки mtime файлів на кожен рендер поза debug, скомпільований байткод
+    # зберігається на диску (JINJA_CACHE_DIR, off — вимкнути) і спільний для всіх workers
+    app.config['TEMPLATES_AUTO_RELOAD'] = app.config['DEBUG']
+    app.jinja_env.auto_reload = app.config['TEMPLATES_AUTO_RELOAD']
+    cache_dir = app.config['JINJA_CACHE_DIR']
+    if cache_dir.lower() != 'off':
+        try:
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir or None)
+        except Exception as e:
+            print('Jinja bytecode cache disabled:', e)
+    # Робимо CSRF токен доступним у всіх шаблонах
+    app.jinja_env.globals['csrf_token'] = generate_csrf_token
+    # static_url() з хешем вмісту і /sw.js з precache-маніфестом
+    assets.init_app(app)
+
+    app.after_request(set_security_headers)
+    app.register_error_handler(Exception, _debug_all_exceptions)
+    # Ensure DB connection is closed after each request
+    app.teardown_appcontext(close_db)
+    app.before_request(startup)
+
+    pages.init_app(app)
     app.register_blueprint(api_v1_bp)
     app.register_blueprint(api_v2_bp)
-    # also register legacy non-versioned API if present
-    try:
-        from api import api_bp as api_legacy_bp
-        app.register_blueprint(api_legacy_bp)
-    except Exception:
-        pass
-except Exception as e:
-    print('Error importing versioned API blueprints:', e)
-    try:
-        from api import api_bp
-        app.register_blueprint(api_bp)
-    except Exception as e2:
-        print('Fallback legacy api import failed:', e2)
+    app.register_blueprint(api_bp)  # legacy non-versioned API
+    app.register_blueprint(commands)
+    LazyApiDocs(app)
 
-# Print registered routes on startup for easier debugging
-try:
-    print('Registered routes:')
-    for r in app.url_map.iter_rules():
-        methods = ",".join(sorted(m for m in r.methods if m not in ("HEAD","OPTIONS")))
-        print(f"{methods:12}  {r.rule}  ->  {r.endpoint}")
-except Exception:
-    pass
+    if app.debug:
+        print('Registered routes:')
+        for r in app.url_map.iter_rules():
+            methods = ",".join(sorted(m for m in r.methods if m not in ("HEAD", "OPTIONS")))
+            print(f"{methods:12}  {r.rule}  ->  {r.endpoint}")
+    return app
 
 
 # Initialize DB and create a default admin once before handling requests
-# Use before_request with a one-time flag for compatibility with older Flask
-@app.before_request
+# (before_request with a one-time flag, registered in create_app)
 def startup():
+    app = current_app
     if not app.config.get('DB_INIT_DONE'):
         try:
             with app.app_context():
@@ -198,30 +247,88 @@ def startup():
         except Exception:
             pass
         app.config['DB_INIT_DONE'] = True
+    # фоновий checkpoint WAL, обслуговування і резервні копії: по потоку на процес, після fork — нові
+    ensure_checkpoint_scheduler()
+    ensure_maintenance_scheduler()
+    backup.ensure_backup_scheduler()
+
+
+def precompile_templates(app):
+    """Компіляція всіх шаблонів у кеш Jinja (і байткоду на диск); кількість шаблонів"""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app):
+    """Прогрів worker'а до прийому трафіку: init_db, шаблони, кеш каталогу страв, маніфест статики"""
+    started = time.perf_counter()
+    with app.app_context():
+        startup()
+        templates = precompile_templates(app)
+        dishes = len(get_all_dish())
+        app.extensions['assets'].load()
+    print(f'Warm-up: {templates} templates, {dishes} dishes cached in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+
+def prepare_preload(app):
+    """gunicorn preload: незмінний стан будується в master до fork (gunicorn_conf.py)
+
+    Після прогріву (шаблони, кеш каталогу) карта маршрутів сортується заздалегідь,
+    потоки й з'єднання master'а закриваються, а gc.freeze() переносить усі наявні
+    об'єкти в постійне покоління: збирач сміття у workers їх не обходить і не
+    пише в їхні заголовки, тож сторінки лишаються спільними (copy-on-write).
+    """
+    warm_up(app)
+    app.url_map.update()
+    shutdown_writer()
+    shutdown_order_queue()
+    shutdown_checkpoint_scheduler()
+    shutdown_maintenance_scheduler()
+    backup.shutdown_backup_scheduler()
+    shutdown_order_events()
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def after_fork():
+    """У worker'і після fork: писач і черга замовлень master'а не успадковуються —
+    з'єднання з БД відкриються заново при першому зверненні"""
+    shutdown_writer()
+    shutdown_order_queue()
+    shutdown_checkpoint_scheduler()
+    shutdown_maintenance_scheduler()
+    backup.shutdown_backup_scheduler()
+    shutdown_order_events()
 
 
 # Health check endpoint for container orchestration
-@app.route('/health')
+@pages.route('/health')
 def health_check():
     try:
         # simple DB check
-        from database import get_db
-        db = get_db()
+        from database import get_read_db, get_database_path
+        db = get_read_db()
         cursor = db.cursor()
         cursor.execute('SELECT 1')
         _ = cursor.fetchone()
-        return jsonify(status='ok'), 200
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        return jsonify(status='ok', wal=wal_status(get_database_path(), page_size)), 200
     except Exception as e:
         return jsonify(status='error', message=str(e)), 500
 
 # --- Головна сторінка ---
-@app.route('/')
+@pages.route('/')
 def index():
     dish = get_all_dish()
-    return render_template('index.html', menu_items=dish)
+    # Популярне: топ за замовленнями, для нової БД без замовлень — за улюбленими
+    popular = get_popular_dishes('orders', 3) or get_popular_dishes('favourites', 3)
+    return render_template('index.html', menu_items=dish, popular_items=popular)
 
 # --- Сторінка окремої страви ---
-@app.route('/dish/<int:dish_id>')
+@pages.route('/dish/<int:dish_id>')
 def dish(dish_id):
     dish = get_dish_by_id(dish_id)
     # determine if dish is in favourites
@@ -231,104 +338,63 @@ def dish(dish_id):
     if user_id:
         fav = get_favourite_by_dish(dish_id, user_id)
         is_fav = bool(fav)
-    return render_template('dish.html', dish=dish, is_fav=is_fav)
+    recommendations = get_recommendations(dish_id) if dish else []
+    return render_template('dish.html', dish=dish, is_fav=is_fav, recommendations=recommendations)
 
 # --- Сторінка "Про нас" ---
-@app.route('/about')
+@pages.route('/about')
 def about():
     return render_template('about.html')
 
 # --- Сторінка "Наші послуги" ---
-@app.route('/service')
+@pages.route('/service')
 def service():
     return render_template('service.html')
 
 # --- Сторінка "Наші локації" ---
-@app.route('/locate')
+@pages.route('/locate')
 def locate():
     return render_template('locate.html')
 
 # --- Сторінка "Приєднуйся до нас" ---
-@app.route('/work')
+@pages.route('/work')
 def work():
     work = get_all_work()
     return render_template('work.html', work=work)
 
+
+def orders_with_items_text(orders):
+    """Замовлення з items_text ("Лате x2, Чізкейк x1"): назви всіх страв одним запитом"""
+    orders = list(orders)
+    names = get_dish_names({did for o in orders for did, _qty in o.parsed_items})
+    return [o.extend(items_text=', '.join(f"{names.get(did, f'#{did}')} x{qty}" for did, qty in o.parsed_items))
+            for o in orders]
+
+
 # --- Сторінка "Замовлення" ---
-@app.route('/order')
+@pages.route('/order')
 def order():
     # Show order creation UI and user's past orders (by phone) when available
     user_id = session.get('user_id')
     user_orders = []
+    account = None
     if user_id:
-        acct = get_account_by_id(user_id)
-        # sqlite3.Row doesn't implement .get(), use mapping access safely
-        acct_phone = None
-        if acct is not None:
-            try:
-                acct_phone = acct['phone']
-            except Exception:
-                acct_phone = None
+        account = get_account_by_id(user_id)
+        acct_phone = account.get('phone') if account is not None else None
         if acct_phone:
-            raw_orders = get_orders_by_phone(acct_phone)
-            # build items_text like admin view
-            for o in raw_orders:
-                items_text = ''
-                try:
-                    items = json.loads(o['items']) if 'items' in o.keys() else json.loads(o[4])
-                except Exception:
-                    items = []
-                parts = []
-                for it in items:
-                    try:
-                        # support multiple possible item formats
-                        did = None
-                        if isinstance(it, dict):
-                            did = it.get('dish_id') or it.get('id') or it.get('dish')
-                            qty = int(it.get('qty', 1))
-                        else:
-                            try:
-                                if isinstance(it, (list, tuple)) and len(it) > 0:
-                                    did = it[0]
-                                    qty = int(it[1]) if len(it) > 1 else 1
-                                else:
-                                    did = int(it)
-                                    qty = 1
-                            except Exception:
-                                did = None
-                                qty = 1
-                        try:
-                            did_int = int(did)
-                        except Exception:
-                            did_int = None
-                        if did_int is not None:
-                            d = get_dish_by_id(did_int)
-                            name = d['name'] if d and 'name' in d.keys() else f"#{did_int}"
-                        else:
-                            name = str(did or '#')
-                    except Exception:
-                        name = f"#{it}"
-                        qty = 1
-                    parts.append(f"{name} x{qty}")
-                items_text = ', '.join(parts)
-                od = dict(o)
-                od['items_text'] = items_text
-                user_orders.append(od)
+            user_orders = orders_with_items_text(get_orders_by_phone(acct_phone))
     # pass dish list so order page can show a picker and prices
     dishes = get_all_dish()
     # allow preselecting a dish via query params
     pre_dish = request.args.get('dish_id')
     pre_qty = request.args.get('qty')
-    account = None
-    if user_id:
-        account = get_account_by_id(user_id)
     return render_template('order.html', orders=user_orders, dishes=dishes, pre_dish=pre_dish, pre_qty=pre_qty, account=account)
 
 # --- Сторінка "Улюблені страви" ---
 # (Route implemented further down with DB-backed favourites)
 
 # --- Сторінка "Адмін" ---
-@app.route('/admin')
+@pages.route('/admin')
 def admin():
     # Require admin login
     if not session.get('is_admin'):
@@ -338,58 +404,12 @@ def admin():
     feedback = get_all_feedback()
     work = get_all_work()
     orders = get_all_orders()
-    # Build a human-readable items text for each order (dish names)
-    orders_display = []
-    for o in orders:
-        items_text = ''
-        try:
-            items = json.loads(o['items']) if 'items' in o.keys() else json.loads(o[4])
-        except Exception:
-            items = []
-        parts = []
-        for it in items:
-            try:
-                # support multiple possible item formats
-                did = None
-                if isinstance(it, dict):
-                    did = it.get('dish_id') or it.get('id') or it.get('dish')
-                    qty = int(it.get('qty', 1))
-                else:
-                    # could be a plain id or [id,qty]
-                    try:
-                        if isinstance(it, (list, tuple)) and len(it) > 0:
-                            did = it[0]
-                            qty = int(it[1]) if len(it) > 1 else 1
-                        else:
-                            did = int(it)
-                            qty = 1
-                    except Exception:
-                        did = None
-                        qty = 1
-                # coerce to int when possible
-                try:
-                    did_int = int(did)
-                except Exception:
-                    did_int = None
-                if did_int is not None:
-                    d = get_dish_by_id(did_int)
-                    name = d['name'] if d and 'name' in d.keys() else f"#{did_int}"
-                else:
-                    name = str(did or '#')
-            except Exception:
-                name = f"#{it}"
-                qty = 1
-            parts.append(f"{name} x{qty}")
-        items_text = ', '.join(parts)
-        # copy row into dict-like object: convert sqlite Row to dict
-        od = dict(o)
-        od['items_text'] = items_text
-        orders_display.append(od)
+    orders_display = orders_with_items_text(orders)
     accounts = get_all_accounts()
     return render_template('admin.html', dish=dish, work=work, feedback=feedback, orders=orders_display, accounts=accounts)
 
 
-@app.route('/admin/dish/edit/<int:dish_id>', methods=['GET', 'POST'])
+@pages.route('/admin/dish/edit/<int:dish_id>', methods=['GET', 'POST'])
 def admin_edit_dish(dish_id):
     if not session.get('is_admin'):
         return redirect(url_for('admin_login'))
@@ -407,7 +427,7 @@ def admin_edit_dish(dish_id):
     return render_template('admin_edit_dish.html', dish=dish)
 
 
-@app.route('/admin/accounts/edit/<int:account_id>', methods=['GET', 'POST'])
+@pages.route('/admin/accounts/edit/<int:account_id>', methods=['GET', 'POST'])
 def admin_edit_account(account_id):
     if not session.get('is_admin'):
         return redirect(url_for('admin_login'))
@@ -423,18 +443,64 @@ def admin_edit_account(account_id):
     return render_template('admin_edit_account.html', account=account)
 
 
-@app.route('/admin/order/<int:order_id>/status', methods=['POST'])
+@pages.route('/admin/order/<int:order_id>/status', methods=['POST'])
 def admin_update_order_status(order_id):
     if not session.get('is_admin'):
         return redirect(url_for('admin_login'))
     status = request.form.get('status', '').strip()
     if status:
         update_order_status(order_id, status)
+        notify_order_events()
+        if request.accept_mimetypes.best == 'application/json':  # fetch зі сторінки кухні
+            return jsonify({'id': order_id, 'status': status})
         flash('Статус замовлення оновлено', 'success')
     return redirect(url_for('admin'))
 
+
+# --- Кухня: живий список замовлень через SSE замість перезавантаження /admin ---
+ORDER_STATUSES = ('new', 'pending', 'preparing', 'ready', 'completed')
+
+
+@pages.route('/kitchen')
+def kitchen():
+    if not session.get('is_admin'):
+        return redirect(url_for('admin_login'))
+    # межа подій береться до списку: подія між ними прийде ще раз і лише оновить картку
+    since = get_last_order_event_id()
+    orders = orders_with_items_text(get_active_orders())
+    return render_template('kitchen.html', orders=orders, statuses=ORDER_STATUSES, since=since)
+
+
+@pages.route('/admin/events')
+def admin_events():
+    """SSE: order_created / order_status як невеликі JSON події (order_events.py)"""
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    broker = get_broker()
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else broker.last_id
+    # місце резервується тут, а не в генераторі: одночасні підключення не перевищать ліміт
+    subscription = broker.subscribe(limit=max_event_clients())
+    if subscription is None:
+        response = current_app.response_class('retry: 10000\n\n', status=503, mimetype='text/event-stream')
+        response.headers['Retry-After'] = '10'
+        return response
+    stream = event_stream(
+        broker,
+        since=since,
+        max_seconds=float(os.environ.get('ORDER_EVENTS_STREAM_SECONDS', 300)),
+        heartbeat=float(os.environ.get('ORDER_EVENTS_HEARTBEAT', 15)),
+        subscription=subscription,
+    )
+    response = current_app.response_class(stream, mimetype='text/event-stream')
+    # генератор, який так і не запустився, не звільнить місце сам
+    response.call_on_close(subscription.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx не буферизує потік
+    return response
+
 # --- Сторінка "Акаунт" ---
-@app.route('/account')
+@pages.route('/account')
 def account():
     user_id = session.get('user_id')
     account = None
@@ -443,62 +509,15 @@ def account():
     if user_id:
         account = get_account_by_id(user_id)
         favourites = get_all_favourites(user_id)
-        acct_phone = None
-        if account is not None:
-            try:
-                acct_phone = account['phone']
-            except Exception:
-                acct_phone = None
+        acct_phone = account.get('phone') if account is not None else None
         if acct_phone:
-            raw_orders = get_orders_by_phone(acct_phone)
-            # Convert orders rows to dicts with human-readable items_text
-            for o in raw_orders:
-                items_text = ''
-                try:
-                    items = json.loads(o['items']) if 'items' in o.keys() else json.loads(o[4])
-                except Exception:
-                    items = []
-                parts = []
-                for it in items:
-                    try:
-                        did = None
-                        if isinstance(it, dict):
-                            did = it.get('dish_id') or it.get('id') or it.get('dish')
-                            qty = int(it.get('qty', 1))
-                        else:
-                            try:
-                                if isinstance(it, (list, tuple)) and len(it) > 0:
-                                    did = it[0]
-                                    qty = int(it[1]) if len(it) > 1 else 1
-                                else:
-                                    did = int(it)
-                                    qty = 1
-                            except Exception:
-                                did = None
-                                qty = 1
-                        try:
-                            did_int = int(did)
-                        except Exception:
-                            did_int = None
-                        if did_int is not None:
-                            d = get_dish_by_id(did_int)
-                            name = d['name'] if d and 'name' in d.keys() else f"#{did_int}"
-                        else:
-                            name = str(did or '#')
-                    except Exception:
-                        name = f"#{it}"
-                        qty = 1
-                    parts.append(f"{name} x{qty}")
-                items_text = ', '.join(parts)
-                od = dict(o)
-                od['items_text'] = items_text
-                user_orders.append(od)
+            user_orders = orders_with_items_text(get_orders_by_phone(acct_phone))
     else:
         account = None
     return render_template('account.html', account=account, favourites=favourites, orders=user_orders)
 
 
-@app.route('/account/edit', methods=['GET', 'POST'])
+@pages.route('/account/edit', methods=['GET', 'POST'])
 def account_edit():
     user_id = session.get('user_id')
     if not user_id:
@@ -523,18 +542,18 @@ def account_edit():
     return render_template('account_edit.html', account=account)
 
 # --- Сторінка "Вхід" ---
-@app.route('/signUp')
+@pages.route('/signUp')
 def signUp():
     return render_template('signUp.html')
 
 
 # Simple demo page served by the app to interact with the JSON API
-@app.route('/api_demo')
+@pages.route('/api_demo')
 def api_demo():
     return render_template('api_demo.html')
 
 
-@app.route('/signUp/login', methods=['POST'])
+@pages.route('/signUp/login', methods=['POST'])
 def sign_up_login():
     # create or fetch account, then set session and redirect to account page
     try:
@@ -571,7 +590,7 @@ def sign_up_login():
         return redirect(url_for('signUp'))
 
 # --- Маршрути для додавання даних ---
-@app.route('/admin/add_dish', methods=['GET', 'POST'])
+@pages.route('/admin/add_dish', methods=['GET', 'POST'])
 def add_dish_route():
     if request.method == 'POST':
         name = request.form['name']
@@ -590,7 +609,7 @@ def add_dish_route():
     
     return render_template('add_dish.html')
 
-@app.route('/contact/add_feedback', methods=['GET', 'POST'])
+@pages.route('/contact/add_feedback', methods=['GET', 'POST'])
 def add_feedback_route():
     if request.method == 'POST':
         name = request.form.get('name', '').strip()
@@ -606,7 +625,7 @@ def add_feedback_route():
     # On GET redirect to contact section of index
     return redirect(url_for('index') + '#contact')
 
-@app.route('/work/add_work', methods=['GET', 'POST'])
+@pages.route('/work/add_work', methods=['GET', 'POST'])
 def add_work_route():
     if request.method == 'POST':
         name = request.form['name']
@@ -626,7 +645,7 @@ def add_work_route():
     work = get_all_work()
     return render_template('work.html', work=work)
 
-@app.route('/signUp/add_accounts', methods=['GET', 'POST'])
+@pages.route('/signUp/add_accounts', methods=['GET', 'POST'])
 def add_accounts_route():
     if request.method == 'POST':
         first_name = request.form.get('first_name', '').strip()
@@ -647,7 +666,7 @@ def add_accounts_route():
     return render_template('work.html', work=work)
 
 # --- Маршрути для видалення ---
-@app.route('/admin/delete_dish/<int:dish_id>', methods=['POST'])
+@pages.route('/admin/delete_dish/<int:dish_id>', methods=['POST'])
 def delete_dish_route(dish_id):
     try:
         delete_dish(dish_id)
@@ -656,7 +675,7 @@ def delete_dish_route(dish_id):
         flash(f'Помилка: {str(e)}', 'error')
     return redirect(url_for('admin'))
 
-@app.route('/admin/delete_accounts/<int:service_id>', methods=['POST'])
+@pages.route('/admin/delete_accounts/<int:service_id>', methods=['POST'])
 def delete_accounts_route(service_id):
     try:
         delete_accounts(service_id)
@@ -666,17 +685,17 @@ def delete_accounts_route(service_id):
     return redirect(url_for('admin'))
 
 
-@app.route('/logout')
+@pages.route('/logout')
 def logout():
     session.pop('user_id', None)
     flash('Ви вийшли з акаунту', 'info')
     return redirect(url_for('index'))
 
 
-@app.route('/admin/reset-password', methods=['POST'])
+@pages.route('/admin/reset-password', methods=['POST'])
 def admin_reset_password():
     # Dev-only endpoint: reset admin password to 11111 when in debug mode
-    if not app.debug:
+    if not current_app.debug:
         return ('Not allowed', 403)
     try:
         add_admin('admin', '11111')
@@ -685,10 +704,10 @@ def admin_reset_password():
         return (str(e), 500)
 
 
-@app.route('/_debug_session')
+@pages.route('/_debug_session')
 def _debug_session():
     # Debug helper: returns session contents only when app.debug is True
-    if not app.debug:
+    if not current_app.debug:
         return ('Not allowed', 403)
     try:
         return jsonify({k: session.get(k) for k in session.keys()})
@@ -697,7 +716,7 @@ def _debug_session():
 
 
 # --- Favorites ---
-@app.route('/favourite')
+@pages.route('/favourite')
 def favourite():
     user_id = session.get('user_id')
     if not user_id:
@@ -707,7 +726,7 @@ def favourite():
     return render_template('favourite.html', favourites=favs)
 
 
-@app.route('/favourite/add/<int:dish_id>', methods=['POST'])
+@pages.route('/favourite/add/<int:dish_id>', methods=['POST'])
 def add_to_favourite(dish_id):
     user_id = session.get('user_id')
     if not user_id:
@@ -721,7 +740,7 @@ def add_to_favourite(dish_id):
     return redirect(request.referrer or url_for('index'))
 
 
-@app.route('/favourite/remove/<int:dish_id>', methods=['POST'])
+@pages.route('/favourite/remove/<int:dish_id>', methods=['POST'])
 def remove_from_favourite(dish_id):
     user_id = session.get('user_id')
     if not user_id:
@@ -735,7 +754,7 @@ def remove_from_favourite(dish_id):
     return redirect(request.referrer or url_for('favourite'))
 
 # --- Orders ---
-@app.route('/order/create', methods=['POST'])
+@pages.route('/order/create', methods=['POST'])
 def create_order():
     try:
         name = request.form.get('name', '').strip() or 'Гість'
@@ -801,16 +820,21 @@ def create_order():
             discount = 0.0
         discount = max(0.0, min(100.0, discount))
         discounted_total = round(total * (1.0 - discount/100.0), 2)
-        add_order(name, phone, address, safe_items, discounted_total, discount)
+        place_order(name, phone, address, safe_items, discounted_total, discount)
         if discount and discount > 0:
             flash(f'Замовлення створено. Знижка {discount}% застосована. Платіж: {discounted_total} грн.', 'success')
         else:
             flash('Замовлення створено. Дякуємо!', 'success')
         try:
-            # do nothing here — discount already applied in add_order call if provided
+            # do nothing here — discount already applied in place_order call if provided
             pass
         except Exception:
             pass
+    except OrderPending:
+        # замовлення вже записується — повторна відправка форми створила б дубль
+        flash('Замовлення ще обробляється. Не надсилайте форму повторно — перевірте статус трохи пізніше.', 'info')
+    except OrderQueueTimeout:
+        flash('Сервер зараз перевантажений, замовлення не створено. Спробуйте ще раз.', 'error')
     except Exception as e:
         tb = traceback.format_exc()
         print(tb)
@@ -819,7 +843,7 @@ def create_order():
 
 
 # --- Admin login ---
-@app.route('/admin/login', methods=['GET', 'POST'])
+@pages.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form.get('username', '')
@@ -836,13 +860,94 @@ def admin_login():
     return render_template('admin_login.html')
 
 
-@app.route('/admin/logout')
+@pages.route('/admin/logout')
 def admin_logout():
     session.pop('is_admin', None)
     flash('Ви вийшли', 'info')
     return redirect(url_for('index'))
 
 
+# --- CLI команди (flask --app main <команда>) ---
+@commands.cli.command('reports-backfill')
+def reports_backfill_command():
+    """Перерахунок зведених таблиць продажів з усіх наявних замовлень"""
+    init_db()
+    count = rebuild_sales_summary()
+    print(f'Sales summary rebuilt from {count} orders')
+
+
+@commands.cli.command('popularity-rebuild')
+def popularity_rebuild_command():
+    """Перерахунок лічильників популярності страв (улюблені та замовлена кількість)"""
+    init_db()
+    dishes = rebuild_popularity()
+    orders = rebuild_sales_summary()
+    print(f'Popularity rebuilt: {dishes} favourited dishes, {orders} orders')
+
+
+@commands.cli.command('recommendations-rebuild')
+def recommendations_rebuild_command():
+    """Перерахунок матриці спільних замовлень (рекомендації "разом замовляють")"""
+    init_db()
+    count = rebuild_dish_pairs()
+    print(f'Dish pairs rebuilt from {count} orders')
+
+
+@commands.cli.command('templates-compile')
+def templates_compile_command():
+    """Заздалегідь скомпілювати шаблони в байткод-кеш Jinja (напр. при збиранні образу)"""
+    print(f'Compiled {precompile_templates(current_app)} templates')
+
+
+@commands.cli.command('db-maintenance')
+@click.option('--no-migrate', is_flag=True, help='Не переводити стару БД на auto_vacuum=INCREMENTAL (VACUUM)')
+def db_maintenance_command(no_migrate):
+    """ANALYZE змінених таблиць, PRAGMA optimize і incremental vacuum зі звітом до/після"""
+    init_db()
+    print(format_report(run_maintenance(migrate=not no_migrate)))
+
+
+@commands.cli.command('orders-archive')
+@click.option('--days', type=int, default=None, help='Вік замовлень для архівування, днів (ORDER_ARCHIVE_AFTER_DAYS)')
+def orders_archive_command(days):
+    """Перенести старі замовлення в помісячні партиції архівної БД"""
+    init_db()
+    days = archive_after_days() if days is None else days
+    if days <= 0:
+        print('Set --days or ORDER_ARCHIVE_AFTER_DAYS')
+        return
+    moved = archive_orders(days)
+    for month, count in moved.items():
+        print(f'{month}: {count} orders archived')
+    print(f'Archived {sum(moved.values())} orders older than {days} days')
+    for name, count in archive_stats().items():
+        print(f'  {name:16} {count:>8}')
+
+
+@commands.cli.command('db-backup')
+@click.option('--dir', 'directory', default=None, help='Каталог копій (BACKUP_DIR)')
+@click.option('--keep', type=int, default=None, help='Скільки останніх копій зберігати (BACKUP_KEEP)')
+def db_backup_command(directory, keep):
+    """Онлайн-копія БД через backup API з перевіркою і ротацією старих копій"""
+    init_db()
+    print(backup.format_report(backup.backup_database(directory=directory, keep=keep)))
+
+
+@commands.cli.command('assets-build')
+def assets_build_command():
+    """Зібрати мінімізовані JS/CSS бандли і critical CSS у static/dist"""
+    built = build_bundles(current_app.static_folder, os.path.join(current_app.root_path, current_app.template_folder))
+    for name, info in built.items():
+        print(f"{name:22} {info['source_bytes']:>7} -> {info['bytes']:>7} bytes (gzip {info['gzip_bytes']})")
+
+
+app = create_app()
+
+# WARM_UP_ON_BOOT=1: кожен gunicorn worker імпортує main і прогрівається до першого запиту
+if os.environ.get('WARM_UP_ON_BOOT', '0') == '1':
+    warm_up(app)
+
+
 # --- Запуск програми ---
 if __name__ == '__main__':
     host = os.environ.get('FLASK_RUN_HOST', '0.0.0.0')
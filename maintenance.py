@@ -0,0 +1,322 @@
+"""
+Планове обслуговування SQLite: статистика планувальника і повернення вільних сторінок.
+
+Один прогін (run_maintenance):
+    - перенесення старих замовлень в архів (order_archive), якщо ORDER_ARCHIVE_AFTER_DAYS > 0 —
+      звільнені сторінки повертає incremental vacuum того ж прогону
+    - ущільнення change_log (/api/v2/changes): лишається лише останній запис кожного
+      рядка, записи старші за CHANGE_LOG_RETENTION_DAYS видаляються (клієнти з since
+      до цієї межі отримують reset)
+    - ANALYZE таблиць, кількість рядків яких змінилась більше ніж на
+      DB_MAINTENANCE_ANALYZE_CHANGE відносно sqlite_stat1 (або які ще не аналізувались),
+      потім PRAGMA optimize
+    - міграція на auto_vacuum=INCREMENTAL для старих файлів (одноразовий VACUUM;
+      нові БД створюються вже з ним — connect_db)
+    - PRAGMA incremental_vacuum невеликими кроками (DB_MAINTENANCE_VACUUM_STEP сторінок),
+      кожен крок — окрема коротка транзакція під lock'ом писачів з паузою між кроками
+    - запис у maintenance_runs: тривалість, що зроблено, стан файлу до і після
+
+Запуск: flask --app main db-maintenance або потік-планувальник у worker'ах
+(DB_MAINTENANCE_MODE=scheduler); між workers прогін виконує лише власник
+flock на <БД>.maintenance.lock.
+
+Налаштування (змінні оточення):
+    DB_MAINTENANCE_MODE             scheduler | off (scheduler)
+    DB_MAINTENANCE_INTERVAL         період прогонів, с (3600)
+    DB_MAINTENANCE_ANALYZE_CHANGE   частка зміни рядків для ANALYZE таблиці (0.1)
+    DB_MAINTENANCE_VACUUM_STEP      сторінок за один крок incremental_vacuum (64)
+    DB_MAINTENANCE_VACUUM_PAUSE_MS  пауза між кроками, мс (10)
+    DB_MAINTENANCE_MIGRATE          1 — планувальник теж виконує міграцію через VACUUM (0)
+    CHANGE_LOG_RETENTION_DAYS       скільки днів зберігати записи change_log (30)
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from db_writer import LeaderLock, writer_lock
+from order_archive import archive_orders
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def maintenance_mode():
+    return os.environ.get('DB_MAINTENANCE_MODE', 'scheduler').strip().lower()
+
+
+def database_stats(conn, db_path):
+    """Розмір файлу, сторінки і режим auto_vacuum"""
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    try:
+        file_bytes = os.path.getsize(db_path)
+    except OSError:
+        file_bytes = 0
+    return {
+        'file_bytes': file_bytes,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_pages': freelist,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0]),
+    }
+
+
+def _analyzable_tables(conn):
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    virtual = [name for name, sql in rows if (sql or '').upper().startswith('CREATE VIRTUAL')]
+    # віртуальні таблиці (FTS5) і їхні тіньові таблиці ANALYZE не потребують
+    return [name for name, _sql in rows
+            if name not in virtual and not any(name.startswith(v + '_') for v in virtual)]
+
+
+def tables_to_analyze(conn, change_ratio=0.1):
+    """{таблиця: (рядків при останньому ANALYZE або None, рядків зараз)} для значних змін"""
+    analyzed = {}
+    try:
+        for tbl, stat in conn.execute('SELECT tbl, stat FROM sqlite_stat1'):
+            # перше число stat — кількість рядків у таблиці (індексу) на момент ANALYZE
+            rows = int(str(stat).split()[0])
+            analyzed[tbl] = max(analyzed.get(tbl, 0), rows)
+    except Exception:  # sqlite_stat1 ще немає — жодного ANALYZE не було
+        pass
+    changed = {}
+    for table in _analyzable_tables(conn):
+        rows = conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+        before = analyzed.get(table)
+        if before is None:
+            if rows:
+                changed[table] = (None, rows)
+        elif abs(rows - before) > max(1, before) * change_ratio:
+            changed[table] = (before, rows)
+    return changed
+
+
+def incremental_vacuum(conn, lock, step_pages=64, pause=0.01, max_pages=None):
+    """Повернення вільних сторінок кроками; кількість звільнених сторінок"""
+    freed = 0
+    while max_pages is None or freed < max_pages:
+        with lock:
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if before == 0:
+                break
+            conn.execute(f'PRAGMA incremental_vacuum({int(step_pages)})').fetchall()
+            after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if after >= before:
+            break
+        freed += before - after
+        if pause:
+            time.sleep(pause)
+    return freed
+
+
+def migrate_auto_vacuum(conn, lock):
+    """Перевести файл на auto_vacuum=INCREMENTAL (VACUUM переписує всю БД); True, якщо виконано"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    with lock:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    return True
+
+
+def compact_change_log(conn, lock, retention_days=30, now=None):
+    """Ущільнення change_log; {'collapsed', 'expired', 'compacted_seq'}"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'").fetchone() is None:
+        return {'collapsed': 0, 'expired': 0, 'compacted_seq': 0}
+    with lock:
+        # попередні записи рядка не потрібні жодному клієнту: він отримає останній (seq більший)
+        collapsed = conn.execute('''
+            DELETE FROM change_log WHERE seq < (
+                SELECT MAX(c.seq) FROM change_log c
+                WHERE c.entity = change_log.entity AND c.entity_id = change_log.entity_id
+            )
+        ''').rowcount
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=retention_days)).isoformat()
+    expired = 0
+    with lock:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            boundary = conn.execute('SELECT MAX(seq) FROM change_log WHERE changed_at < ?', (cutoff,)).fetchone()[0]
+            if boundary is not None:
+                expired = conn.execute('DELETE FROM change_log WHERE seq <= ?', (boundary,)).rowcount
+                conn.execute('UPDATE change_log_state SET compacted_seq = MAX(compacted_seq, ?) WHERE id = 1',
+                             (boundary,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    compacted_seq = conn.execute('SELECT compacted_seq FROM change_log_state WHERE id = 1').fetchone()[0]
+    return {'collapsed': collapsed, 'expired': expired, 'compacted_seq': compacted_seq}
+
+
+def run_maintenance(db_path=None, migrate=True, change_ratio=None, step_pages=None, pause_ms=None,
+                    archive_days=None, change_log_days=None):
+    """Один прогін обслуговування; звіт також записується в maintenance_runs"""
+    from database import connect_db, get_database_path
+    db_path = db_path or get_database_path()
+    change_ratio = float(os.environ.get('DB_MAINTENANCE_ANALYZE_CHANGE', 0.1)) if change_ratio is None else change_ratio
+    step_pages = int(os.environ.get('DB_MAINTENANCE_VACUUM_STEP', 64)) if step_pages is None else step_pages
+    pause_ms = float(os.environ.get('DB_MAINTENANCE_VACUUM_PAUSE_MS', 10)) if pause_ms is None else pause_ms
+    change_log_days = (float(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))
+                       if change_log_days is None else change_log_days)
+    lock = writer_lock(db_path)
+    conn = connect_db(db_path)
+    conn.isolation_level = None  # кожен крок — окрема транзакція
+    try:
+        started_at = datetime.now().isoformat(timespec='seconds')
+        t0 = time.perf_counter()
+        timings = {}
+        before = database_stats(conn, db_path)
+
+        t = time.perf_counter()
+        archived = archive_orders(archive_days, db_path)
+        timings['archive_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+        t = time.perf_counter()
+        change_log = compact_change_log(conn, lock, change_log_days)
+        timings['change_log_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+        t = time.perf_counter()
+        changed = tables_to_analyze(conn, change_ratio)
+        with lock:
+            for table in changed:
+                conn.execute(f'ANALYZE "{table}"')
+            conn.execute('PRAGMA optimize')
+        timings['analyze_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+        t = time.perf_counter()
+        migrated = migrate_auto_vacuum(conn, lock) if migrate else False
+        timings['migrate_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+        t = time.perf_counter()
+        freed = 0
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            freed = incremental_vacuum(conn, lock, step_pages, pause_ms / 1000.0)
+        if migrated or freed:
+            # у WAL-режимі файл БД зменшується лише при checkpoint'і
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+        timings['vacuum_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+        after = database_stats(conn, db_path)
+        report = {
+            'started_at': started_at,
+            'duration_ms': round((time.perf_counter() - t0) * 1000, 2),
+            'analyzed': {table: {'rows_before': b, 'rows': r} for table, (b, r) in changed.items()},
+            'archived': archived,
+            'change_log': change_log,
+            'migrated': migrated,
+            'vacuumed_pages': freed,
+            'timings': timings,
+            'before': before,
+            'after': after,
+        }
+        with lock:
+            conn.execute('''
+                INSERT INTO maintenance_runs (started_at, duration_ms, analyzed_tables, vacuumed_pages, report)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (started_at, report['duration_ms'], len(changed), freed, json.dumps(report)))
+        return report
+    finally:
+        conn.close()
+
+
+def format_report(report):
+    before, after = report['before'], report['after']
+    lines = [
+        f"Maintenance {report['started_at']}: {report['duration_ms']:.0f} ms "
+        f"(analyze {report['timings']['analyze_ms']:.0f}, migrate {report['timings']['migrate_ms']:.0f}, "
+        f"vacuum {report['timings']['vacuum_ms']:.0f})",
+        f"  archived orders: "
+        + (', '.join(f'{month}: {n}' for month, n in report['archived'].items()) or '-'),
+        f"  change_log: {report['change_log']['collapsed']} collapsed, {report['change_log']['expired']} expired "
+        f"(compacted through seq {report['change_log']['compacted_seq']})",
+        f"  analyzed: {', '.join(report['analyzed']) or '-'}",
+        f"  auto_vacuum: {before['auto_vacuum']} -> {after['auto_vacuum']}"
+        + (' (migrated with VACUUM)' if report['migrated'] else ''),
+        f"  file: {before['file_bytes']} -> {after['file_bytes']} bytes, "
+        f"pages {before['page_count']} -> {after['page_count']}, "
+        f"free {before['freelist_pages']} -> {after['freelist_pages']} (vacuumed {report['vacuumed_pages']})",
+    ]
+    return '\n'.join(lines)
+
+
+class MaintenanceScheduler:
+    """Потік, що виконує run_maintenance кожні interval секунд (лише в процесі-лідері)"""
+
+    def __init__(self, db_path, interval=3600.0, migrate=False):
+        self.db_path = db_path
+        self.interval = max(1.0, float(interval))
+        self.migrate = migrate
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader = LeaderLock(db_path + '.maintenance.lock')
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._leader.release()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._leader.try_acquire():
+                continue
+            try:
+                self.last_report = run_maintenance(self.db_path, migrate=self.migrate)
+                self._leader.write_state({'at': time.time(), 'duration_ms': self.last_report['duration_ms']})
+                print(format_report(self.last_report))
+            except Exception as e:
+                print('DB maintenance failed:', e)
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_guard = threading.Lock()
+
+
+def ensure_maintenance_scheduler():
+    """Планувальник поточного процесу (створюється ліниво, заново після fork)"""
+    global _scheduler, _scheduler_pid
+    from database import get_database_path
+    if maintenance_mode() != 'scheduler':
+        return None
+    db_path = get_database_path()
+    scheduler = _scheduler
+    if scheduler is not None and _scheduler_pid == os.getpid() and scheduler.db_path == db_path:
+        return scheduler
+    with _scheduler_guard:
+        if _scheduler is None or _scheduler_pid != os.getpid() or _scheduler.db_path != db_path:
+            if _scheduler is not None and _scheduler_pid == os.getpid():
+                _scheduler.stop()
+            _scheduler = MaintenanceScheduler(
+                db_path,
+                interval=float(os.environ.get('DB_MAINTENANCE_INTERVAL', 3600)),
+                migrate=os.environ.get('DB_MAINTENANCE_MIGRATE', '0') == '1',
+            ).start()
+            _scheduler_pid = os.getpid()
+        return _scheduler
+
+
+def shutdown_maintenance_scheduler():
+    global _scheduler
+    with _scheduler_guard:
+        if _scheduler is not None and _scheduler_pid == os.getpid():
+            _scheduler.stop()
+        _scheduler = None
+
+
+atexit.register(shutdown_maintenance_scheduler)
@@ -0,0 +1,155 @@
+"""
+Компактні моделі рядків БД (Dish, Order, Account).
+
+Фабрика рядків make_row_factory() замінює sqlite3.Row: кожен рядок — це
+незмінний кортеж без __dict__ (клас на основі namedtuple, __slots__ = ()),
+тож у пам'яті лише значення стовпців. Клас створюється один раз на набір
+стовпців запиту і кешується, а фабрика з'єднання пам'ятає клас останнього
+cursor.description, тому на рядок припадає лише створення кортежу.
+
+Рядок сумісний з sqlite3.Row (row['name'], row[0], row.keys(), dict(row))
+і додає:
+    row.name                 доступ до стовпця як до атрибута (C-дескриптор namedtuple)
+    row.get('phone', '')     значення з default, без try/except
+    row.to_json()            dict для JSON відповідей
+    row.extend(items_text=…) той самий рядок з додатковими обчисленими полями
+
+Модель обирається за назвами стовпців (MODEL_SIGNATURES): SELECT * FROM dish
+дає Dish, orders — Order, accounts — Account, решта запитів — Record.
+"""
+import json
+from collections import namedtuple
+
+
+def parse_order_items(items):
+    """Нормалізація позицій замовлення до списку (dish_id, qty)
+
+    Підтримує JSON-рядок з БД, словники {'dish_id'|'id'|'dish', 'qty'},
+    пари [id, qty] та просто id. Некоректні позиції пропускаються.
+    """
+    if isinstance(items, (str, bytes)):
+        try:
+            items = json.loads(items)
+        except Exception:
+            return []
+    if not isinstance(items, list):
+        return []
+    parsed = []
+    for it in items:
+        try:
+            if isinstance(it, dict):
+                did = int(it.get('dish_id') or it.get('id') or it.get('dish'))
+                qty = int(it.get('qty', 1))
+            elif isinstance(it, (list, tuple)) and len(it) > 0:
+                did = int(it[0])
+                qty = int(it[1]) if len(it) > 1 else 1
+            else:
+                did = int(it)
+                qty = 1
+        except Exception:
+            continue
+        parsed.append((did, qty))
+    return parsed
+
+
+class Record(tuple):
+    """Базовий рядок: кортеж значень + назви стовпців на рівні класу"""
+
+    __slots__ = ()
+    _columns = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise IndexError('No item with that key') from None  # як sqlite3.Row
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._columns)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def to_json(self):
+        return dict(zip(self._columns, self))
+
+    def extend(self, **values):
+        """Новий рядок з додатковими стовпцями (той самий тип моделі)"""
+        cls = record_class(self._columns + tuple(values), model=type(self).__bases__[0])
+        return tuple.__new__(cls, tuple(self) + tuple(values.values()))
+
+    def __repr__(self):
+        return f'<{type(self).__bases__[0].__name__} {self.to_json()!r}>'
+
+
+class Dish(Record):
+    __slots__ = ()
+
+
+class Order(Record):
+    __slots__ = ()
+
+    @property
+    def parsed_items(self):
+        """Позиції замовлення як список (dish_id, qty)"""
+        return parse_order_items(self.get('items'))
+
+
+class Account(Record):
+    __slots__ = ()
+
+
+# (модель, обов'язкові стовпці) — перша відповідність виграє
+MODEL_SIGNATURES = (
+    (Order, frozenset({'id', 'customer_name', 'items', 'total'})),
+    (Account, frozenset({'id', 'first_name', 'last_name', 'email'})),
+    (Dish, frozenset({'id', 'name', 'price', 'description'})),
+)
+
+_classes = {}
+
+
+def model_for(columns):
+    names = set(columns)
+    for model, required in MODEL_SIGNATURES:
+        if required <= names:
+            return model
+    return Record
+
+
+def record_class(columns, model=None):
+    """Клас рядка для набору стовпців (кешується)"""
+    columns = tuple(columns)
+    key = (columns, model)
+    cls = _classes.get(key)
+    if cls is None:
+        model = model or model_for(columns)
+        index = {}
+        for i, name in enumerate(columns):
+            index.setdefault(name, i)  # дублікати назв (JOIN) — перший стовпець, як у sqlite3.Row
+        # namedtuple дає C-дескриптори атрибутів; некоректні/повторні назви перейменовуються
+        # (_0, _1, ...) і доступні лише через row['назва']. Методи Record мають пріоритет.
+        base = namedtuple(model.__name__ + 'Row', columns, rename=True)
+        cls = type(model.__name__, (model, base), {'__slots__': (), '_columns': columns, '_index': index})
+        _classes[key] = cls
+    return cls
+
+
+def make_row_factory():
+    """row_factory для одного з'єднання"""
+    last = (None, None)
+
+    def row_factory(cursor, values):
+        nonlocal last
+        description, cls = last
+        if cursor.description is not description:
+            description = cursor.description
+            cls = record_class(column[0] for column in description)
+            last = (description, cls)  # одне присвоєння — безпечно між потоками
+        return tuple.__new__(cls, values)
+
+    return row_factory
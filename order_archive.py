@@ -0,0 +1,215 @@
+"""
+Архів старих замовлень: окрема SQLite БД з помісячними партиціями.
+
+archive_orders переносить замовлення, старші за ORDER_ARCHIVE_AFTER_DAYS днів,
+з гарячої таблиці orders у файл архіву (ORDER_ARCHIVE_PATH), у таблиці
+orders_YYYY_MM за місяцем created_at. Позиції замовлення зберігаються в колонці
+items (JSON), тож переносяться разом із рядком. Кожен місяць — окрема коротка
+транзакція під lock'ом писачів: INSERT OR REPLACE у партицію, потім DELETE з orders.
+У WAL-режимі коміт двох файлів не атомарний, але повтор після збою безпечний:
+рядки, що вже є в партиції, просто перезаписуються.
+
+Запити, яким потрібна історія (замовлення акаунта, перерахунок звітів), читають
+orders_source(conn) — orders UNION ALL усі партиції приєднаного (ATTACH) архіву.
+Архів приєднується ліниво, лише цими запитами, і лише якщо файл існує, тож
+звичайні з'єднання (меню, /admin, API замовлень) його не відкривають.
+Зведені таблиці продажів і пар страв архівування не змінює.
+
+Запуск: flask --app main orders-archive або разом з плановим обслуговуванням
+(maintenance.run_maintenance), якщо ORDER_ARCHIVE_AFTER_DAYS > 0.
+
+Налаштування (змінні оточення):
+    ORDER_ARCHIVE_AFTER_DAYS  вік замовлення для архівування, днів (0 — лише вручну з --days)
+    ORDER_ARCHIVE_PATH        файл архіву (<БД>_archive.db поруч з основною)
+"""
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from db_writer import writer_lock
+
+ARCHIVE_SCHEMA = 'archive'
+PARTITION_PREFIX = 'orders_'
+PARTITION_RE = re.compile(r'^orders_(\d{4})_(\d{2})$')
+MONTH_RE = re.compile(r'^\d{4}-\d{2}$')
+
+# (шлях архіву, версії схем main і archive) → SQL джерела історії
+_source_cache = {}
+_source_guard = threading.Lock()
+
+
+def archive_after_days():
+    return max(0, int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 0)))
+
+
+def archive_path(db_path=None):
+    from database import get_database_path
+    path = os.environ.get('ORDER_ARCHIVE_PATH')
+    if path:
+        return path
+    root, ext = os.path.splitext(db_path or get_database_path())
+    return f'{root}_archive{ext or ".db"}'
+
+
+def partition_name(month):
+    """'2024-03' → orders_2024_03"""
+    if not MONTH_RE.match(month or ''):
+        raise ValueError(f'Invalid month: {month!r}')
+    return PARTITION_PREFIX + month.replace('-', '_')
+
+
+def month_bounds(month):
+    """Межі місяця для порівняння з created_at (ISO рядки): [початок, наступний місяць)"""
+    year, mon = int(month[:4]), int(month[5:7])
+    following = f'{year + 1:04d}-01' if mon == 12 else f'{year:04d}-{mon + 1:02d}'
+    return month, following
+
+
+def attached(conn):
+    return any(row[1] == ARCHIVE_SCHEMA for row in conn.execute('PRAGMA database_list'))
+
+
+def attach_archive(conn, db_path=None, create=False):
+    """ATTACH архіву до з'єднання; False, якщо файлу немає або з'єднання в транзакції"""
+    path = archive_path(db_path)
+    if not (create or os.path.exists(path)):
+        return False  # без архіву — жодного зайвого запиту на гарячому шляху
+    if attached(conn):
+        return True
+    if conn.in_transaction:
+        return False
+    conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (path,))
+    return True
+
+
+def partitions(conn):
+    """Назви партицій приєднаного архіву за зростанням місяця"""
+    rows = conn.execute(f"SELECT name FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE type = 'table'").fetchall()
+    return sorted(row[0] for row in rows if PARTITION_RE.match(row[0]))
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info("{table}")')]
+
+
+def orders_source(conn, db_path=None):
+    """SQL джерела всіх замовлень для FROM: orders або (orders UNION ALL партиції архіву)
+
+    Колонки партицій вирівнюються за поточною orders (відсутні — NULL), тож
+    ALTER TABLE orders ADD COLUMN не ламає старі партиції. Умови WHERE зовнішнього
+    запиту SQLite переносить у кожну гілку UNION ALL — працюють індекси партицій.
+    """
+    if not attach_archive(conn, db_path):
+        return 'orders'
+    key = (
+        archive_path(db_path),
+        conn.execute('PRAGMA main.schema_version').fetchone()[0],
+        conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.schema_version').fetchone()[0],
+    )
+    source = _source_cache.get(key)
+    if source is None:
+        names = partitions(conn)
+        if not names:
+            return 'orders'
+        columns = _columns(conn, 'main', 'orders')
+        selects = [f'SELECT {", ".join(columns)} FROM main.orders']
+        for name in names:
+            present = set(_columns(conn, ARCHIVE_SCHEMA, name))
+            cols = ', '.join(c if c in present else f'NULL AS {c}' for c in columns)
+            selects.append(f'SELECT {cols} FROM {ARCHIVE_SCHEMA}."{name}"')
+        source = '(' + ' UNION ALL '.join(selects) + ')'
+        with _source_guard:
+            _source_cache.clear()
+            _source_cache[key] = source
+    return source
+
+
+@contextmanager
+def history_reader(conn, db_path=None):
+    """З'єднання, що бачить архів: conn або, якщо conn уже в транзакції
+    (мутації в режимі writer), окреме read-only з'єднання лише для читання історії"""
+    if attach_archive(conn, db_path) or not os.path.exists(archive_path(db_path)):
+        yield conn
+        return
+    from database import connect_read_only
+    reader = connect_read_only(db_path)
+    try:
+        yield reader
+    finally:
+        reader.close()
+
+
+def _ensure_partition(conn, name, columns):
+    """Партиція з тими ж колонками, що й orders, та індексами для історії акаунта"""
+    types = {row[1]: row[2] for row in conn.execute('PRAGMA main.table_info(orders)')}
+    defs = ', '.join('id INTEGER PRIMARY KEY' if c == 'id' else f'{c} {types.get(c) or ""}'.rstrip()
+                     for c in columns)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}."{name}" ({defs})')
+    existing = set(_columns(conn, ARCHIVE_SCHEMA, name))
+    for column in columns:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}."{name}" ADD COLUMN {column} {types.get(column) or ""}')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}."idx_{name}_phone" ON "{name}"(phone)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}."idx_{name}_created" ON "{name}"(created_at DESC)')
+
+
+def archive_orders(older_than_days=None, db_path=None, now=None):
+    """Перенести замовлення, старші за older_than_days днів, в архів; {місяць: кількість}"""
+    from database import connect_db, get_database_path
+    db_path = db_path or get_database_path()
+    days = archive_after_days() if older_than_days is None else int(older_than_days)
+    if days <= 0:
+        return {}
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=days)).isoformat()
+    lock = writer_lock(db_path)
+    conn = connect_db(db_path)
+    conn.isolation_level = None  # кожен місяць — окрема транзакція
+    try:
+        months = [row[0] for row in conn.execute(
+            'SELECT DISTINCT substr(created_at, 1, 7) FROM orders WHERE created_at < ?', (cutoff,)
+        ) if MONTH_RE.match(row[0] or '')]
+        if not months:
+            return {}
+        attach_archive(conn, db_path, create=True)
+        conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.journal_mode=WAL')
+        columns = _columns(conn, 'main', 'orders')
+        col_list = ', '.join(columns)
+        moved = {}
+        for month in sorted(months):
+            name = partition_name(month)
+            start, end = month_bounds(month)
+            where = 'created_at >= ? AND created_at < ? AND created_at < ?'
+            params = (start, end, cutoff)
+            with lock:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    _ensure_partition(conn, name, columns)
+                    conn.execute(
+                        f'INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}."{name}" ({col_list}) '
+                        f'SELECT {col_list} FROM main.orders WHERE {where}', params
+                    )
+                    moved[month] = conn.execute(f'DELETE FROM main.orders WHERE {where}', params).rowcount
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+        return moved
+    finally:
+        conn.close()
+
+
+def archive_stats(db_path=None):
+    """{партиція: кількість замовлень} архіву (порожньо, якщо архіву ще немає)"""
+    path = archive_path(db_path)
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(path)
+    try:
+        return {name: conn.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+                for name in sorted(row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'") if PARTITION_RE.match(row[0]))}
+    finally:
+        conn.close()
@@ -0,0 +1,319 @@
+"""
+Потік подій замовлень для кухні та адмін-панелі (Server-Sent Events).
+
+Події пишуть тригери на orders у таблицю order_events (database._init_order_events)
+у тій самій транзакції, що й саму зміну: order_created для нового замовлення і
+order_status для update_order_status. Тож подію бачать усі gunicorn workers, і
+не важливо, яким шляхом записано замовлення (запит, черга order_queue, потік-писач).
+
+У кожному процесі один потік OrderEventBroker слухає БД: раз на ORDER_EVENTS_POLL_MS
+читає PRAGMA data_version (змінюється після commit'у будь-якого іншого з'єднання,
+зокрема з інших процесів; без читання таблиць), і лише тоді вибирає нові рядки
+order_events. Запити цього ж процесу будять потік одразу (notify). Далі
+in-process pub/sub: кожен SSE-клієнт має власну обмежену чергу; клієнт, що не
+встигає, від'єднується і перепідключається з Last-Event-ID, пропущене
+довантажується з order_events.
+
+/admin/events тримає потік worker'а (gthread) на весь час з'єднання, тому одночасних
+клієнтів на процес не більше ORDER_EVENTS_MAX_CLIENTS і, під gunicorn, не більше
+threads - 1 (max_event_clients): хоча б один потік worker'а лишається для сторінок і API.
+Місце резервується до відповіді (далі 503 з retry), а з'єднання закривається через
+ORDER_EVENTS_STREAM_SECONDS — клієнт перепідключається без втрати подій.
+
+Налаштування (змінні оточення):
+    ORDER_EVENTS_POLL_MS          період перевірки data_version, мс (250)
+    ORDER_EVENTS_MAX_CLIENTS      одночасних SSE-клієнтів на процес (16; під gunicorn ≤ threads - 1)
+    ORDER_EVENTS_STREAM_SECONDS   тривалість одного SSE-з'єднання, с (300)
+    ORDER_EVENTS_HEARTBEAT        період коментаря-heartbeat, с (15)
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from models import parse_order_items
+
+SUBSCRIBER_QUEUE_SIZE = 256
+FETCH_LIMIT = 500
+RETRY_MS = 3000
+
+EVENTS_SQL = '''
+    SELECT e.id, e.kind, e.order_id, e.old_status, e.new_status, e.created_at,
+           o.customer_name, o.address, o.items, o.total, o.created_at AS order_created_at
+    FROM order_events e LEFT JOIN orders o ON o.id = e.order_id
+    WHERE e.id > ? ORDER BY e.id LIMIT ?
+'''
+
+
+def event_payloads(conn, rows):
+    """Рядки order_events → невеликі JSON-сумісні події з назвами страв"""
+    parsed = [parse_order_items(row['items']) for row in rows]
+    dish_ids = sorted({did for items in parsed for did, _qty in items})
+    names = {}
+    if dish_ids:
+        marks = ','.join('?' * len(dish_ids))
+        names = dict(conn.execute(f'SELECT id, name FROM dish WHERE id IN ({marks})', dish_ids).fetchall())
+    events = []
+    for row, items in zip(rows, parsed):
+        event = {
+            'id': row['id'],
+            'type': row['kind'],
+            'order_id': row['order_id'],
+            'status': row['new_status'],
+            'at': row['created_at'],
+        }
+        if row['kind'] == 'order_status':
+            event['old_status'] = row['old_status']
+        if row['order_created_at'] is not None:
+            event['order'] = {
+                'customer_name': row['customer_name'],
+                'address': row['address'],
+                'total': row['total'],
+                'created_at': row['order_created_at'],
+                'items': [{'dish_id': did, 'name': names.get(did), 'qty': qty} for did, qty in items],
+            }
+        events.append(event)
+    return events
+
+
+def fetch_events(conn, since, limit=FETCH_LIMIT):
+    return event_payloads(conn, conn.execute(EVENTS_SQL, (int(since), int(limit))).fetchall())
+
+
+def last_event_id(conn):
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM order_events').fetchone()[0]
+
+
+def format_sse(event):
+    """Одна подія у форматі text/event-stream"""
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+class Subscription:
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class OrderEventBroker:
+    """Потік-слухач БД і розсилка нових подій підписникам процесу"""
+
+    def __init__(self, db_path, poll_interval=0.25):
+        self.db_path = db_path
+        self.poll_interval = max(0.01, float(poll_interval))
+        self.last_id = None
+        self.stats = {'polls': 0, 'fetches': 0, 'published': 0, 'dropped': 0}
+        self._subscribers = set()
+        self._guard = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def connect(self):
+        from database import connect_read_only
+        conn = connect_read_only(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self):
+        if self._thread is None:
+            conn = self.connect()
+            try:
+                self.last_id = last_event_id(conn)
+            finally:
+                conn.close()
+            self._thread = threading.Thread(target=self._run, name='order-events', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def notify(self):
+        """Розбудити слухача одразу після commit'у в цьому процесі"""
+        self._wake.set()
+
+    def subscribe(self, limit=None):
+        """Нова підписка; None, якщо підписників уже limit"""
+        subscription = Subscription(self)
+        with self._guard:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._guard:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, events):
+        with self._guard:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    # повільний клієнт: від'єднуємо, він довантажить пропущене за Last-Event-ID
+                    subscription.overflowed = True
+                    self.stats['dropped'] += 1
+                    self.unsubscribe(subscription)
+                    break
+        self.stats['published'] += len(events)
+
+    def _run(self):
+        conn = None
+        data_version = None
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                try:
+                    if conn is None:
+                        conn = self.connect()
+                    self.stats['polls'] += 1
+                    current = conn.execute('PRAGMA data_version').fetchone()[0]
+                    if current == data_version:
+                        continue
+                    data_version = current
+                    self.poll_once(conn)
+                except Exception as e:
+                    print('Order events listener failed:', e)
+                    if conn is not None:
+                        conn.close()
+                    conn, data_version = None, None
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def poll_once(self, conn):
+        """Вибрати й розіслати події після last_id; кількість подій"""
+        self.stats['fetches'] += 1
+        total = 0
+        while True:
+            events = fetch_events(conn, self.last_id)
+            if not events:
+                return total
+            self.last_id = events[-1]['id']
+            self.publish(events)
+            total += len(events)
+            if len(events) < FETCH_LIMIT:
+                return total
+
+
+def event_stream(broker, since=None, max_seconds=300.0, heartbeat=15.0, subscription=None):
+    """Генератор тексту SSE: пропущені події з since, далі нові з broker'а
+
+    subscription — місце, зарезервоване до відповіді (admin_events); тоді since
+    має бути взятий до підписки, як і тут.
+    """
+    # межа береться до підписки: події між ними довантажуються з БД, а не губляться
+    sent = broker.last_id if since is None else int(since)
+    if subscription is None:
+        subscription = broker.subscribe()
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        conn = broker.connect()
+        try:
+            while True:
+                missed = fetch_events(conn, sent)
+                for event in missed:
+                    yield format_sse(event)
+                if missed:
+                    sent = missed[-1]['id']
+                if len(missed) < FETCH_LIMIT:
+                    break
+        finally:
+            conn.close()
+        deadline = time.monotonic() + max_seconds
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = subscription.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            if event['id'] > sent:  # вже надіслане під час довантаження не дублюється
+                sent = event['id']
+                yield format_sse(event)
+    finally:
+        subscription.close()
+
+
+_broker = None
+_broker_pid = None
+_broker_guard = threading.Lock()
+_worker_threads = None
+
+
+def set_worker_threads(threads):
+    """gunicorn post_fork: потоків у worker'а (gunicorn_conf.py)"""
+    global _worker_threads
+    _worker_threads = int(threads) if threads else None
+
+
+def max_event_clients():
+    """Одночасних SSE-клієнтів на процес: ORDER_EVENTS_MAX_CLIENTS, але не більше
+    threads - 1 потоків gunicorn worker'а (1 потік — SSE вимкнено, лише 503)"""
+    limit = int(os.environ.get('ORDER_EVENTS_MAX_CLIENTS', 16))
+    if _worker_threads is not None:
+        limit = min(limit, _worker_threads - 1)
+    return max(0, limit)
+
+
+def get_broker():
+    """Broker поточного процесу (створюється ліниво, заново після fork)"""
+    global _broker, _broker_pid
+    from database import get_database_path
+    db_path = get_database_path()
+    broker = _broker
+    if broker is not None and _broker_pid == os.getpid() and broker.db_path == db_path:
+        return broker
+    with _broker_guard:
+        if _broker is None or _broker_pid != os.getpid() or _broker.db_path != db_path:
+            if _broker is not None and _broker_pid == os.getpid():
+                _broker.stop()
+            _broker = OrderEventBroker(
+                db_path, poll_interval=float(os.environ.get('ORDER_EVENTS_POLL_MS', 250)) / 1000.0
+            ).start()
+            _broker_pid = os.getpid()
+        return _broker
+
+
+def notify_order_events():
+    """Після запису замовлення: розбудити слухача процесу, якщо він уже працює"""
+    broker = _broker
+    if broker is not None and _broker_pid == os.getpid():
+        broker.notify()
+
+
+def shutdown_order_events():
+    global _broker
+    with _broker_guard:
+        if _broker is not None and _broker_pid == os.getpid():
+            _broker.stop()
+        _broker = None
+
+
+atexit.register(shutdown_order_events)
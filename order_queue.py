@@ -0,0 +1,247 @@
+"""
+Write-behind черга для прийому замовлень з груповим commit.
+
+У режимі ORDER_INTAKE_MODE=queue запити не пишуть у SQLite самі: вони кладуть
+замовлення в чергу процесу, а окремий потік-писач кожні кілька мілісекунд
+збирає накопичені замовлення і записує їх однією транзакцією. Кожен запит
+отримує свій id через Future після commit. Якщо commit не встиг за
+ORDER_QUEUE_TIMEOUT, замовлення скасовується, поки писач його не взяв
+(OrderQueueTimeout — повтор безпечний); якщо писач уже записує пакет —
+OrderPending: результат невідомий, повтор може створити дубль.
+
+Налаштування (змінні оточення):
+    ORDER_INTAKE_MODE          direct | queue (за замовчуванням direct)
+    ORDER_QUEUE_MAX_DELAY_MS   скільки чекати на наступні замовлення в пакет (5)
+    ORDER_QUEUE_MAX_BATCH      максимальний розмір пакета (64)
+    ORDER_QUEUE_DURABILITY     full | normal | off — PRAGMA synchronous писача (normal)
+    ORDER_QUEUE_TIMEOUT        скільки секунд запит чекає на commit (30)
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from database import connect_db, get_database_path, insert_order, add_order
+from db_writer import writer_lock
+from order_events import notify_order_events
+
+DURABILITY_LEVELS = {'full': 'FULL', 'normal': 'NORMAL', 'off': 'OFF'}
+
+
+class OrderQueueTimeout(Exception):
+    """Замовлення не записано за ORDER_QUEUE_TIMEOUT і скасоване — повтор безпечний"""
+
+
+class OrderPending(OrderQueueTimeout):
+    """Писач уже записує замовлення: скасувати не можна, повтор може створити дубль"""
+
+
+class OrderQueue:
+    """Черга замовлень з одним потоком-писачем і груповим commit"""
+
+    def __init__(self, db_path=None, max_delay_ms=5.0, max_batch=64, durability='normal'):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'Unknown durability: {durability}')
+        self.db_path = db_path or get_database_path()
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.durability = durability
+        self.stats = {'orders': 0, 'batches': 0, 'max_batch': 0, 'failed': 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        # submit і stop/аварія писача під одним lock'ом: після sentinel'а в чергу нічого не потрапить
+        self._guard = threading.Lock()
+        # той самий lock, що й у db_writer: запис серіалізується між потоками та workers
+        self._lock = writer_lock(self.db_path)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='order-queue-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def alive(self):
+        """Писач працює і приймає замовлення (False після stop або аварії потоку)"""
+        return not self._closed and self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=10.0):
+        """Зупинка писача; вже прийняті замовлення дописуються"""
+        if self._thread is None:
+            return
+        with self._guard:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, customer_name, phone, address, items, total, discount=0.0):
+        """Поставити замовлення в чергу; Future повертає id після commit"""
+        future = Future()
+        item = ({'customer_name': customer_name, 'phone': phone, 'address': address,
+                 'items': items, 'total': total, 'discount': discount}, future)
+        with self._guard:
+            if self._closed:
+                raise RuntimeError('Order queue is stopped')
+            self._queue.put(item)
+        return future
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = None
+        batch = []
+        try:
+            conn = connect_db(self.db_path, synchronous=DURABILITY_LEVELS[self.durability])
+            conn.isolation_level = None  # транзакціями керуємо вручну
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    if self._queue.empty():
+                        break
+                    continue
+                if not item[1].set_running_or_notify_cancel():
+                    continue  # запит уже скасував замовлення через таймаут
+                batch = self._collect_batch(item)
+                self._write_batch(conn, batch)
+                batch = []
+        except Exception as e:
+            # писач не може продовжити: запити отримують помилку замість ORDER_QUEUE_TIMEOUT,
+            # а get_order_queue() створить нову чергу
+            print('Order queue writer failed:', e)
+            self._fail_pending(batch, e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _fail_pending(self, batch, error):
+        with self._guard:
+            self._closed = True
+        pending = list(batch)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                pending.append(item)
+        for _payload, future in pending:
+            if not future.done():
+                self.stats['failed'] += 1
+                future.set_exception(error)
+
+    def _write_batch(self, conn, batch):
+        with self._lock:
+            self._write_batch_locked(conn, batch)
+
+    def _write_batch_locked(self, conn, batch):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            ids = [insert_order(cursor, **payload) for payload, _future in batch]
+            cursor.execute('COMMIT')
+        except Exception:
+            try:
+                cursor.execute('ROLLBACK')
+            except Exception:
+                pass
+            # Одне некоректне замовлення не повинно валити весь пакет — пишемо по одному
+            for payload, future in batch:
+                self._write_single(cursor, payload, future)
+            return
+        self.stats['orders'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        for (_payload, future), order_id in zip(batch, ids):
+            future.set_result(order_id)
+
+    def _write_single(self, cursor, payload, future):
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            order_id = insert_order(cursor, **payload)
+            cursor.execute('COMMIT')
+        except Exception as e:
+            try:
+                cursor.execute('ROLLBACK')
+            except Exception:
+                pass
+            self.stats['failed'] += 1
+            future.set_exception(e)
+            return
+        self.stats['orders'] += 1
+        self.stats['batches'] += 1
+        future.set_result(order_id)
+
+
+_order_queue = None
+_order_queue_pid = None
+_order_queue_lock = threading.Lock()
+
+
+def intake_mode():
+    return os.environ.get('ORDER_INTAKE_MODE', 'direct').strip().lower()
+
+
+def get_order_queue():
+    """Черга поточного процесу (створюється ліниво, заново після fork або аварії писача)"""
+    global _order_queue, _order_queue_pid
+    with _order_queue_lock:
+        if (_order_queue is None or _order_queue_pid != os.getpid()
+                or _order_queue.db_path != get_database_path() or not _order_queue.alive):
+            if _order_queue is not None and _order_queue_pid == os.getpid():
+                _order_queue.stop()
+            _order_queue = OrderQueue(
+                max_delay_ms=float(os.environ.get('ORDER_QUEUE_MAX_DELAY_MS', 5)),
+                max_batch=int(os.environ.get('ORDER_QUEUE_MAX_BATCH', 64)),
+                durability=os.environ.get('ORDER_QUEUE_DURABILITY', 'normal').strip().lower(),
+            ).start()
+            _order_queue_pid = os.getpid()
+        return _order_queue
+
+
+def shutdown_order_queue():
+    global _order_queue
+    with _order_queue_lock:
+        if _order_queue is not None and _order_queue_pid == os.getpid():
+            _order_queue.stop()
+        _order_queue = None
+
+
+atexit.register(shutdown_order_queue)
+
+
+def place_order(customer_name, phone, address, items, total, discount=0.0):
+    """Створення замовлення з урахуванням ORDER_INTAKE_MODE; повертає id"""
+    if intake_mode() != 'queue':
+        order_id = add_order(customer_name, phone, address, items, total, discount)
+    else:
+        future = get_order_queue().submit(customer_name, phone, address, items, total, discount)
+        try:
+            order_id = future.result(timeout=float(os.environ.get('ORDER_QUEUE_TIMEOUT', 30)))
+        except FutureTimeout:
+            # скасувати можна лише замовлення, якого писач ще не взяв у пакет
+            if future.cancel():
+                raise OrderQueueTimeout('Order was not written in time and has been cancelled')
+            if not future.done():
+                raise OrderPending('Order is still being written')
+            order_id = future.result()
+    notify_order_events()  # SSE-клієнти цього процесу отримають подію без очікування опитування
+    return order_id
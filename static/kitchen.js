@@ -0,0 +1,133 @@
+// Сторінка кухні: живий список замовлень з /admin/events (Server-Sent Events)
+//
+// Сервер рендерить незавершені замовлення і id останньої події (data-since);
+// далі лише події order_created / order_status. Після розриву EventSource
+// перепідключається сам з Last-Event-ID — пропущені події сервер довантажує;
+// після 503 (немає вільного SSE-місця) — новим EventSource з since через 10 с.
+document.addEventListener('DOMContentLoaded', () => {
+    const list = document.getElementById('kitchen-orders');
+    const statusLine = document.getElementById('kitchen-status');
+    if (!list || !window.EventSource) {
+        return;
+    }
+    const statuses = list.dataset.statuses.split(',');
+    const DONE = 'completed';
+
+    function escapeHtml(text) {
+        return String(text == null ? '' : text).replace(/[&<>"']/g, ch => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        })[ch]);
+    }
+
+    function nextStatus(status) {
+        const i = statuses.indexOf(status || 'new');
+        return i >= 0 && i < statuses.length - 1 ? statuses[i + 1] : null;
+    }
+
+    function addButton(card) {
+        const current = card.querySelector('.status').textContent;
+        const next = nextStatus(current);
+        let button = card.querySelector('button');
+        if (!next) {
+            if (button) button.remove();
+            return;
+        }
+        if (!button) {
+            button = document.createElement('button');
+            button.className = 'btn';
+            button.type = 'button';
+            card.appendChild(button);
+        }
+        button.textContent = '→ ' + next;
+        button.dataset.status = next;
+    }
+
+    function renderCard(event) {
+        const order = event.order;
+        const card = document.createElement('article');
+        card.className = 'kitchen-order fresh';
+        card.dataset.id = event.order_id;
+        const items = order.items.map(it => `<li>${escapeHtml(it.name || '#' + it.dish_id)} x${it.qty}</li>`).join('');
+        card.innerHTML = `<h4>#${event.order_id} · ${escapeHtml(order.customer_name)}</h4>`
+            + `<div class="muted">${escapeHtml(order.address)} · ${escapeHtml((order.created_at || '').slice(11, 16))}</div>`
+            + `<ul>${items}</ul>`
+            + `<div>${Math.trunc(order.total || 0)} грн · <span class="status">${escapeHtml(event.status)}</span></div>`;
+        return card;
+    }
+
+    function findCard(orderId) {
+        return list.querySelector(`.kitchen-order[data-id="${orderId}"]`);
+    }
+
+    function applyStatus(card, status) {
+        if (status === DONE) {
+            card.remove();
+            return;
+        }
+        card.querySelector('.status').textContent = status;
+        addButton(card);
+    }
+
+    list.querySelectorAll('.kitchen-order').forEach(addButton);
+
+    list.addEventListener('click', async (e) => {
+        const button = e.target.closest('button[data-status]');
+        if (!button) return;
+        const card = button.closest('.kitchen-order');
+        card.classList.remove('fresh');
+        button.disabled = true;
+        const body = new URLSearchParams({ status: button.dataset.status });
+        try {
+            const res = await fetch(`/admin/order/${card.dataset.id}/status`, {
+                method: 'POST', body, headers: { Accept: 'application/json' }, credentials: 'same-origin'
+            });
+            if (!res.ok) throw new Error(res.status);
+            // картку оновить подія order_status — так само, як на інших екранах
+        } catch (err) {
+            button.disabled = false;
+        }
+    });
+
+    let lastId = list.dataset.since;
+    let source;
+
+    function connect() {
+        source = new EventSource(`${list.dataset.events}?since=${encodeURIComponent(lastId)}`);
+        source.onopen = () => {
+            statusLine.textContent = 'Онлайн: нові замовлення з\'являються автоматично';
+            statusLine.classList.remove('offline');
+        };
+        source.onerror = () => {
+            statusLine.textContent = 'Зв\'язок втрачено, перепідключення…';
+            statusLine.classList.add('offline');
+            // 503 (усі SSE-місця worker'а зайняті) EventSource не повторює сам
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connect, 10000);
+            }
+        };
+        source.addEventListener('order_created', onCreated);
+        source.addEventListener('order_status', onStatus);
+    }
+
+    function onCreated(e) {
+        const event = JSON.parse(e.data);
+        lastId = e.lastEventId || lastId;
+        if (!event.order || findCard(event.order_id) || event.status === DONE) return;
+        const card = renderCard(event);
+        list.prepend(card);
+        addButton(card);
+    }
+
+    function onStatus(e) {
+        const event = JSON.parse(e.data);
+        lastId = e.lastEventId || lastId;
+        let card = findCard(event.order_id);
+        if (!card && event.order && event.status !== DONE) {
+            card = renderCard(event);
+            list.prepend(card);
+        }
+        if (card) applyStatus(card, event.status);
+    }
+
+    connect();
+});
@@ -94,10 +94,11 @@ const MenuCache = {
     }
 };
 
-/* Service Worker для offline підтримки */
-if ('serviceWorker' in navigator && window.location.protocol === 'https:') {
+/* Service Worker для offline підтримки: /sw.js з кореня, щоб контролювати всі сторінки */
+const isLocalhost = ['localhost', '127.0.0.1'].includes(window.location.hostname);
+if ('serviceWorker' in navigator && (window.location.protocol === 'https:' || isLocalhost)) {
     window.addEventListener('load', () => {
-        navigator.serviceWorker.register('/static/sw.js')
+        navigator.serviceWorker.register('/sw.js', { scope: '/' })
             .then(reg => console.log('Service Worker registered'))
             .catch(err => console.log('Service Worker registration failed'));
     });
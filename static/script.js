@@ -71,6 +71,52 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   }
 
+  // --- Пошук страв (FTS5 автодоповнення) ---
+  const menuSearch = document.getElementById('menuSearch');
+  if (menuSearch) {
+    const searchInput = document.getElementById('menuSearchInput');
+    const searchResults = document.getElementById('menuSearchResults');
+    const searchUrl = menuSearch.dataset.searchUrl;
+    let searchTimer = null;
+    let searchSeq = 0;
+
+    const renderResults = (items) => {
+      searchResults.innerHTML = '';
+      if (!items.length) {
+        const li = document.createElement('li');
+        li.className = 'menu-search-empty';
+        li.textContent = 'Нічого не знайдено';
+        searchResults.appendChild(li);
+      }
+      items.forEach(item => {
+        const li = document.createElement('li');
+        const a = document.createElement('a');
+        a.href = '/dish/' + item.id;
+        a.textContent = item.name;
+        li.appendChild(a);
+        searchResults.appendChild(li);
+      });
+      searchResults.hidden = false;
+    };
+
+    searchInput.addEventListener('input', () => {
+      clearTimeout(searchTimer);
+      const q = searchInput.value.trim();
+      if (!q) { searchResults.hidden = true; return; }
+      searchTimer = setTimeout(() => {
+        const seq = ++searchSeq;
+        fetch(searchUrl + '?autocomplete=1&q=' + encodeURIComponent(q))
+          .then(r => r.ok ? r.json() : [])
+          .then(items => { if (seq === searchSeq) renderResults(items); })
+          .catch(() => {});
+      }, 150);
+    });
+
+    document.addEventListener('click', (ev) => {
+      if (!menuSearch.contains(ev.target)) searchResults.hidden = true;
+    });
+  }
+
   // --- Flash messages -> toasts ---
   const flashContainers = document.querySelectorAll('.flash-messages');
   if (flashContainers.length) {
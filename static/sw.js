@@ -1,77 +1,134 @@
 // Service Worker для offline підтримки та кешування
-const CACHE_NAME = 'velvet-bite-v1';
-const STATIC_CACHE = [
-    '/',
-    '/static/style.css',
-    '/static/script.js',
-    '/static/performance.js',
-    '/static/images/mini.jpg',
-];
+//
+// Сервер віддає цей файл як /sw.js з маніфестом попереду (assets.py):
+//   self.__PRECACHE_MANIFEST = {version, precache: [URL з ?v=<hash>], staticPrefix}
+// Нова версія маніфесту → нові назви кешів, старі видаляються при активації.
+//
+// Стратегії:
+//   статика з ?v=<hash>        cache-first (вміст за URL ніколи не змінюється)
+//   /api/*/dishes, зображення  stale-while-revalidate (відповідь з кешу одразу, оновлення у фоні)
+//   навігація                  network-first, fallback — кеш або '/'
+const MANIFEST = self.__PRECACHE_MANIFEST || { version: 'dev', precache: ['/'], staticPrefix: '/static/' };
+const CACHE_PREFIX = 'velvet-bite-';
+const PRECACHE = CACHE_PREFIX + 'precache-' + MANIFEST.version;
+const RUNTIME = CACHE_PREFIX + 'runtime-' + MANIFEST.version;
+const RUNTIME_MAX_ENTRIES = 100;
 
-// Встановлення Service Worker
+const DISHES_API = /^\/api(\/v\d+)?\/dishes\/?$/;
+const IMAGE_EXT = /\.(png|jpe?g|gif|webp|avif|svg|ico)$/i;
+
+// Встановлення: precache з маніфесту
 self.addEventListener('install', (event) => {
-    console.log('Service Worker installing...');
     event.waitUntil(
-        caches.open(CACHE_NAME).then((cache) => {
-            console.log('Caching static assets');
-            return cache.addAll(STATIC_CACHE.map(url => new Request(url, { cache: 'reload' })));
-        })
+        caches.open(PRECACHE)
+            .then((cache) => cache.addAll(MANIFEST.precache.map(url => new Request(url, { cache: 'reload' }))))
+            .then(() => self.skipWaiting())
     );
 });
 
-// Активація Service Worker
+// Активація: видаляємо кеші попередніх версій маніфесту
 self.addEventListener('activate', (event) => {
-    console.log('Service Worker activating...');
     event.waitUntil(
-        caches.keys().then((cacheNames) => {
-            return Promise.all(
-                cacheNames.map((cacheName) => {
-                    if (cacheName !== CACHE_NAME) {
-                        console.log('Deleting old cache:', cacheName);
-                        return caches.delete(cacheName);
-                    }
-                })
-            );
-        })
+        caches.keys()
+            .then((cacheNames) => Promise.all(
+                cacheNames
+                    .filter(name => name.startsWith(CACHE_PREFIX) && name !== PRECACHE && name !== RUNTIME)
+                    .map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
     );
 });
 
-// Fetch стратегія: Network First, fallback to Cache
+function isHashedAsset(url) {
+    return url.pathname.startsWith(MANIFEST.staticPrefix) && url.searchParams.has('v');
+}
+
+function isImage(url) {
+    return IMAGE_EXT.test(url.pathname);
+}
+
+// Обмеження runtime кешу: найстаріші записи видаляються першими
+async function trimCache(cacheName, maxEntries) {
+    const cache = await caches.open(cacheName);
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map(key => cache.delete(key)));
+}
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(RUNTIME);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event) {
+    const request = event.request;
+    const cache = await caches.open(RUNTIME);
+    const cached = await cache.match(request);
+    const update = fetch(request)
+        .then(async (response) => {
+            if (response.ok) {
+                await cache.put(request, response.clone());
+                await trimCache(RUNTIME, RUNTIME_MAX_ENTRIES);
+            }
+            return response;
+        });
+    if (cached) {
+        // оновлення в фоні, помилки мережі ігноруються — відповідь уже з кешу
+        event.waitUntil(update.catch(() => undefined));
+        return cached;
+    }
+    return update;
+}
+
+async function networkFirst(request) {
+    try {
+        const response = await fetch(request);
+        if (response.ok && request.mode === 'navigate') {
+            const cache = await caches.open(RUNTIME);
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (err) {
+        const cached = await caches.match(request);
+        if (cached) {
+            return cached;
+        }
+        if (request.mode === 'navigate') {
+            const fallback = await caches.match('/');
+            if (fallback) {
+                return fallback;
+            }
+        }
+        return new Response('Network error', {
+            status: 408,
+            headers: { 'Content-Type': 'text/plain' }
+        });
+    }
+}
+
 self.addEventListener('fetch', (event) => {
-    // Пропускаємо non-GET запити
-    if (event.request.method !== 'GET') {
+    const request = event.request;
+    // Пропускаємо non-GET запити та чужі домени
+    if (request.method !== 'GET') {
         return;
     }
-    
-    event.respondWith(
-        fetch(event.request)
-            .then((response) => {
-                // Клонуємо відповідь для кешування
-                const responseToCache = response.clone();
-                
-                caches.open(CACHE_NAME).then((cache) => {
-                    cache.put(event.request, responseToCache);
-                });
-                
-                return response;
-            })
-            .catch(() => {
-                // Якщо network недоступний, використовуємо кеш
-                return caches.match(event.request).then((cachedResponse) => {
-                    if (cachedResponse) {
-                        return cachedResponse;
-                    }
-                    
-                    // Fallback для сторінок
-                    if (event.request.mode === 'navigate') {
-                        return caches.match('/');
-                    }
-                    
-                    return new Response('Network error', {
-                        status: 408,
-                        headers: { 'Content-Type': 'text/plain' }
-                    });
-                });
-            })
-    );
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (isHashedAsset(url)) {
+        event.respondWith(cacheFirst(request));
+    } else if (DISHES_API.test(url.pathname) || isImage(url)) {
+        event.respondWith(staleWhileRevalidate(event));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request));
+    }
 });
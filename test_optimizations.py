@@ -1,8 +1,10 @@
 """
 Тестовий файл для перевірки оптимізацій та безпеки
 """
+import os
 import sys
-import time
+import tempfile
+from contextlib import contextmanager
 from database import (
     validate_email, validate_phone, validate_price, validate_integer,
     sanitize_string, add_account, add_dish, add_feedback
@@ -122,26 +124,913 @@ def test_database_validation():
         print(f"  ⚠ WARNING: {e}")
 
 
+@contextmanager
+def temp_app_context():
+    """App context Flask застосунку з тимчасовою ініціалізованою БД"""
+    from main import app
+    from database import init_db
+    tmpdir = tempfile.mkdtemp(prefix='velvet-test-')
+    old_path = os.environ.get('DATABASE_PATH')
+    os.environ['DATABASE_PATH'] = os.path.join(tmpdir, 'test.db')
+    try:
+        with app.app_context():
+            init_db()
+            yield app
+    finally:
+        if old_path is None:
+            os.environ.pop('DATABASE_PATH', None)
+        else:
+            os.environ['DATABASE_PATH'] = old_path
+
+
+def test_sales_summary():
+    """Інкрементні зведені таблиці продажів збігаються з повним перерахунком"""
+    print("\n\n=== Тестування зведених таблиць продажів ===\n")
+    from database import (add_order, update_order_status, rebuild_sales_summary,
+                          get_sales_totals, get_sales_by_status, get_top_dishes, get_sales_daily)
+    with temp_app_context():
+        d1 = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        d2 = add_dish("Cake", 90, "cake.jpg", "desc", "flour", 400)
+        add_order("A", "+380501234567", "Table 1", [{'dish_id': d1, 'qty': 2}, {'dish_id': d2, 'qty': 1}], 210)
+        o2 = add_order("B", "+380501234568", "Table 2", [[d2, 3]], 270)
+        update_order_status(o2, 'done')
+
+        def snapshot():
+            return (dict(get_sales_totals()),
+                    [dict(r) for r in get_sales_by_status()],
+                    [dict(r) for r in get_top_dishes(10)],
+                    [dict(r) for r in get_sales_daily()])
+
+        incremental = snapshot()
+        rebuild_sales_summary()
+        assert snapshot() == incremental
+        assert incremental[0] == {'orders_count': 2, 'revenue': 480.0}
+        assert {r['status']: r['orders_count'] for r in incremental[1]} == {'done': 1, 'new': 1}
+        assert incremental[2][0]['dish_id'] == d2 and incremental[2][0]['quantity'] == 4
+        print("  ✓ PASS: інкрементні підсумки = перерахунок")
+
+
+def test_dish_search():
+    """FTS5 індекс синхронізується тригерами та підтримує префіксний пошук"""
+    print("\n\n=== Тестування пошуку страв ===\n")
+    from database import search_dishes, update_dish, delete_dish
+    with temp_app_context():
+        latte = add_dish("Лате карамельне", 60, "latte.jpg", "Кава з молоком", "кава, молоко", 120)
+        cake = add_dish("Чізкейк", 90, "cake.jpg", "Десерт", "сир", 400)
+        assert [r['id'] for r in search_dishes("ла")] == [latte]
+        assert [r['id'] for r in search_dishes("молок")] == [latte]
+        update_dish(cake, "Чізкейк вишневий", 90, "cake.jpg", "Десерт", "сир, вишня", 400)
+        assert [r['id'] for r in search_dishes("вишн")] == [cake]
+        delete_dish(latte)
+        assert search_dishes("лате") == []
+        assert search_dishes('"*)') == []
+        print("  ✓ PASS: insert/update/delete синхронізовані, префіксний пошук працює")
+
+        # LIKE fallback (SQLite без FTS5): % і _ користувача — не шаблони
+        import sqlite3
+        from database import get_db
+        promo = add_dish("Знижка 50% на торт", 70, "cake.jpg", "Десерт", "сир", 300)
+        db = get_db()
+        db.execute('DROP TABLE dish_fts')
+        db.commit()
+        assert search_dishes("_") == [] and search_dishes("%") == []
+        assert [r['id'] for r in search_dishes("50%")] == [promo]
+        assert [r['id'] for r in search_dishes("вишн")] == [cake]
+        # інші помилки FTS не маскуються LIKE-пошуком
+        db.execute('CREATE TABLE dish_fts (name TEXT)')
+        db.commit()
+        try:
+            search_dishes("вишн")
+            assert False, "broken dish_fts must not silently fall back to LIKE"
+        except sqlite3.OperationalError:
+            pass
+        print("  ✓ PASS: LIKE fallback екранує % і _, лише коли FTS5 недоступний")
+
+
+def test_dish_filters_use_indexes():
+    """Фільтри та сортування /api/v2/dishes виконуються через idx_dish_price / idx_dish_name"""
+    print("\n\n=== Тестування плану запитів для фільтрів страв ===\n")
+    from database import build_dish_query, get_dishes_filtered, get_db
+    with temp_app_context():
+        for name, price, calories in (("B", 30, 100), ("A", 10, 500), ("C", 20, 50)):
+            add_dish(name, price, "", "", "", calories)
+        cases = [
+            ({'min_price': 15, 'max_price': 40}, 'idx_dish_price'),
+            ({'sort': 'price'}, 'idx_dish_price'),
+            ({'sort': 'price', 'descending': True, 'min_price': 5}, 'idx_dish_price'),
+            ({'sort': 'name', 'fields': ['id', 'name']}, 'idx_dish_name'),
+        ]
+        db = get_db()
+        for filters, index in cases:
+            query, params = build_dish_query(**filters)
+            plan = ' '.join(row[3] for row in db.execute('EXPLAIN QUERY PLAN ' + query, params))
+            print(f"  {filters} -> {plan}")
+            assert index in plan
+            assert 'TEMP B-TREE' not in plan
+        rows = get_dishes_filtered(min_price=15, sort='price', fields=['name'])
+        assert [tuple(r) for r in rows] == [("C",), ("B",)]
+        rows = get_dishes_filtered(max_calories=200, sort='name', descending=True, fields=['name'])
+        assert [r['name'] for r in rows] == ["C", "B"]
+
+
+def test_order_queue_group_commit():
+    """Замовлення з кількох потоків пишуться пакетами, кожен запит отримує свій id"""
+    print("\n\n=== Тестування групового commit замовлень ===\n")
+    import threading
+    from database import get_db, get_sales_totals, get_database_path, connect_db
+    from order_queue import OrderQueue
+    with temp_app_context():
+        dish_id = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        q = OrderQueue(get_database_path(), max_delay_ms=20, max_batch=16).start()
+        ids = []
+
+        def worker():
+            for _ in range(10):
+                ids.append(q.submit("A", "+380501234567", "Table 1", [{'dish_id': dish_id, 'qty': 1}], 60).result(10))
+
+        pool = [threading.Thread(target=worker) for _ in range(4)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        q.stop()
+        print(f"  stats: {q.stats}")
+        assert len(set(ids)) == 40
+        assert q.stats['orders'] == 40 and q.stats['batches'] < 40
+        count = get_db().execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        assert count == 40
+        assert get_sales_totals()['orders_count'] == 40
+
+        # аварія писача: очікувані замовлення отримують помилку, черга процесу створюється заново
+        import sqlite3
+        import order_queue
+
+        def failing_connect(*args, **kwargs):
+            raise sqlite3.OperationalError('unable to open database file')
+
+        order_queue.connect_db = failing_connect
+        try:
+            dead = OrderQueue(get_database_path())
+            pending = dead.submit("B", "+380501234567", "Table 2", [{'dish_id': dish_id, 'qty': 1}], 60)
+            dead.start()
+            try:
+                pending.result(5)
+                assert False, "writer failure must reach the waiting request"
+            except sqlite3.OperationalError:
+                pass
+        finally:
+            order_queue.connect_db = connect_db
+        assert not dead.alive
+        try:
+            dead.submit("B", "+380501234567", "Table 2", [{'dish_id': dish_id, 'qty': 1}], 60)
+            assert False, "closed queue must reject orders"
+        except RuntimeError:
+            pass
+        order_queue._order_queue, order_queue._order_queue_pid = dead, os.getpid()
+        try:
+            fresh = order_queue.get_order_queue()
+            assert fresh is not dead and fresh.alive
+            assert fresh.submit("B", "+380501234567", "Table 2", [{'dish_id': dish_id, 'qty': 1}], 60).result(10)
+        finally:
+            order_queue.shutdown_order_queue()
+
+
+def test_order_queue_timeout():
+    """Таймаут черги: не взяте писачем замовлення скасовується і не записується, взяте — OrderPending"""
+    print("\n\n=== Тестування таймауту черги замовлень ===\n")
+    from database import get_db, get_database_path
+    from db_writer import writer_lock
+    from order_queue import place_order, OrderPending, shutdown_order_queue
+    env = {'ORDER_INTAKE_MODE': 'queue', 'ORDER_QUEUE_TIMEOUT': '0.2', 'ORDER_QUEUE_MAX_DELAY_MS': '0'}
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        with temp_app_context() as app:
+            dish_id = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+            client = app.test_client()
+            with writer_lock(get_database_path()):
+                # писач узяв перше замовлення і чекає lock: скасувати вже не можна
+                try:
+                    place_order("A", "+380501234567", "Table 1", [{'dish_id': dish_id, 'qty': 1}], 60)
+                    assert False, "order taken by the writer must not be reported as failed"
+                except OrderPending:
+                    pass
+                # друге ще в черзі — скасовується, клієнт може безпечно повторити
+                resp = client.post('/api/v2/orders', json={'address': 'Table 2', 'items': [{'dish_id': dish_id}]})
+                assert resp.status_code == 503 and resp.get_json()['error'] == 'order_queue_timeout'
+                assert resp.headers['Retry-After'] == '1'
+            shutdown_order_queue()  # дописує прийняте
+            addresses = [r[0] for r in get_db().execute('SELECT address FROM orders')]
+            assert addresses == ['Table 1'], addresses
+    finally:
+        shutdown_order_queue()
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("  ✓ PASS: скасоване за таймаутом замовлення не записано, взяте писачем — order_pending")
+
+
+def test_single_writer_mode():
+    """DB_WRITE_MODE=writer: мутації виконує потік-писач, з'єднання запиту лише читає"""
+    print("\n\n=== Тестування режиму єдиного писача ===\n")
+    import sqlite3
+    from database import get_db, add_favourite, get_all_favourites
+    from db_writer import get_writer, shutdown_writer
+    os.environ['DB_WRITE_MODE'] = 'writer'
+    try:
+        with temp_app_context():
+            dish_id = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+            add_favourite(dish_id, 7)
+            assert [f['dish_id'] for f in get_all_favourites(7)] == [dish_id]
+            try:
+                get_db().execute("INSERT INTO work (name) VALUES ('x')")
+                assert False, "request connection must be read-only"
+            except sqlite3.OperationalError:
+                pass
+            try:
+                add_dish("", 10, "", "", "", 1)
+                assert False, "validation error must propagate from the writer"
+            except ValueError:
+                pass
+            print(f"  stats: {get_writer().stats}")
+            assert get_writer().stats['mutations'] >= 3
+    finally:
+        os.environ.pop('DB_WRITE_MODE', None)
+        shutdown_writer()
+
+
+def test_read_only_connections_for_safe_methods():
+    """GET запити читають через окреме read-only з'єднання, POST — через read-write"""
+    print("\n\n=== Тестування read-only з'єднань ===\n")
+    import sqlite3
+    from database import get_db, get_read_db, READ_CACHE_SIZE_KB
+    with temp_app_context() as app:
+        add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        with app.test_request_context('/', method='GET'):
+            conn = get_read_db()
+            assert conn is not get_db()
+            assert conn.execute('PRAGMA cache_size').fetchone()[0] == -READ_CACHE_SIZE_KB
+            assert conn.execute('SELECT COUNT(*) FROM dish').fetchone()[0] == 1
+            try:
+                conn.execute("INSERT INTO work (name) VALUES ('x')")
+                assert False, "read-only connection accepted a write"
+            except sqlite3.OperationalError:
+                pass
+        with app.test_request_context('/', method='POST'):
+            assert get_read_db() is get_db()
+
+
+def test_async_api_matches_wsgi():
+    """asgi:app віддає /api/v2 читання через DB executor з тими ж відповідями, що й Flask"""
+    print("\n\n=== Тестування асинхронного API ===\n")
+    import asyncio
+    import threading
+    import asgi
+
+    async def call(path, query=b''):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await asgi.app({'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+                        'headers': [], 'scheme': 'http', 'server': ('testserver', 80)}, receive, send)
+        return messages[0]['status'], b''.join(m.get('body', b'') for m in messages[1:])
+
+    with temp_app_context() as app:
+        add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        add_dish("Borscht", 90, "borscht.jpg", "soup", "beet", 300)
+        client = app.test_client()
+        try:
+            for path, query in (('/api/v2/dishes', b''), ('/api/v2/dishes', b'sort=price&order=desc&fields=id,name'),
+                                ('/api/v2/dishes/1', b''), ('/api/v2/dishes/999', b''),
+                                ('/api/v2/dishes', b'sort=bad'), ('/api/v2/reports/summary', b'')):
+                expected = client.get(path, query_string=query.decode())
+                status, body = asyncio.run(call(path, query))
+                print(f"  {path}?{query.decode()} -> {status}")
+                assert (status, body) == (expected.status_code, expected.data)
+
+            async def thread_names():
+                return await asyncio.gather(*(asgi.run_db(lambda: threading.current_thread().name)
+                                              for _ in range(20)))
+
+            assert all(name.startswith('async-db') for name in asyncio.run(thread_names()))
+            os.environ['ASYNC_MAX_PENDING'] = '0'
+            assert asyncio.run(call('/api/v2/dishes'))[0] == 503
+        finally:
+            os.environ.pop('ASYNC_MAX_PENDING', None)
+            asgi.shutdown_db_executor()
+
+
+def test_batch_api():
+    """POST /api/v2/batch: multi-get одним IN запитом, записи в одній транзакції"""
+    print("\n\n=== Тестування batch API ===\n")
+    import api
+    from database import CONNECTION_HOOKS, close_db, get_all_favourites, get_all_orders
+    statements = []
+
+    def trace(conn):
+        conn.set_trace_callback(statements.append)
+
+    with temp_app_context() as app:
+        d1 = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        d2 = add_dish("Cake", 90, "cake.jpg", "desc", "flour", 400)
+        client = app.test_client()
+        client.get('/health')  # ініціалізація застосунку при першому запиті — поза трасою
+        close_db()  # нові з'єднання отримають trace callback
+        CONNECTION_HOOKS.append(trace)
+        try:
+            resp = client.post('/api/v2/batch', json={'operations': [
+                {'op': 'get_dishes', 'ids': [d2, 999, d1]},
+                {'op': 'add_favourite', 'dish_id': d1, 'account_id': 7},
+                {'op': 'get_favourites', 'account_id': 7},
+                {'op': 'create_order', 'address': 'Table 1', 'items': [{'dish_id': d1, 'qty': 2}, [d2, 1]]},
+            ]})
+        finally:
+            CONNECTION_HOOKS.remove(trace)
+        assert resp.status_code == 200, resp.data
+        results = [r['result'] for r in resp.get_json()['results']]
+        assert [d['id'] for d in results[0]['dishes']] == [d2, d1] and results[0]['missing'] == [999]
+        assert [f['dish_id'] for f in results[2]] == [d1]
+        assert results[3]['total'] == 210.0
+        assert sum(1 for s in statements if s.startswith('SELECT * FROM dish WHERE id IN')) == 2
+        assert sum(1 for s in statements if s.startswith('COMMIT')) == 1
+        print(f"  ✓ PASS: 4 операції, {len(statements)} SQL, один COMMIT")
+
+        # повторне add_favourite після create_order повертає id наявного рядка;
+        # batch із create_order будить слухача SSE, як і place_order
+        notified = []
+        saved_notify = api.notify_order_events
+        api.notify_order_events = lambda: notified.append(True)
+        try:
+            resp = client.post('/api/v2/batch', json={'operations': [
+                {'op': 'create_order', 'address': 'Table 2', 'items': [[d2, 1]]},
+                {'op': 'add_favourite', 'dish_id': d1, 'account_id': 7},
+            ]})
+            client.post('/api/v2/batch', json={'operations': [{'op': 'add_favourite', 'dish_id': d2, 'account_id': 8}]})
+        finally:
+            api.notify_order_events = saved_notify
+        assert resp.get_json()['results'][1]['result'] == {'id': results[1]['id']}, resp.data
+        assert notified == [True]
+
+        def failing_remove(cursor, op):
+            raise ValueError('boom')
+
+        original = dict(api.BATCH_OPERATIONS)
+        api.BATCH_OPERATIONS['remove_favourite'] = failing_remove
+        try:
+            resp = client.post('/api/v2/batch', json={'operations': [
+                {'op': 'add_favourite', 'dish_id': d2, 'account_id': 7},
+                {'op': 'remove_favourite', 'dish_id': d1, 'account_id': 7},
+            ]})
+        finally:
+            api.BATCH_OPERATIONS.update(original)
+        assert resp.status_code == 400 and resp.get_json()['index'] == 1
+        assert [f['dish_id'] for f in get_all_favourites(7)] == [d1]
+        assert len(get_all_orders()) == 2
+        assert client.post('/api/v2/batch', json={'operations': [{'op': 'drop_table'}]}).status_code == 400
+        print("  ✓ PASS: помилка операції відкочує всю транзакцію")
+
+
+def test_dish_popularity():
+    """Лічильники популярності оновлюються інкрементно і збігаються з перерахунком"""
+    print("\n\n=== Тестування популярності страв ===\n")
+    from database import (add_favourite, delete_favourite_by_dish, add_order, get_popular_dishes,
+                          rebuild_popularity, rebuild_sales_summary)
+    with temp_app_context() as app:
+        latte = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        cake = add_dish("Cake", 90, "cake.jpg", "desc", "flour", 400)
+        for account_id in (1, 2, 3):
+            add_favourite(cake, account_id)
+        add_favourite(cake, 1)  # дублікат не рахується
+        add_favourite(latte, 1)
+        delete_favourite_by_dish(cake, 3)
+        add_order("A", "+380501234567", "Table 1", [{'dish_id': latte, 'qty': 3}, [cake, 1]], 270)
+
+        def ranking(by):
+            return [(r['id'], r['ordered_quantity'], r['favourites_count']) for r in get_popular_dishes(by, 5)]
+
+        assert ranking('favourites') == [(cake, 1, 2), (latte, 3, 1)]
+        assert ranking('orders') == [(latte, 3, 1), (cake, 1, 2)]
+        incremental = (ranking('favourites'), ranking('orders'))
+        rebuild_popularity()
+        rebuild_sales_summary()
+        assert (ranking('favourites'), ranking('orders')) == incremental
+
+        client = app.test_client()
+        resp = client.get('/api/v2/dishes/popular?by=favourites&limit=1')
+        assert [d['id'] for d in resp.get_json()] == [cake]
+        assert client.get('/api/v2/dishes/popular?by=price').status_code == 400
+        assert 'Популярне' in client.get('/').get_data(as_text=True)
+        print("  ✓ PASS: інкрементні лічильники = перерахунок, /api/v2/dishes/popular працює")
+
+
+def test_dish_recommendations():
+    """Матриця спільних замовлень оновлюється при add_order і віддає top-k сусідів"""
+    print("\n\n=== Тестування рекомендацій ===\n")
+    from database import add_order, get_recommendations, rebuild_dish_pairs
+    with temp_app_context() as app:
+        latte, cake, cookie = (add_dish(n, 50, "x.jpg", "desc", "i", 100) for n in ("Latte", "Cake", "Cookie"))
+        add_order("A", "+380501234567", "T1", [{'dish_id': latte, 'qty': 1}, {'dish_id': cake, 'qty': 2}], 150)
+        add_order("B", "+380501234567", "T2", [[latte, 1], [cake, 1], [cookie, 1]], 150)
+        add_order("C", "+380501234567", "T3", [[latte, 2], [latte, 1]], 150)  # одна страва — без пар
+
+        def top(dish_id):
+            return [(r['id'], r['orders_count']) for r in get_recommendations(dish_id, 5)]
+
+        assert top(latte) == [(cake, 2), (cookie, 1)]
+        assert top(cookie) == [(latte, 1), (cake, 1)]
+        incremental = (top(latte), top(cake), top(cookie))
+        rebuild_dish_pairs()
+        assert (top(latte), top(cake), top(cookie)) == incremental
+
+        client = app.test_client()
+        assert [d['id'] for d in client.get(f'/api/v2/dishes/{latte}/recommendations?limit=1').get_json()] == [cake]
+        assert client.get('/api/v2/dishes/999/recommendations').status_code == 404
+        assert 'Разом з цією стравою замовляють' in client.get(f'/dish/{latte}').get_data(as_text=True)
+        print("  ✓ PASS: інкрементна матриця = перерахунок, top-k з індексу")
+
+
+def test_json_provider():
+    """FastJSONProvider: швидкий шлях для рядків дає той самий JSON, що й dict + json.dumps"""
+    print("\n\n=== Тестування JSON провайдера ===\n")
+    import json
+    import sqlite3
+    import json_provider
+    from main import app
+    from models import make_row_factory
+    for row_factory in (sqlite3.Row, make_row_factory()):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = row_factory
+        conn.execute('CREATE TABLE t (id INTEGER, "na%s""me" TEXT, price REAL, note TEXT)')
+        conn.executemany('INSERT INTO t VALUES (?, ?, ?, ?)',
+                         [(1, 'Лате "x"', 60.5, None), (2, 'Cake\n', float('inf'), 'ok')])
+        rows = conn.execute('SELECT * FROM t').fetchall()
+        single = conn.execute('SELECT id FROM t').fetchall()
+        expected = json.dumps([dict(r) for r in rows], sort_keys=True, separators=(',', ':'))
+        provider = json_provider.FastJSONProvider(app)
+        saved = json_provider.orjson
+        try:
+            json_provider.orjson = None
+            assert provider.dumps(rows) == expected
+            assert provider.dumps(single) == '[{"id":1},{"id":2}]'
+            assert provider.dumps({'rows': rows[:1]}) == json.dumps({'rows': [dict(rows[0])]}, sort_keys=True,
+                                                                   separators=(',', ':'))
+            print(f"  ✓ PASS: stdlib шлях ({type(rows[0]).__name__})")
+        finally:
+            json_provider.orjson = saved
+        if saved is not None:
+            finite = [r for r in rows if r['price'] != float('inf')]
+            assert json.loads(provider.dumps(finite)) == [dict(r) for r in finite]
+            assert json.loads(provider.dumps({'rows': finite})) == {'rows': [dict(r) for r in finite]}
+            print(f"  ✓ PASS: orjson шлях ({type(rows[0]).__name__})")
+    # не-ASCII: обидва шляхи дають однакові байти (\\uXXXX, як json.dumps)
+    provider = json_provider.FastJSONProvider(app)
+    payload = {'name': 'Борщ', 'note': 'кава ☕ 😀', 'tags': ['ціна', 'x"y']}
+    expected = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('ascii')
+    saved = json_provider.orjson
+    try:
+        json_provider.orjson = None
+        assert provider.dumps_bytes(payload) == expected
+    finally:
+        json_provider.orjson = saved
+    assert provider.dumps_bytes(payload) == expected
+    print("  ✓ PASS: не-ASCII екранується однаково з orjson і без нього")
+    with app.test_request_context():
+        resp = app.json.response([])
+        assert resp.get_data() == b'[]\n' and resp.mimetype == 'application/json'
+
+
+def test_row_models():
+    """Рядки БД — компактні моделі з доступом як до sqlite3.Row, атрибутами та .get"""
+    print("\n\n=== Тестування моделей рядків ===\n")
+    from database import get_dish_by_id, get_all_orders, get_account_by_id, get_all_favourites, add_order, add_favourite
+    from models import Dish, Order, Account, Record
+    with temp_app_context() as app:
+        latte = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        add_order("A", "+380501234567", "T1", [{'dish_id': latte, 'qty': 2}, [999, 1]], 120)
+        account_id = add_account("Ivan", "Petrenko", "+380501234567", "ivan@example.com")
+        add_favourite(latte, account_id)
+
+        dish = get_dish_by_id(latte)
+        assert type(dish).__bases__[0] is Dish and not hasattr(dish, '__dict__')
+        assert dish.name == dish['name'] == dish[1] == 'Latte'
+        assert dish.get('missing', 'x') == 'x' and dict(dish) == dish.to_json()
+        assert isinstance(get_all_orders()[0], Order) and isinstance(get_account_by_id(account_id), Account)
+        favourite = get_all_favourites(account_id)[0]
+        assert type(favourite).__bases__[0] is Record and favourite['dish_id'] == latte
+        try:
+            dish['missing']
+            assert False, 'IndexError expected'
+        except IndexError:
+            pass
+
+        order = get_all_orders()[0]
+        assert order.parsed_items == [(latte, 2), (999, 1)]
+        extended = order.extend(items_text='Latte x2')
+        assert isinstance(extended, Order) and extended.items_text == 'Latte x2' and extended.id == order.id
+
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess['is_admin'] = True
+            html = client.get('/admin').get_data(as_text=True)
+            assert 'Latte x2, #999 x1' in html
+        print("  ✓ PASS: Dish/Order/Account, .get, to_json, items_text одним запитом")
+
+
+def test_warm_up_and_catalog_cache():
+    """Прогрів компілює всі шаблони; каталог страв береться з кешу, доки dish не зміниться"""
+    print("\n\n=== Тестування прогріву та кешу каталогу ===\n")
+    import main
+    from database import get_all_dish, get_db, connect_db, update_dish
+    with temp_app_context() as app:
+        assert app.jinja_env.auto_reload is False
+        latte = add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)
+        app.jinja_env.cache.clear()
+        main.warm_up(app)
+        compiled = {name for _loader, name in app.jinja_env.cache.keys()}
+        assert {'index.html', 'admin.html', 'order.html', 'account.html'} <= compiled
+
+        statements = []
+        get_db().set_trace_callback(statements.append)
+        assert [d.name for d in get_all_dish()] == ["Latte"]
+        assert not [s for s in statements if 'FROM dish' in s], statements  # кеш, заповнений warm_up
+        update_dish(latte, "Flat white", 65, "fw.jpg", "desc", "milk", 110)
+        assert [d.name for d in get_all_dish()] == ["Flat white"]
+        other = connect_db()  # зміна з іншого процесу/worker'а
+        other.execute('DELETE FROM dish')
+        other.commit()
+        other.close()
+        assert get_all_dish() == []
+        print(f"  ✓ PASS: {len(compiled)} шаблонів скомпільовано, кеш каталогу інвалідується тригерами")
+
+
+def test_app_factory_and_lazy_apidocs():
+    """create_app(config) дає незалежний застосунок; Swagger UI ініціалізується при першому /apidocs"""
+    print("\n\n=== Тестування фабрики застосунку ===\n")
+    from main import create_app
+    from benchmark import measure_startup, load_baseline, compare_with_baseline, print_startup_report
+    app = create_app({'ENV': 'development', 'TESTING': True})
+    assert app.config['TESTING'] and app.config['SESSION_COOKIE_SECURE'] is False
+    assert 'admin' in app.view_functions and 'api_v2.v2_get_all_dishes' in app.view_functions
+    docs = app.wsgi_app
+    assert not docs.loaded
+    client = app.test_client()
+    assert client.get('/apidocs/').status_code == 200
+    spec = client.get('/apispec_1.json').get_json()
+    assert docs.loaded and '/api/v2/dishes' in spec['paths']
+
+    startup = measure_startup(runs=1)
+    print_startup_report(startup)
+    assert startup['eager_modules'] == []
+    assert not compare_with_baseline({'results': {}, 'startup': startup}, {'startup': load_baseline()['startup']},
+                                     check_latency=False)
+    print("  ✓ PASS: фабрика, лінивий Flasgger, без важких модулів при старті")
+
+
+def test_gunicorn_preload_hooks():
+    """prepare_preload: прогрів, без потоків писача в master, gc.freeze(); after_fork скидає писача"""
+    print("\n\n=== Тестування preload для gunicorn ===\n")
+    import gc
+    import db_writer
+    import main
+    from gunicorn_conf import memory_usage
+    os.environ['DB_WRITE_MODE'] = 'writer'
+    try:
+        with temp_app_context() as app:
+            add_dish("Latte", 60, "latte.jpg", "desc", "milk", 120)  # запускає потік-писач
+            assert db_writer._writer is not None
+            frozen = main.prepare_preload(app)
+            assert frozen > 0 and db_writer._writer is None
+            print(f"  frozen objects: {frozen}, memory: {memory_usage()}")
+            main.after_fork()
+            assert add_dish("Cake", 90, "cake.jpg", "desc", "flour", 400)  # писач створюється заново
+    finally:
+        gc.unfreeze()
+        os.environ.pop('DB_WRITE_MODE', None)
+        db_writer.shutdown_writer()
+    assert memory_usage()['rss_kb'] > 0
+
+
+def test_asset_manifest_and_service_worker():
+    """static_url() з хешем вмісту, immutable кешування і /sw.js з версією маніфесту"""
+    print("\n\n=== Тестування маніфесту статики ===\n")
+    from assets import AssetManifest, IMMUTABLE_CACHE_CONTROL
+    from main import create_app
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    manifest = app.extensions['assets']
+    url = manifest.url(manifest.bundle_files('site.css')[0])  # бандл або style.css, якщо не зібрано
+    with temp_app_context():  # перший запит ініціалізує тимчасову БД, а не my_database.db
+        assert '?v=' in url and url in client.get('/about').get_data(as_text=True)
+        assert client.get(url).headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+        assert client.get('/static/style.css?v=stale').headers.get('Cache-Control') != IMMUTABLE_CACHE_CONTROL
+        sw = client.get('/sw.js')
+    body = sw.get_data(as_text=True)
+    assert sw.headers['Cache-Control'] == 'no-cache' and url in body and 'sw.js?v=' not in body
+    print(f"  version: {app.extensions['assets'].version}, {len(body)} bytes")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'app.js')
+        with open(path, 'w') as f:
+            f.write('one')
+        manifest = AssetManifest(folder, '/static', auto_reload=True)
+        version, first = manifest.version, manifest.url('app.js')
+        with open(path, 'w') as f:
+            f.write('two')
+        os.utime(path, ns=(1, 1))  # гарантовано інший mtime
+        assert manifest.version != version and manifest.url('app.js') != first
+    print("  ✓ PASS: хеші вмісту, нова версія при зміні файлу")
+
+
+def test_asset_bundles():
+    """Мінімізація без зміни рядків/regex, бандли з поточних файлів, critical CSS у index.html"""
+    print("\n\n=== Тестування збірки статики ===\n")
+    import shutil
+    from assets import AssetManifest
+    from bundler import BUNDLES, build_bundles, minify_css, minify_js
+    from main import create_app
+    assert minify_css('a  >  b , c:hover { color : red ; content: "a  b" ; }') == 'a>b,c:hover{color:red;content:"a  b"}'
+    js = minify_js('let a = b / 2; // c\nconst r = /[/]x/g, t = `x  ${ a }  y`;\nreturn a++ + +b')
+    assert js == 'let a=b / 2;\nconst r=/[/]x/g,t=`x  ${a}  y`;\nreturn a++ + +b\n'
+
+    static = tempfile.mkdtemp(prefix='velvet-static-')
+    templates = os.path.join(static, 'templates')
+    try:
+        for src in {src for sources in BUNDLES.values() for src in sources}:
+            shutil.copy(os.path.join('static', src), static)
+        shutil.copytree('templates', templates)
+        built = build_bundles(static, templates)
+        for name, info in built.items():
+            print(f"  {name}: {info['source_bytes']} -> {info['bytes']} bytes")
+            assert info['bytes'] < info['source_bytes']
+        with open(os.path.join(static, 'dist', 'index.critical.css')) as f:
+            critical = f.read()
+        assert '.navbar{' in critical and ':hover' not in critical
+
+        manifest = AssetManifest(static, '/static', template_folder=templates)
+        assert manifest.bundle_files('site.js') == ['dist/site.js']
+        app = create_app({'TESTING': True})
+        app.extensions['assets'] = manifest
+        with temp_app_context():
+            html = app.test_client().get('/').get_data(as_text=True)
+        assert '<style>' in html and html.count('/static/dist/site.css?v=') == 2  # preload + noscript
+        assert 'performance.js' not in html and '/static/dist/site.js?v=' in html
+
+        with open(os.path.join(templates, 'index.html'), 'a') as f:
+            f.write('\n{# змінено після збірки #}\n')
+        manifest = AssetManifest(static, '/static', template_folder=templates)
+        assert manifest.bundle_current('site.css') and not manifest.bundle_current('index.critical.css')
+
+        with open(os.path.join(static, 'script.js'), 'a') as f:
+            f.write('\n// змінено після збірки\n')
+        manifest = AssetManifest(static, '/static', template_folder=templates)
+        assert manifest.bundle_files('site.js') == ['performance.js', 'script.js']  # застарілий бандл не віддається
+    finally:
+        shutil.rmtree(static, ignore_errors=True)
+    print("  ✓ PASS: бандли, critical CSS, fallback на вихідні файли")
+
+
+def test_wal_checkpoint_scheduler():
+    """PASSIVE/TRUNCATE checkpoint лише в тихий період, стан для /health, wal_autocheckpoint"""
+    print("\n\n=== Тестування фонового checkpoint WAL ===\n")
+    from database import connect_db, get_database_path
+    from wal_checkpoint import CheckpointScheduler, wal_size, wal_status
+    os.environ['WAL_AUTOCHECKPOINT'] = '0'  # лише планувальник
+    try:
+        with temp_app_context() as app:
+            db_path = get_database_path()
+            conn = connect_db()
+            assert conn.execute('PRAGMA wal_autocheckpoint').fetchone()[0] == 0
+            for i in range(50):
+                add_dish(f"Dish {i}", 10 + i, "img.jpg", "desc" * 50, "ingredients", 100)
+            size = wal_size(db_path)
+            assert size > 0
+            scheduler = CheckpointScheduler(db_path, quiet_ms=1000, truncate_bytes=0)
+            assert scheduler.tick(conn, now=100.0) is None  # WAL щойно змінився — не тихо
+            assert scheduler.tick(conn, now=100.5) is None
+            assert scheduler.tick(conn, now=101.5) == 'TRUNCATE'
+            assert wal_size(db_path) == 0 and scheduler.stats['passive'] == 1
+            status = wal_status(db_path, page_size=4096)
+            print(f"  WAL: {size} -> {status['wal_bytes']} bytes, checkpoint: {status['checkpoint']}")
+            assert status['checkpoint']['mode'] == 'TRUNCATE' and status['checkpoint']['lag_frames'] == 0
+            health = app.test_client().get('/health').get_json()
+            assert health['status'] == 'ok' and 'wal_bytes' in health['wal']
+            conn.close()
+    finally:
+        os.environ.pop('WAL_AUTOCHECKPOINT', None)
+    print("  ✓ PASS: checkpoint у тихий період, WAL обрізано, стан у /health")
+
+
+def test_db_maintenance():
+    """ANALYZE змінених таблиць, incremental vacuum кроками, міграція auto_vacuum, maintenance_runs"""
+    print("\n\n=== Тестування обслуговування БД ===\n")
+    import sqlite3
+    from database import get_db, get_database_path
+    from maintenance import run_maintenance, format_report, tables_to_analyze
+    with temp_app_context():
+        db_path = get_database_path()
+        for i in range(300):
+            add_dish(f"Dish {i}", 10 + i, "img.jpg", "desc " * 200, "ingredients", 100)
+        get_db().execute('DELETE FROM dish WHERE id > 20')
+        get_db().commit()
+        report = run_maintenance(step_pages=16, pause_ms=0)
+        print(format_report(report))
+        assert 'dish' in report['analyzed'] and not report['migrated']  # нова БД — одразу INCREMENTAL
+        assert report['before']['freelist_pages'] > 0 and report['after']['freelist_pages'] == 0
+        assert report['vacuumed_pages'] > 0 and report['after']['page_count'] < report['before']['page_count']
+        conn = sqlite3.connect(db_path)
+        assert conn.execute('SELECT count(*) FROM maintenance_runs').fetchone()[0] == 1
+        assert 'dish' not in tables_to_analyze(conn)  # статистика вже актуальна
+        conn.close()
+
+    # стара БД без auto_vacuum мігрує через VACUUM
+    old_db = os.path.join(tempfile.mkdtemp(prefix='velvet-test-'), 'old.db')
+    conn = sqlite3.connect(old_db)
+    conn.execute('CREATE TABLE maintenance_runs (id INTEGER PRIMARY KEY, started_at TEXT, duration_ms REAL, '
+                 'analyzed_tables INTEGER, vacuumed_pages INTEGER, report TEXT)')
+    conn.commit()
+    conn.close()
+    report = run_maintenance(old_db)
+    assert report['migrated'] and report['after']['auto_vacuum'] == 'incremental'
+    print("  ✓ PASS: статистика, повернення сторінок, міграція auto_vacuum")
+
+
+def test_order_archive():
+    """Старі замовлення переносяться в помісячні партиції архіву, історія бачить їх через UNION ALL"""
+    print("\n\n=== Тестування архіву замовлень ===\n")
+    import datetime
+    from database import (
+        connect_db, insert_order, get_all_orders, get_order_by_id, get_orders_by_phone, rebuild_sales_summary
+    )
+    from order_archive import archive_orders, archive_stats
+    with temp_app_context():
+        now = datetime.datetime.utcnow()
+        conn = connect_db()
+        cursor = conn.cursor()
+        old_id = insert_order(cursor, 'A', '0501', 'addr', [{'id': 1, 'qty': 2}], 10.0,
+                              created=(now - datetime.timedelta(days=100)).isoformat())
+        insert_order(cursor, 'A', '0501', 'addr', [{'id': 1, 'qty': 1}], 5.0,
+                     created=(now - datetime.timedelta(days=140)).isoformat())
+        insert_order(cursor, 'A', '0501', 'addr', [{'id': 2, 'qty': 1}], 7.0)
+        conn.commit()
+        conn.close()
+
+        moved = archive_orders(30)
+        assert sum(moved.values()) == 2 and len(moved) == 2
+        assert sorted(archive_stats().values()) == [1, 1]
+        assert [o['total'] for o in get_all_orders()] == [7.0]  # гаряча таблиця — лише нові
+        assert [o['total'] for o in get_orders_by_phone('0501')] == [7.0, 10.0, 5.0]
+        assert get_order_by_id(old_id)['total'] == 10.0
+        assert rebuild_sales_summary() == 3  # звіти перераховуються з архівом
+        assert archive_orders(30) == {}  # повтор нічого не переносить
+    print("  ✓ PASS: партиції за місяцями, історія акаунта і звіти через UNION ALL")
+
+
+def test_db_backup():
+    """Покрокова онлайн-копія через backup API: перевірка, journal_mode копії, ротація"""
+    print("\n\n=== Тестування резервних копій ===\n")
+    import sqlite3
+    from database import get_database_path
+    from backup import backup_database, format_report, list_backups, verify_backup
+    with temp_app_context():
+        db_path = get_database_path()
+        for i in range(50):
+            add_dish(f"Dish {i}", 10 + i, "img.jpg", "desc " * 100, "ingredients", 100)
+        directory = os.path.join(os.path.dirname(db_path), 'backups')
+        os.makedirs(directory)
+        for stamp in ('20240101-000000', '20240102-000000'):  # старіші копії для ротації
+            open(os.path.join(directory, f'test-{stamp}.db'), 'wb').close()
+        reports = backup_database(directory=directory, keep=2, step_pages=8, pause_ms=0)
+        print(format_report(reports))
+        report = reports[0]
+        assert report['verified'] and report['steps'] > 1 and report['lock_held_max_ms'] >= 0
+        assert [os.path.basename(p) for p in report['removed']] == ['test-20240101-000000.db']
+        assert list_backups(db_path, directory)[-1] == report['path']
+        assert verify_backup(report['path']) == (True, 'ok')
+        conn = sqlite3.connect(report['path'])
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+        assert conn.execute('SELECT count(*) FROM dish').fetchone()[0] >= 50
+        conn.close()
+    print("  ✓ PASS: копія кроками, integrity_check, ротація")
+
+
+def test_order_events_sse():
+    """Тригери пишуть order_events, SSE віддає пропущене за since і нові події через broker"""
+    print("\n\n=== Тестування SSE подій замовлень ===\n")
+    import json
+    from database import update_order_status
+    from order_queue import place_order
+    from order_events import get_broker, shutdown_order_events
+    old_seconds = os.environ.get('ORDER_EVENTS_STREAM_SECONDS')
+    os.environ['ORDER_EVENTS_STREAM_SECONDS'] = '0.3'
+    try:
+        with temp_app_context() as app:
+            dish_id = add_dish("Борщ", 120, "img.jpg", "desc", "ingredients", 300)
+            client = app.test_client()
+            assert client.get('/admin/events').status_code == 401
+            with client.session_transaction() as sess:
+                sess['is_admin'] = True
+            order_id = place_order('Kitchen', '0502', 'Стіл 3', [{'id': dish_id, 'qty': 2}], 240.0)
+            update_order_status(order_id, 'preparing')
+            body = client.get('/admin/events?since=0').get_data(as_text=True)
+            events = [json.loads(line[6:]) for line in body.splitlines() if line.startswith('data: ')]
+            assert [e['type'] for e in events] == ['order_created', 'order_status']
+            assert events[0]['order']['items'] == [{'dish_id': dish_id, 'name': 'Борщ', 'qty': 2}]
+            assert events[1]['old_status'] == 'new' and events[1]['status'] == 'preparing'
+
+            # нові події: слухач помічає commit за PRAGMA data_version і розсилає підписникам
+            subscription = get_broker().subscribe()
+            update_order_status(order_id, 'ready')
+            event = subscription.queue.get(timeout=5)
+            assert event['type'] == 'order_status' and event['status'] == 'ready'
+            subscription.close()
+
+            # під gunicorn з 2 потоками — одне SSE-місце; резервується до відповіді
+            from order_events import set_worker_threads
+            set_worker_threads(2)
+            try:
+                held = client.get('/admin/events?since=0', buffered=False)
+                assert held.status_code == 200 and get_broker().subscriber_count == 1
+                assert client.get('/admin/events').status_code == 503
+                held.close()
+                assert get_broker().subscriber_count == 0
+            finally:
+                set_worker_threads(None)
+            page = client.get('/kitchen').get_data(as_text=True)
+            assert 'Kitchen' in page and 'Борщ x2' in page
+    finally:
+        shutdown_order_events()
+        if old_seconds is None:
+            os.environ.pop('ORDER_EVENTS_STREAM_SECONDS', None)
+        else:
+            os.environ['ORDER_EVENTS_STREAM_SECONDS'] = old_seconds
+    print("  ✓ PASS: order_created/order_status через SSE, довантаження і pub/sub")
+
+
+def test_change_log_sync():
+    """Тригери пишуть change_log, /api/v2/changes віддає дельту з курсором, ущільнення і reset"""
+    print("\n\n=== Тестування журналу змін і дельта-синхронізації ===\n")
+    import datetime
+    from database import update_dish, delete_dish, add_favourite, connect_db, get_database_path
+    from db_writer import writer_lock
+    from maintenance import compact_change_log
+    with temp_app_context() as app:
+        client = app.test_client()
+        first = client.get('/api/v2/changes').get_json()
+        assert first['reset'] and first['changes'] == []  # перша синхронізація — повні колекції
+        since = first['next']
+
+        kept = add_dish("Суп", 80, "img.jpg", "desc", "ingredients", 200)
+        removed = add_dish("Салат", 90, "img.jpg", "desc", "ingredients", 150)
+        update_dish(kept, "Суп дня", 85, "img.jpg", "desc", "ingredients", 200)
+        delete_dish(removed)
+        add_favourite(kept, 7)
+        delta = client.get(f'/api/v2/changes?since={since}').get_json()
+        changes = {(c['entity'], c['id']): c for c in delta['changes']}
+        assert len(delta['changes']) == 3 and not delta['reset']  # по одному запису на рядок
+        assert changes[('dish', kept)]['op'] == 'update' and changes[('dish', kept)]['data']['name'] == 'Суп дня'
+        assert changes[('dish', removed)]['op'] == 'delete' and changes[('dish', removed)]['data'] is None
+        assert changes[('favourites', 1)]['data']['account_id'] == 7
+        page = client.get(f'/api/v2/changes?since={since}&limit=1&entities=dish').get_json()
+        assert page['has_more'] and len(page['changes']) == 1
+        assert client.get(f"/api/v2/changes?since={delta['next']}").get_json()['changes'] == []
+        for bad in ('-1', '²', 'abc'):
+            assert client.get(f'/api/v2/changes?since={bad}').status_code == 400, bad
+
+        conn = connect_db(get_database_path())
+        conn.isolation_level = None
+        lock = writer_lock(get_database_path())
+        result = compact_change_log(conn, lock, retention_days=30)
+        assert result['collapsed'] == 2 and result['expired'] == 0  # insert'и під update/delete тих самих страв
+        future = datetime.datetime.utcnow() + datetime.timedelta(days=31)
+        result = compact_change_log(conn, lock, retention_days=30, now=future)
+        conn.close()
+        assert result['expired'] == 3 and result['compacted_seq'] == delta['next']
+        stale = client.get(f'/api/v2/changes?since={since}').get_json()
+        assert stale['reset'] and stale['next'] == delta['next']
+    print("  ✓ PASS: дельта з курсором, ущільнення і reset для застарілого since")
+
+
 def test_performance():
-    """Базове тестування продуктивності"""
+    """Benchmark сторінок та API на тимчасовій БД з порівнянням з baseline"""
     print("\n\n=== Тестування продуктивності ===\n")
-    
-    # Тест швидкості валідації
-    iterations = 10000
-    
-    print(f"⏱️ Тест швидкості email валідації ({iterations} ітерацій):")
-    start = time.time()
-    for _ in range(iterations):
-        validate_email("test@example.com")
-    duration = time.time() - start
-    print(f"  Час: {duration:.3f}s ({iterations/duration:.0f} ops/sec)")
-    
-    print(f"\n⏱️ Тест швидкості sanitization ({iterations} ітерацій):")
-    start = time.time()
-    for _ in range(iterations):
-        sanitize_string("<script>alert('test')</script>")
-    duration = time.time() - start
-    print(f"  Час: {duration:.3f}s ({iterations/duration:.0f} ops/sec)")
+    from benchmark import run_benchmark, load_baseline, compare_with_baseline, print_report
+
+    baseline = load_baseline()
+    report = run_benchmark(baseline['volumes'], iterations=5, warmup=1, seed=baseline['seed'])
+    print_report(report)
+    # Латентність залежить від машини — у тестах перевіряємо лише кількість SQL запитів,
+    # повне порівняння виконує `python benchmark.py`
+    regressions = compare_with_baseline(report, baseline, check_latency=False)
+    for r in regressions:
+        print(f"  ✗ {r}")
+    assert not regressions
 
 
 def main():
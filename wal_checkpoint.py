@@ -0,0 +1,235 @@
+"""
+Фоновий checkpoint WAL і статистика його розміру.
+
+Автоматичний checkpoint SQLite (wal_autocheckpoint) виконує той запис, що
+перетнув поріг сторінок, і не може перенести кадри, які ще читає довгий
+read-транзакція (/admin, експорти). Під постійним потоком замовлень
+my_database.db-wal тоді росте без меж, а кожне читання шукає сторінки в
+довшому WAL-індексі.
+
+Потік-планувальник кожні WAL_CHECKPOINT_INTERVAL секунд дивиться на -wal файл:
+    - тиша (розмір і mtime не змінювались WAL_CHECKPOINT_QUIET_MS) — PASSIVE;
+      якщо всі кадри перенесено і WAL більший за WAL_TRUNCATE_BYTES — TRUNCATE
+      (з коротким busy_timeout, щоб не тримати писачів)
+    - WAL більший за WAL_CHECKPOINT_MAX_BYTES — PASSIVE без очікування тиші
+PASSIVE не блокує ні читачів, ні писачів. Між gunicorn workers checkpoint
+виконує лише процес, що тримає flock на <БД>.checkpoint.lock (db_writer.LeaderLock);
+він же пише в цей файл JSON зі станом останнього checkpoint'а, який читає
+/health будь-якого worker'а (wal_status).
+
+Налаштування (змінні оточення):
+    WAL_AUTOCHECKPOINT         PRAGMA wal_autocheckpoint з'єднань запису, сторінок (1000; 0 — вимкнено)
+    WAL_CHECKPOINT_MODE        scheduler | off (scheduler)
+    WAL_CHECKPOINT_INTERVAL    період перевірки, с (5)
+    WAL_CHECKPOINT_QUIET_MS    скільки WAL не змінюється, щоб вважати період тихим (2000)
+    WAL_TRUNCATE_BYTES         TRUNCATE після повного PASSIVE, якщо WAL більший (4194304)
+    WAL_CHECKPOINT_MAX_BYTES   PASSIVE навіть під навантаженням, якщо WAL більший (67108864)
+"""
+import atexit
+import os
+import threading
+import time
+
+from db_writer import LeaderLock
+
+WAL_HEADER_BYTES = 32
+WAL_FRAME_HEADER_BYTES = 24
+TRUNCATE_BUSY_TIMEOUT_MS = 100
+
+
+def wal_autocheckpoint():
+    return max(0, int(os.environ.get('WAL_AUTOCHECKPOINT', 1000)))
+
+
+def checkpoint_mode():
+    return os.environ.get('WAL_CHECKPOINT_MODE', 'scheduler').strip().lower()
+
+
+def wal_path(db_path):
+    return db_path + '-wal'
+
+
+def state_path(db_path):
+    return db_path + '.checkpoint.lock'
+
+
+def wal_size(db_path):
+    try:
+        return os.path.getsize(wal_path(db_path))
+    except OSError:
+        return 0
+
+
+def read_checkpoint_state(db_path):
+    """Стан останнього checkpoint'а, записаний планувальником (будь-якого процесу)"""
+    return LeaderLock(state_path(db_path)).read_state()
+
+
+def wal_status(db_path, page_size=None):
+    """Розмір WAL і відставання checkpoint'а для /health"""
+    size = wal_size(db_path)
+    status = {'wal_bytes': size}
+    if page_size:
+        status['wal_frames'] = max(0, size - WAL_HEADER_BYTES) // (page_size + WAL_FRAME_HEADER_BYTES)
+    state = read_checkpoint_state(db_path)
+    if state:
+        now = time.time()
+        status['checkpoint'] = {
+            'mode': state.get('mode'),
+            'last_at': state.get('at'),
+            'seconds_since_last': round(now - state['at'], 1) if state.get('at') else None,
+            # кадри, які останній checkpoint не зміг перенести (їх ще читають)
+            'lag_frames': state.get('log', 0) - state.get('checkpointed', 0),
+            'seconds_since_complete': (round(now - state['complete_at'], 1)
+                                       if state.get('complete_at') else None),
+            'duration_ms': state.get('duration_ms'),
+            'runs': state.get('runs'),
+        }
+    return status
+
+
+class CheckpointScheduler:
+    """Потік, що виконує PASSIVE/TRUNCATE checkpoint у тихі періоди"""
+
+    def __init__(self, db_path, interval=5.0, quiet_ms=2000, truncate_bytes=4 << 20, max_bytes=64 << 20):
+        self.db_path = db_path
+        self.interval = max(0.05, float(interval))
+        self.quiet = max(0.0, float(quiet_ms)) / 1000.0
+        self.truncate_bytes = int(truncate_bytes)
+        self.max_bytes = int(max_bytes)
+        self.stats = {'passive': 0, 'truncate': 0, 'busy': 0, 'skipped': 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader = LeaderLock(state_path(db_path))
+        self._last_seen = None  # (розмір, mtime) WAL на попередній перевірці
+        self._changed_at = time.monotonic()
+        self._state = read_checkpoint_state(db_path)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._leader.release()
+
+    def _run(self):
+        from database import connect_db
+        conn = None
+        try:
+            while not self._stop.wait(self.interval):
+                if not self._leader.try_acquire():
+                    continue
+                if conn is None:
+                    conn = connect_db(self.db_path)
+                    conn.isolation_level = None
+                try:
+                    self.tick(conn)
+                except Exception as e:
+                    print('WAL checkpoint failed:', e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def tick(self, conn, now=None):
+        """Одна перевірка: checkpoint, якщо час; повертає виконаний режим або None"""
+        now = time.monotonic() if now is None else now
+        try:
+            st = os.stat(wal_path(self.db_path))
+            seen = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            seen = (0, 0)
+        if seen != self._last_seen:
+            self._last_seen = seen
+            self._changed_at = now
+        size = seen[0]
+        if size <= WAL_HEADER_BYTES:
+            return None
+        quiet = now - self._changed_at >= self.quiet
+        if not quiet and size < self.max_bytes:
+            self.stats['skipped'] += 1
+            return None
+        mode = 'PASSIVE'
+        result = self.checkpoint(conn, mode)
+        busy, log, checkpointed = result
+        if quiet and not busy and log == checkpointed and size > self.truncate_bytes:
+            mode = 'TRUNCATE'
+            result = self.checkpoint(conn, mode)
+        # після TRUNCATE файл змінився — не вважаємо це записом клієнтів
+        try:
+            st = os.stat(wal_path(self.db_path))
+            self._last_seen = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            self._last_seen = (0, 0)
+        return mode
+
+    def checkpoint(self, conn, mode):
+        started = time.perf_counter()
+        if mode == 'TRUNCATE':
+            conn.execute(f'PRAGMA busy_timeout={TRUNCATE_BUSY_TIMEOUT_MS}')
+        try:
+            busy, log, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        finally:
+            if mode == 'TRUNCATE':
+                conn.execute('PRAGMA busy_timeout=20000')
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.stats[mode.lower()] += 1
+        if busy:
+            self.stats['busy'] += 1
+        at = time.time()
+        state = {
+            'mode': mode, 'at': at, 'busy': busy, 'log': max(log, 0), 'checkpointed': max(checkpointed, 0),
+            'duration_ms': round(duration_ms, 2),
+            'complete_at': at if not busy and log == checkpointed else self._state.get('complete_at'),
+            'runs': self._state.get('runs', 0) + 1,
+        }
+        self._state = state
+        self._leader.write_state(state)
+        return busy, log, checkpointed
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_guard = threading.Lock()
+
+
+def ensure_checkpoint_scheduler():
+    """Планувальник поточного процесу (створюється ліниво, заново після fork)"""
+    global _scheduler, _scheduler_pid
+    from database import get_database_path
+    if checkpoint_mode() != 'scheduler':
+        return None
+    db_path = get_database_path()
+    scheduler = _scheduler
+    if scheduler is not None and _scheduler_pid == os.getpid() and scheduler.db_path == db_path:
+        return scheduler
+    with _scheduler_guard:
+        if _scheduler is None or _scheduler_pid != os.getpid() or _scheduler.db_path != db_path:
+            if _scheduler is not None and _scheduler_pid == os.getpid():
+                _scheduler.stop()
+            _scheduler = CheckpointScheduler(
+                db_path,
+                interval=float(os.environ.get('WAL_CHECKPOINT_INTERVAL', 5)),
+                quiet_ms=float(os.environ.get('WAL_CHECKPOINT_QUIET_MS', 2000)),
+                truncate_bytes=int(os.environ.get('WAL_TRUNCATE_BYTES', 4 << 20)),
+                max_bytes=int(os.environ.get('WAL_CHECKPOINT_MAX_BYTES', 64 << 20)),
+            ).start()
+            _scheduler_pid = os.getpid()
+        return _scheduler
+
+
+def shutdown_checkpoint_scheduler():
+    global _scheduler
+    with _scheduler_guard:
+        if _scheduler is not None and _scheduler_pid == os.getpid():
+            _scheduler.stop()
+        _scheduler = None
+
+
+atexit.register(shutdown_checkpoint_scheduler)